@@ -0,0 +1,222 @@
+"""
+Entrada ASGI (asyncio) do backend:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+    GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker gunicorn -c gunicorn.conf.py asgi:app
+
+O chat passa quase todo o tempo esperando o servidor do LLM. Aqui /chat e
+/chat/stream são corrotinas que fazem `await` no stream de um AsyncOpenAI
+único por processo (conexões keep-alive reaproveitadas): cem conversas
+abertas custam cem corrotinas, não cem threads. Em /speak, o XTTS roda num
+executor próprio (SPEAK_WORKERS threads) e o event loop só repassa os bytes.
+
+As demais rotas (voz, eventos, métricas, saúde) continuam no app Flask de
+backend_server, montado no mesmo processo via a2wsgi: sessões, scheduler e
+métricas são os mesmos objetos. Com gunicorn, o import passa por wsgi.py
+(modelos carregados no master antes do fork, ver gunicorn.conf.py).
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import anyio
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from backend_server import (
+    CHAT_KEEPALIVE_SECS, TTS_WORKERS, audio_body, audio_headers, chat_payload, get_state,
+    resolve_session_id, start_speech,
+)
+from cancellation import Cancelled
+from events import format_sse
+import metrics
+from scheduler import QueueFull
+from voice_assistant import ask_llm_async
+from wsgi import app as flask_app
+
+# Threads que servem as rotas Flask (streams SSE e de áudio ocupam uma enquanto abertos)
+WSGI_THREADS = int(os.getenv("WSGI_THREADS", 32))
+# Síntese do /speak: cada next() do gerador do XTTS roda aqui, nunca no event loop
+SPEAK_WORKERS = int(os.getenv("SPEAK_WORKERS", TTS_WORKERS))
+
+speak_executor = ThreadPoolExecutor(max_workers=SPEAK_WORKERS, thread_name_prefix="speak-xtts")
+
+_END = object()
+
+
+async def request_json(request):
+    """JSON body, or {} when missing/invalid (like get_json(silent=True))"""
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def session_of(request):
+    return resolve_session_id(request.headers.get('X-Session-Id') or request.query_params.get('session'))
+
+
+def error(message, status):
+    return JSONResponse({'error': message}, status_code=status)
+
+
+def too_busy(e: QueueFull):
+    """429 with a retry hint when a stage queue is full"""
+    return JSONResponse({'error': str(e), 'stage': e.stage, 'retryAfter': e.retry_after},
+                        status_code=429, headers={'Retry-After': str(int(e.retry_after))})
+
+
+async def chat(request):
+    """Text chat; the upstream LLM round-trip is awaited, not waited on by a thread"""
+    data = await request_json(request)
+    try:
+        session_id = session_of(request)
+        message = (data.get('message') or '').strip()
+        if not message:
+            return error('Nenhuma mensagem recebida', 400)
+        conversation = get_state(session_id)['conversation']
+        response = await ask_llm_async(message, conversation=conversation)
+        return JSONResponse(chat_payload(message, response, conversation))
+    except ValueError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def chat_stream(request):
+    """Text chat relayed token by token as Server-Sent Events (same events as backend_server)
+
+    A client that disconnects cancels the LLM task, which closes the upstream stream.
+    """
+    started = time.perf_counter()
+    data = await request_json(request)
+    try:
+        session_id = session_of(request)
+    except ValueError as e:
+        return error(str(e), 400)
+    message = (data.get('message') or '').strip()
+    if not message:
+        return error('Nenhuma mensagem recebida', 400)
+
+    conversation = get_state(session_id)['conversation']
+    relay = asyncio.Queue()
+
+    async def run():
+        try:
+            response = await ask_llm_async(
+                message,
+                conversation=conversation,
+                on_delta=lambda text: relay.put_nowait(('token', {'text': text}))
+            )
+            relay.put_nowait(('done', chat_payload(message, response, conversation)))
+        except Cancelled:
+            relay.put_nowait(None)
+        except Exception as e:
+            relay.put_nowait(('error', {'error': str(e)}))
+
+    task = asyncio.create_task(run())
+
+    async def generate():
+        ttft = None
+        finished = False
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(relay.get(), CHAT_KEEPALIVE_SECS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    finished = True
+                    return
+                event, payload = item
+                if event == 'token' and ttft is None:
+                    ttft = time.perf_counter() - started
+                    metrics.CHAT_STREAM_TTFT.observe(ttft)
+                if event != 'token':
+                    finished = True
+                    payload['ttft'] = round(ttft, 3) if ttft is not None else None
+                yield format_sse(event, payload)
+                if finished:
+                    return
+        finally:
+            if not finished:
+                task.cancel()
+                print(f"🔌 [{session_id}] Cliente desconectou do /chat/stream, stream do LLM encerrado")
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+async def iterate_in_executor(iterator, executor, on_abort=None):
+    """Async iteration over a blocking generator: every next() runs on `executor`
+
+    When the consumer goes away mid-stream, `on_abort` runs first (so a next() still
+    in progress returns early), then the generator is closed on the executor as well.
+    """
+    loop = asyncio.get_running_loop()
+    pending = None
+    try:
+        while True:
+            pending = loop.run_in_executor(executor, next, iterator, _END)
+            item = await asyncio.shield(pending)
+            pending = None
+            if item is _END:
+                return
+            yield item
+    finally:
+        # The request's cancel scope is already cancelled: finish the cleanup anyway
+        with anyio.CancelScope(shield=True):
+            if pending is not None:
+                if on_abort is not None:
+                    on_abort()
+                try:
+                    await pending
+                except Exception:
+                    pass  # Cancelled (or the error that ended the stream)
+            await loop.run_in_executor(executor, iterator.close)
+
+
+async def speak(request):
+    """Synthesize text and stream it as chunked WAV; XTTS runs on the speak executor"""
+    started = time.perf_counter()
+    try:
+        chunks, fmt, cancel = start_speech(await request_json(request))
+    except QueueFull as e:
+        return too_busy(e)
+    except ValueError as e:
+        return error(str(e), 400)
+
+    def stop():
+        cancel.cancel('cliente desconectou')
+
+    body = audio_body(chunks, fmt, 'speak', started, on_close=stop)
+    return StreamingResponse(iterate_in_executor(body, speak_executor, on_abort=stop),
+                             media_type='audio/wav', headers=audio_headers(fmt))
+
+
+app = Starlette(
+    routes=[
+        Route('/chat', chat, methods=['POST']),
+        Route('/chat/stream', chat_stream, methods=['POST']),
+        Route('/speak', speak, methods=['POST']),
+        Mount('/', app=WSGIMiddleware(flask_app, workers=WSGI_THREADS)),
+    ],
+    # Also answers the preflight of the Flask routes (and overrides flask-cors' equal headers)
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    port = int(os.getenv("FLASK_RUN_PORT", 8080))
+    print(f"🚀 Servidor asyncio em http://localhost:{port} (chat e /speak como corrotinas)")
+    uvicorn.run(app, host=os.getenv("HOST", "0.0.0.0"), port=port)
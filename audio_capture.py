@@ -0,0 +1,166 @@
+"""
+Captura do microfone em streaming (`sd.InputStream`) para um buffer em memória.
+
+`Capture` é o handle do áudio de um turno: um buffer float32 pré-alocado que
+o callback do PortAudio preenche frame a frame. Cada frame passa pelo VAD
+(`TurnDetector`); no modo "vad" o turno termina sozinho depois do hangover,
+no modo "fixed" após `seconds`. Em ambos, `stop_event` encerra a captura
+antecipadamente. O áudio enviado pelo navegador (`client_audio.py`) usa o
+mesmo buffer e o mesmo detector.
+"""
+
+import queue
+import threading
+import time
+
+import numpy as np
+
+from vad import Endpointer, make_detector
+
+try:
+    import sounddevice as sd
+except Exception:  # PortAudio ausente
+    sd = None
+
+RECORD_MODES = ("fixed", "vad")
+
+
+class Capture:
+    """Buffer de áudio de um turno + metadados de fala detectada."""
+
+    def __init__(self, max_secs: float, samplerate: int = 16_000, frame_ms: int = 30):
+        self.samplerate = samplerate
+        self.frame_len = samplerate * frame_ms // 1000
+        self.frame_ms = frame_ms
+        self._buffer = np.zeros(int(max_secs * samplerate), dtype=np.float32)
+        self._length = 0
+        self._lock = threading.Lock()
+        self.finished = threading.Event()
+        self.started_at = time.perf_counter()
+        self.speech_start = None      # amostra onde a fala começou
+        self.speech_end = None        # amostra onde a fala terminou
+        self.speech_end_time = None   # perf_counter do último frame com voz
+        self.endpoint_time = None     # perf_counter em que o turno foi encerrado
+        self.voiced_ms = 0
+        self.min_speech_ms = 150
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def full(self) -> bool:
+        return self._length >= len(self._buffer)
+
+    @property
+    def audio(self) -> np.ndarray:
+        """View (sem cópia) de tudo que foi capturado até agora."""
+        return self._buffer[:self._length]
+
+    @property
+    def has_speech(self) -> bool:
+        return self.voiced_ms >= self.min_speech_ms
+
+    def speech_audio(self, preroll_ms: int = 200, postroll_ms: int = 300) -> np.ndarray:
+        """View recortada em volta da fala detectada (com margens)."""
+        if self.speech_start is None:
+            return self.audio
+        start = max(0, self.speech_start - preroll_ms * self.samplerate // 1000)
+        end = self.speech_end if self.speech_end is not None else self._length
+        end = min(self._length, end + postroll_ms * self.samplerate // 1000)
+        return self._buffer[start:end]
+
+    def append(self, samples: np.ndarray) -> int:
+        """Copia amostras para o buffer; retorna a posição inicial onde foram escritas.
+
+        Amostras int16 (PCM16) são convertidas direto no buffer, sem array intermediário.
+        """
+        with self._lock:
+            start = self._length
+            n = min(len(samples), len(self._buffer) - start)
+            if samples.dtype == np.int16:
+                np.multiply(samples[:n], 1.0 / 32768.0, out=self._buffer[start:start + n], casting="unsafe")
+            else:
+                self._buffer[start:start + n] = samples[:n]
+            self._length = start + n
+        return start
+
+    def finish(self):
+        if self.endpoint_time is None:
+            self.endpoint_time = time.perf_counter()
+        self.finished.set()
+
+
+class TurnDetector:
+    """VAD + endpointing sobre os frames já escritos num `Capture`."""
+
+    def __init__(self, capture: Capture, mode: str = "fixed", detector: str = "energy",
+                 hangover_ms: int = 700, no_speech_timeout_ms: int = 5000, on_speech=None):
+        if mode not in RECORD_MODES:
+            raise ValueError(f"Modo de gravação inválido: {mode}")
+        self.capture = capture
+        self.mode = mode
+        self.on_speech = on_speech
+        self.vad = make_detector(detector, capture.samplerate)
+        self.endpointer = Endpointer(
+            frame_ms=capture.frame_ms,
+            min_speech_ms=capture.min_speech_ms,
+            hangover_ms=hangover_ms,
+            no_speech_timeout_ms=no_speech_timeout_ms,
+        )
+        self.bounds = []  # (início, fim) em amostras de cada frame analisado
+
+    def process(self, start: int, end: int) -> bool:
+        """Analisa o frame [start, end); retorna True quando o turno terminou (modo "vad").
+
+        `on_speech()` é chamado uma vez, assim que a fala é confirmada (usado pelo barge-in).
+        """
+        capture = self.capture
+        self.bounds.append((start, end))
+        voiced = self.vad.is_speech(capture.audio[start:end])
+        if voiced:
+            capture.voiced_ms += capture.frame_ms
+        state = self.endpointer.update(voiced)
+        if self.endpointer.in_speech:
+            if capture.speech_start is None and self.on_speech is not None:
+                self.on_speech()
+            capture.speech_start = self.bounds[self.endpointer.speech_start_frame][0]
+            capture.speech_end = self.bounds[self.endpointer.speech_end_frame - 1][1]
+            if voiced:
+                capture.speech_end_time = time.perf_counter()
+        return self.mode == "vad" and state in (Endpointer.END, Endpointer.TIMEOUT)
+
+
+def capture_microphone(capture: Capture, mode: str = "fixed", seconds: float = 4,
+                       detector: str = "energy", hangover_ms: int = 700,
+                       no_speech_timeout_ms: int = 5000, stop_event=None, on_speech=None) -> Capture:
+    """Grava do microfone padrão para `capture` até o fim do turno.
+
+    `on_speech()` é chamado uma vez, assim que a fala é confirmada (usado pelo barge-in).
+    """
+    turn = TurnDetector(capture, mode, detector, hangover_ms, no_speech_timeout_ms, on_speech)
+    frames = queue.Queue()
+
+    def callback(indata, n_frames, time_info, status):
+        start = capture.append(indata[:, 0])
+        frames.put((start, min(start + n_frames, len(capture))))
+
+    deadline = capture.started_at + seconds if mode == "fixed" else None
+    try:
+        with sd.InputStream(samplerate=capture.samplerate, channels=1, dtype="float32",
+                            blocksize=capture.frame_len, callback=callback):
+            while not capture.full:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                try:
+                    start, end = frames.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                if end <= start:
+                    continue
+                if turn.process(start, end):
+                    break
+    finally:
+        capture.finish()
+    return capture
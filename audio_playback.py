@@ -0,0 +1,237 @@
+"""
+Reprodução de áudio em streaming dentro do processo.
+
+O dispositivo de saída é aberto assim que o primeiro chunk do gerador chega
+(ex.: `xtts_model.inference_stream`). Os chunks alimentam um ring buffer
+pré-alocado que o callback do `sounddevice.OutputStream` consome. Se o gerador
+atrasar (underrun), o callback emite silêncio e espera acumular áudio de novo
+em vez de tocar fragmentos picotados.
+
+Funciona em macOS e Linux (PortAudio). Sem dispositivo de saída, cai para um
+player de linha de comando disponível (afplay, paplay, aplay, ffplay).
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import scipy.io.wavfile as wav
+
+try:
+    import sounddevice as sd
+except Exception:  # PortAudio ausente (ex.: servidor headless)
+    sd = None
+
+# Players externos, na ordem de preferência
+CLI_PLAYERS = (
+    ["afplay", "-q", "1"],
+    ["paplay"],
+    ["aplay", "-q"],
+    ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet"],
+)
+
+
+def has_output_device() -> bool:
+    """True se o PortAudio tem um dispositivo de saída padrão utilizável."""
+    if sd is None:
+        return False
+    try:
+        sd.query_devices(kind="output")
+        return True
+    except Exception:
+        return False
+
+
+@dataclass
+class PlaybackStats:
+    time_to_first_audio: float = 0.0   # s entre o início e o primeiro bloco no dispositivo
+    duration: float = 0.0              # s de áudio reproduzido
+    underruns: int = 0                 # vezes em que o buffer secou antes do fim
+    backend: str = ""
+
+
+class RingBuffer:
+    """Ring buffer float32 pré-alocado, um produtor e um consumidor."""
+
+    def __init__(self, capacity: int):
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._capacity = capacity
+        self._read = 0
+        self._write = 0
+        self._cond = threading.Condition()
+
+    def reset(self):
+        with self._cond:
+            self._read = self._write = 0
+
+    @property
+    def available(self) -> int:
+        return self._write - self._read
+
+    def write(self, samples: np.ndarray, stop_event=None):
+        """Escreve todas as amostras, bloqueando enquanto o buffer estiver cheio."""
+        pos = 0
+        total = len(samples)
+        while pos < total:
+            with self._cond:
+                while self._capacity - self.available == 0:
+                    if stop_event is not None and stop_event.is_set():
+                        return
+                    self._cond.wait(0.05)
+                n = min(total - pos, self._capacity - self.available)
+                start = self._write % self._capacity
+                first = min(n, self._capacity - start)
+                self._data[start:start + first] = samples[pos:pos + first]
+                self._data[:n - first] = samples[pos + first:pos + n]
+                self._write += n
+            pos += n
+
+    def read_into(self, out: np.ndarray) -> int:
+        """Copia até `len(out)` amostras para `out`; retorna quantas foram lidas."""
+        with self._cond:
+            n = min(len(out), self.available)
+            start = self._read % self._capacity
+            first = min(n, self._capacity - start)
+            out[:first] = self._data[start:start + first]
+            out[first:n] = self._data[:n - first]
+            self._read += n
+            self._cond.notify_all()
+        return n
+
+
+class StreamingPlayer:
+    """Toca um gerador de chunks float32 à medida que eles chegam."""
+
+    def __init__(self, samplerate: int = 24000, capacity_secs: float = 30.0,
+                 blocksize: int = 1024, rebuffer_secs: float = 0.2):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.rebuffer = int(rebuffer_secs * samplerate)
+        self._ring = RingBuffer(int(capacity_secs * samplerate))
+
+    def play_stream(self, chunks, cancel=None) -> PlaybackStats:
+        """Consome `chunks` (iterável de arrays float32 mono) e reproduz em streaming.
+
+        `cancel` (CancelToken) interrompe a reprodução na hora, inclusive o áudio já bufferizado.
+        """
+        if not has_output_device():
+            return self._play_cli(chunks, cancel)
+        return self._play_device(chunks, cancel)
+
+    def play_array(self, audio: np.ndarray) -> PlaybackStats:
+        return self.play_stream([audio])
+
+    def _play_device(self, chunks, cancel=None) -> PlaybackStats:
+        stats = PlaybackStats(backend="sounddevice")
+        ring = self._ring
+        ring.reset()
+        state = {"buffering": True, "finished": False, "first": None, "played": 0}
+        done = threading.Event()
+        stop = threading.Event()
+
+        def on_cancel():
+            stop.set()
+            done.set()
+        unregister = cancel.on_cancel(on_cancel) if cancel is not None else None
+
+        def callback(outdata, frames, time_info, status):
+            out = outdata[:, 0]
+            if stop.is_set():
+                out.fill(0)
+                return
+            available = ring.available
+            if state["buffering"]:
+                # Espera acumular áudio suficiente (ou o fim do gerador)
+                if available >= self.rebuffer or (state["finished"] and available > 0):
+                    state["buffering"] = False
+                else:
+                    out.fill(0)
+                    if state["finished"] and available == 0:
+                        done.set()
+                    return
+            if available < frames and not state["finished"]:
+                # Underrun: silêncio e volta a bufferizar em vez de picotar
+                stats.underruns += 1
+                state["buffering"] = True
+                out.fill(0)
+                return
+            n = ring.read_into(out)
+            out[n:] = 0
+            if n and state["first"] is None:
+                state["first"] = time.perf_counter()
+            state["played"] += n
+            if state["finished"] and ring.available == 0:
+                done.set()
+
+        start = time.perf_counter()
+        stream = None
+        try:
+            for chunk in chunks:
+                if stop.is_set():
+                    break
+                samples = np.asarray(chunk, dtype=np.float32).reshape(-1)
+                if stream is None:
+                    # Abre o dispositivo só quando o primeiro chunk existe
+                    stream = sd.OutputStream(
+                        samplerate=self.samplerate, channels=1, dtype="float32",
+                        blocksize=self.blocksize, callback=callback,
+                    )
+                    stream.start()
+                ring.write(samples, stop_event=stop)
+            state["finished"] = True
+            if stream is not None:
+                done.wait()
+        finally:
+            stop.set()
+            if unregister is not None:
+                unregister()
+            if stream is not None:
+                stream.stop()
+                stream.close()
+            if cancel is not None and cancel.cancelled and hasattr(chunks, "close"):
+                chunks.close()  # libera o gerador (ex.: XTTS no meio da síntese)
+
+        if state["first"] is not None:
+            stats.time_to_first_audio = state["first"] - start
+        stats.duration = state["played"] / self.samplerate
+        return stats
+
+    def _play_cli(self, chunks, cancel=None) -> PlaybackStats:
+        stats = PlaybackStats()
+        start = time.perf_counter()
+        parts = []
+        for chunk in chunks:
+            if cancel is not None and cancel.cancelled:
+                if hasattr(chunks, "close"):
+                    chunks.close()
+                return stats
+            parts.append(np.asarray(chunk, dtype=np.float32).reshape(-1))
+        if not parts:
+            return stats
+        audio = np.concatenate(parts)
+        player = next((cmd for cmd in CLI_PLAYERS if shutil.which(cmd[0])), None)
+        if player is None:
+            raise RuntimeError("Nenhum dispositivo ou player de áudio disponível")
+        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
+            tmp_path = tmp.name
+        try:
+            wav.write(tmp_path, self.samplerate, (np.clip(audio, -1, 1) * 32767).astype(np.int16))
+            stats.time_to_first_audio = time.perf_counter() - start
+            process = subprocess.Popen(player + [tmp_path])
+            while process.poll() is None:
+                if cancel is not None and cancel.wait(0.05):
+                    process.terminate()
+                    process.wait()
+                    break
+                elif cancel is None:
+                    process.wait()
+        finally:
+            os.remove(tmp_path)
+        stats.duration = len(audio) / self.samplerate
+        stats.backend = player[0]
+        return stats
@@ -0,0 +1,108 @@
+"""
+Áudio sintetizado enviado ao cliente em streaming, em vez de tocado no servidor.
+
+O corpo HTTP é um WAV "infinito": o cabeçalho vai na frente com os tamanhos
+RIFF/data no máximo (0xFFFFFFFF), como fazem os servidores de rádio, e os
+pedaços do XTTS seguem assim que `inference_stream` os produz. O cliente lê o
+cabeçalho (taxa, formato) e toca cada pedaço ao chegar, sem esperar o fim.
+
+Formatos:
+- pcm16: PCM 16 bits little-endian, mono, 24 kHz (~384 kbit/s)
+- mulaw: G.711 μ-law de 8 bits (metade da banda, sem dependências; qualidade
+  de telefone, mas suficiente para voz)
+"""
+
+import queue
+import struct
+import time
+
+import numpy as np
+
+FORMATS = ("pcm16", "mulaw")
+
+# Código do formato no chunk "fmt " do WAV e bits por amostra
+_WAV_FORMATS = {"pcm16": (1, 16), "mulaw": (7, 8)}
+_UNKNOWN_SIZE = 0xFFFFFFFF
+
+_MULAW_BIAS = 0x84
+_MULAW_CLIP = 32635
+
+
+def wav_header(samplerate: int, fmt: str = "pcm16", channels: int = 1) -> bytes:
+    """Cabeçalho WAV de 44 bytes com tamanho indefinido (para streaming)."""
+    if fmt not in _WAV_FORMATS:
+        raise ValueError(f"Formato de áudio inválido: {fmt} (use {', '.join(FORMATS)})")
+    format_code, bits = _WAV_FORMATS[fmt]
+    block_align = channels * bits // 8
+    return (
+        b"RIFF" + struct.pack("<I", _UNKNOWN_SIZE) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, format_code, channels, samplerate,
+                                samplerate * block_align, block_align, bits)
+        + b"data" + struct.pack("<I", _UNKNOWN_SIZE)
+    )
+
+
+def to_pcm16(audio: np.ndarray) -> np.ndarray:
+    """float32 [-1, 1] -> int16 (com saturação)."""
+    audio = np.asarray(audio, dtype=np.float32)
+    return (np.clip(audio, -1.0, 1.0) * 32767.0).astype("<i2")
+
+
+def mulaw_encode(audio: np.ndarray) -> np.ndarray:
+    """float32 [-1, 1] -> bytes G.711 μ-law (uint8), vetorizado."""
+    pcm = to_pcm16(audio).astype(np.int32)
+    sign = (pcm < 0).astype(np.int32) << 7
+    magnitude = np.minimum(np.abs(pcm), _MULAW_CLIP) + _MULAW_BIAS
+    exponent = np.floor(np.log2(magnitude)).astype(np.int32) - 7
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+
+def mulaw_decode(data: np.ndarray) -> np.ndarray:
+    """bytes G.711 μ-law (uint8) -> float32 [-1, 1]."""
+    u = ~np.asarray(data, dtype=np.int32) & 0xFF
+    exponent = (u >> 4) & 0x07
+    magnitude = ((((u & 0x0F) << 3) + _MULAW_BIAS) << exponent) - _MULAW_BIAS
+    return (np.where(u & 0x80, -magnitude, magnitude) / 32768.0).astype(np.float32)
+
+
+def encode(audio: np.ndarray, fmt: str = "pcm16") -> bytes:
+    """Um chunk float32 do XTTS nos bytes do formato pedido."""
+    if fmt == "mulaw":
+        return mulaw_encode(audio).tobytes()
+    return to_pcm16(audio).tobytes()
+
+
+class AudioRelay:
+    """Chunks de áudio de um turno, do estágio de TTS para a resposta HTTP do cliente.
+
+    O TTS não espera o cliente: os chunks ficam numa fila sem limite (alguns
+    segundos de áudio são poucos MB) até `chunks()` consumi-los. Um leitor por turno.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self.closed = False
+        self.first_chunk_at = None
+
+    def put(self, chunk: np.ndarray):
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.perf_counter()
+        self._queue.put(chunk)
+
+    def close(self):
+        """Fim do áudio do turno (também em erro ou cancelamento)."""
+        self.closed = True
+        self._queue.put(None)
+
+    def chunks(self, timeout: float = None):
+        """Gera os chunks até `close()`; `timeout` (s) sem chunk novo encerra a leitura."""
+        while True:
+            try:
+                chunk = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                return
+            if chunk is None:
+                self._queue.put(None)  # outras leituras também terminam
+                return
+            yield chunk
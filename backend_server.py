@@ -1,199 +1,900 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+import queue
 import threading
 import time
 import os
 import tempfile
 from voice_assistant import (
-    record, speech_to_text, ask_llm, say_text,
-    RECORD_SECS, LLM_MODEL, WHISPER_MODEL, SYSTEM_PROMPT
+    record, new_capture, endpoint_latency, speech_to_text, transcribe_words, ask_llm, new_conversation,
+    synthesize_segments, RECORD_SECS, RECORD_MODE, MAX_RECORD_SECS, STT_MODE, STT_PARTIAL_INTERVAL,
+    LLM_MODEL, WHISPER_MODEL, STT_ENGINE, SYSTEM_PROMPT, XTTS_SAMPLERATE, BARGE_IN, BARGE_IN_MIN_SPEECH_MS,
+    models, stt_batcher, tts_cache, llm_cache, cpu_budgets, SAMPLERATE, VAD_DETECTOR, VAD_HANGOVER_MS,
+    XTTS_MAX_CHARS, after_fork as voice_after_fork
 )
+from audio_capture import RECORD_MODES
+from audio_playback import StreamingPlayer
+from audio_stream import FORMATS as AUDIO_FORMATS, AudioRelay, encode as encode_audio, wav_header
+from client_audio import ClientAudioStream
+from cancellation import Cancelled, CancelToken
+from events import EventBus, format_sse
+import metrics
+from scheduler import Job, QueueFull, StagedScheduler
+from sessions import DEFAULT_SESSION, SessionStore, valid_session_id
+from streaming_stt import IncrementalTranscriber
+from text_segments import split_text
+
+STT_MODES = ('batch', 'streaming')
+AUDIO_OUTPUTS = ('server', 'client')  # answer played on the server speakers or streamed to the client
+
+# Worker pools per pipeline stage (bounded queues in between)
+STT_WORKERS = int(os.getenv("STT_WORKERS", 1))
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", 8))
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", 1))
+STAGE_QUEUE_SIZE = int(os.getenv("STAGE_QUEUE_SIZE", 8))
+MAX_INFLIGHT_JOBS = int(os.getenv("MAX_INFLIGHT_JOBS", 16))
+
+# Client-side capture: audio uploaded by the browser instead of the server microphone
+UPLOAD_IDLE_SECS = float(os.getenv("UPLOAD_IDLE_SECS", 5))  # no data for this long ends the turn
+UPLOAD_BLOCK_BYTES = 16 * 1024
+
+# /chat/stream: comment line sent while no token arrives (a gone client is noticed on the next write)
+CHAT_KEEPALIVE_SECS = 1.0
+
+# Answer audio streamed to the client (/voice/audio): give up after this long without a chunk
+AUDIO_RELAY_TIMEOUT = float(os.getenv("AUDIO_RELAY_TIMEOUT", 60))
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 
-# Global state for voice recording
-recording_state = {
-    'is_recording': False,
-    'is_processing': False,
-    'is_speaking': False,
-    'last_transcription': '',
-    'last_response': '',
-    'audio_file': None,
-    'error': None
-}
-
-# Thread lock for state management
-state_lock = threading.Lock()
-
-def update_state(**kwargs):
-    """Thread-safe state updates"""
-    with state_lock:
-        recording_state.update(kwargs)
-
-def get_state():
+def new_session_state():
+    """Initial voice state of a session"""
+    return {
+        'is_recording': False,
+        'is_processing': False,
+        'is_speaking': False,
+        'last_transcription': '',
+        'partial_transcription': '',
+        'last_response': '',
+        'audio_buffer': None,  # audio_capture.Capture: float32 16 kHz em memória (ver AUDIO_DEBUG_DIR para dump)
+        'stop_event': None,
+        'upload': None,  # client_audio.ClientAudioStream when the browser captures the audio
+        'record_mode': RECORD_MODE,
+        'stt_mode': STT_MODE,
+        'barge_in': BARGE_IN,  # listen while speaking; user speech interrupts the answer
+        'audio_output': 'server',  # 'client': the answer is streamed via /voice/audio instead of played here
+        'transcriber': None,  # streaming_stt.IncrementalTranscriber (modo streaming)
+        'endpoint_latency': None,
+        'job': None,  # scheduler.Job of the current turn
+        'conversation': new_conversation(),  # token-budgeted chat history (voice and text)
+        'error': None
+    }
+
+# Per-session voice state, keyed by the X-Session-Id header
+sessions = SessionStore(new_session_state)
+
+# Pushes state transitions to /voice/events subscribers
+events = EventBus()
+
+# State keys that change the public status (recording → processing → speaking)
+STATUS_KEYS = {'is_recording', 'is_processing', 'is_speaking', 'error', 'job', 'endpoint_latency'}
+
+def update_state(session_id, **kwargs):
+    """Thread-safe state updates (published as events to subscribers)"""
+    changed = sessions.update(session_id, **kwargs)
+    if changed:
+        publish_changes(session_id, changed)
+
+def publish_changes(session_id, changed):
+    """Emit one event per kind of change, as soon as it happens"""
+    if not events.has_subscribers(session_id):
+        return
+    if changed.get('partial_transcription'):
+        events.publish(session_id, 'partial', {'text': changed['partial_transcription']})
+    if changed.get('last_transcription'):
+        events.publish(session_id, 'transcription', {'text': changed['last_transcription']})
+    if changed.get('last_response'):
+        events.publish(session_id, 'response', {'text': changed['last_response']})
+    if STATUS_KEYS & changed.keys():
+        events.publish(session_id, 'status', public_status(session_id, get_state(session_id)))
+
+def public_status(session_id, state):
+    """Status payload shared by /voice/status and the event stream"""
+    job = state['job']
+    return {
+        'session': session_id,
+        'recording': state['is_recording'],
+        'processing': state['is_processing'],
+        'speaking': state['is_speaking'],
+        'lastTranscription': state['last_transcription'],
+        'partialTranscription': state['partial_transcription'],
+        'lastResponse': state['last_response'],
+        'mode': state['record_mode'],
+        'endpointLatency': state['endpoint_latency'],
+        'jobId': job.id if job else None,
+        'jobStatus': job.status if job else None,
+        'error': state['error'],
+        'timestamp': time.time()
+    }
+
+def get_state(session_id):
     """Thread-safe state reading"""
-    with state_lock:
-        return recording_state.copy()
+    return sessions.get(session_id)
+
+def current_session_id():
+    """Session id sent by the client (falls back to a shared default session)"""
+    return resolve_session_id(request.headers.get('X-Session-Id') or request.args.get('session'))
+
+def resolve_session_id(session_id):
+    """Validated session id (raises ValueError); shared with the asyncio routes in asgi.py"""
+    session_id = session_id or DEFAULT_SESSION
+    if not valid_session_id(session_id):
+        raise ValueError('Session id inválido')
+    return session_id
+
+def too_busy(e: QueueFull):
+    """429 with a retry hint when a stage queue is full"""
+    response = jsonify({'error': str(e), 'stage': e.stage, 'retryAfter': e.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(int(e.retry_after))
+    return response
 
 @app.route('/health', methods=['GET'])
+@app.route('/health/live', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Liveness: the HTTP server is up (models may still be loading)"""
     return jsonify({
         'status': 'healthy',
         'message': 'Voice Assistant Backend is running',
+        'ready': models.ready,
         'model': LLM_MODEL,
-        'whisper': WHISPER_MODEL
+        'whisper': WHISPER_MODEL,
+        'stt_engine': STT_ENGINE
     })
 
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness: all required models loaded and warmed up"""
+    ready = models.ready
+    return jsonify({
+        'status': 'ready' if ready else 'loading',
+        'models': models.status(),
+        'memory': models.memory()
+    }), 200 if ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Per-stage latency histograms and error/fallback counters (Prometheus text format)"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/config', methods=['GET'])
 def get_config():
     """Get current configuration"""
     return jsonify({
         'llm_model': LLM_MODEL,
         'whisper_model': WHISPER_MODEL,
+        'stt_engine': STT_ENGINE,
         'record_seconds': RECORD_SECS,
+        'record_mode': RECORD_MODE,
+        'record_modes': list(RECORD_MODES),
+        'stt_mode': STT_MODE,
+        'stt_modes': list(STT_MODES),
         'system_prompt': SYSTEM_PROMPT
     })
 
+def chat_payload(message, response, conversation):
+    """Body of a chat answer (/chat, and the `done` event of /chat/stream)"""
+    return {
+        'message': message,
+        'response': response,
+        'promptTokens': conversation.stats()['last_prompt_tokens'],
+        'timestamp': time.time()
+    }
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Handle text chat messages"""
     try:
+        session_id = current_session_id()
         data = request.get_json()
         message = data.get('message', '').strip()
         
         if not message:
             return jsonify({'error': 'Nenhuma mensagem recebida'}), 400
         
-        # Get response from LLM
-        response = ask_llm(message)
+        # Get response from LLM (with this session's history)
+        conversation = get_state(session_id)['conversation']
+        response = ask_llm(message, conversation=conversation)
         
-        return jsonify({
-            'message': message,
-            'response': response,
-            'timestamp': time.time()
-        })
+        return jsonify(chat_payload(message, response, conversation))
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/voice/start', methods=['POST'])
-def start_voice_recording():
-    """Start voice recording"""
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Text chat with the answer relayed token by token as Server-Sent Events
+
+    Events: `token` {text} for each upstream delta, then `done` (full response, server TTFT)
+    or `error`. A client that disconnects closes the upstream LLM stream.
+    """
+    started = time.perf_counter()
+    try:
+        session_id = current_session_id()
+        data = request.get_json(silent=True) or {}
+        message = (data.get('message') or '').strip()
+        if not message:
+            return jsonify({'error': 'Nenhuma mensagem recebida'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conversation = get_state(session_id)['conversation']
+    cancel = CancelToken()
+    relay = queue.Queue()
+    
+    def run():
+        try:
+            response = ask_llm(
+                message,
+                conversation=conversation,
+                cancel=cancel,
+                on_delta=lambda text: relay.put(('token', {'text': text}))
+            )
+            relay.put(('done', chat_payload(message, response, conversation)))
+        except Cancelled:
+            relay.put(None)
+        except Exception as e:
+            relay.put(('error', {'error': str(e)}))
+    
+    threading.Thread(target=run, name='chat-stream', daemon=True).start()
+    
+    def generate():
+        ttft = None
+        finished = False
+        try:
+            while True:
+                try:
+                    item = relay.get(timeout=CHAT_KEEPALIVE_SECS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    finished = True
+                    return
+                event, payload = item
+                if event == 'token' and ttft is None:
+                    ttft = time.perf_counter() - started
+                    metrics.CHAT_STREAM_TTFT.observe(ttft)
+                if event != 'token':
+                    finished = True
+                    payload['ttft'] = round(ttft, 3) if ttft is not None else None
+                yield format_sse(event, payload)
+                if finished:
+                    return
+        finally:
+            # GeneratorExit on a closed connection: stop the upstream stream too
+            if not finished:
+                cancel.cancel('cliente desconectou')
+                print(f"🔌 [{session_id}] Cliente desconectou do /chat/stream, stream do LLM encerrado")
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/conversation', methods=['GET'])
+def get_conversation():
+    """History size and prompt token counts of the session"""
+    try:
+        session_id = current_session_id()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(get_state(session_id)['conversation'].stats())
+
+@app.route('/conversation/reset', methods=['POST'])
+def reset_conversation():
+    """Forget the session's chat history"""
+    try:
+        session_id = current_session_id()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    get_state(session_id)['conversation'].reset()
+    return jsonify({'status': 'reset', 'session': session_id})
+
+def audio_body(chunks, fmt, route, started, on_close=None):
+    """Chunked WAV body: streaming header + each chunk as soon as it is produced
+
+    The header goes out together with the first audio, so the response's first byte
+    is real audio and its time-to-first-byte is what the client waits to start playing.
+    """
+    header = wav_header(XTTS_SAMPLERATE, fmt)
+    sent = 0
+    try:
+        for chunk in chunks:
+            data = encode_audio(chunk, fmt)
+            if not data:
+                continue
+            if header is not None:
+                ttfb = time.perf_counter() - started
+                metrics.AUDIO_STREAM_TTFB.observe(ttfb, route=route)
+                print(f"⏱️ Primeiro byte de áudio ({route}, {fmt}) em {ttfb:.2f}s")
+                data = header + data
+                header = None
+            sent += len(data)
+            yield data
+        if header is not None:
+            # No audio at all: still a valid (empty) WAV
+            sent += len(header)
+            yield header
+    finally:
+        # Also runs when the client disconnects mid-stream
+        if hasattr(chunks, 'close'):
+            chunks.close()
+        metrics.AUDIO_STREAM_BYTES.inc(sent, format=fmt)
+        if on_close is not None:
+            on_close()
+
+def audio_headers(fmt):
+    return {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # no proxy buffering (nginx)
+        'X-Audio-Format': fmt,
+        'X-Sample-Rate': str(XTTS_SAMPLERATE),
+        'Access-Control-Expose-Headers': 'X-Audio-Format, X-Sample-Rate',
+    }
+
+def audio_response(chunks, fmt, route, started, on_close=None):
+    """Streamed WAV response (see audio_body)"""
+    return Response(audio_body(chunks, fmt, route, started, on_close), mimetype='audio/wav',
+                    headers=audio_headers(fmt))
+
+def audio_format(value):
+    """Validated audio format of a streamed answer (raises ValueError)"""
+    fmt = value or 'pcm16'
+    if fmt not in AUDIO_FORMATS:
+        raise ValueError(f"Formato de áudio inválido: {fmt} (use {', '.join(AUDIO_FORMATS)})")
+    return fmt
+
+def start_speech(data):
+    """Validate a /speak body and start the synthesis (raises ValueError / QueueFull)
+
+    Returns the audio chunks, the format and the synthesis' CancelToken.
+    """
+    text = (data.get('text') or '').strip()
+    if not text:
+        raise ValueError('Nenhum texto recebido')
+    fmt = audio_format(data.get('format'))
+    scheduler.check_admission()
+    cancel = CancelToken()
+    chunks = synthesize_segments(split_text(text, max_chars=XTTS_MAX_CHARS), cancel=cancel)
+    return chunks, fmt, cancel
+
+@app.route('/speak', methods=['POST'])
+def speak():
+    """Synthesize text and stream it to the client as chunked WAV while XTTS produces it"""
+    started = time.perf_counter()
+    try:
+        chunks, fmt, cancel = start_speech(request.get_json(silent=True) or {})
+    except QueueFull as e:
+        return too_busy(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # A client that disconnects stops the synthesis at the next chunk
+    return audio_response(chunks, fmt, 'speak', started, on_close=lambda: cancel.cancel('cliente desconectou'))
+
+def on_stage_error(job, error):
+    """Any stage failure ends the job and is reported on its session"""
+    if isinstance(error, Cancelled):
+        # /voice/cancel or barge-in already updated the session
+        return
+    metrics.ERRORS.inc(stage=job.stage or 'unknown')
+    close_audio_relay(job)
+    scheduler.finish(job, status='failed', error=str(error))
+    update_state(
+        job.session_id,
+        is_recording=False,
+        is_processing=False,
+        is_speaking=False,
+        error=str(error)
+    )
+
+def stt_stage(job):
+    """Wait for the capture to end, then transcribe it"""
+    session_id = job.session_id
+    capture = job['capture']
+    transcriber = job['transcriber']
+    capture.finished.wait()
+    job['cancel'].check()
+    
+    # Reject silent/noise-only captures before invoking Whisper
+    if not capture.has_speech:
+        if transcriber is not None:
+            transcriber.stop()
+        scheduler.finish(job, status='no_speech')
+        update_state(
+            session_id,
+            is_processing=False,
+            audio_buffer=None,
+            transcriber=None,
+            error='Nenhuma fala detectada'
+        )
+        return
+    
+    latency = endpoint_latency(capture)
+    print(f"⏱️ [{session_id}] Fim da fala → STT: {latency:.2f}s")
+    update_state(session_id, endpoint_latency=latency)
+    
+    # Speech to text (direto do buffer em memória)
+    if transcriber is not None:
+        # Only the unstable tail is still left to decode
+        with metrics.STT_LATENCY.time(mode='streaming'):
+            transcription = transcriber.finalize()
+    else:
+        audio = capture.speech_audio() if job['record_mode'] == 'vad' else capture.audio
+        transcription = speech_to_text(audio)
+    # Whisper itself can't be interrupted: drop the result if the turn was cancelled meanwhile
+    job['cancel'].check()
+    update_state(
+        session_id,
+        last_transcription=transcription,
+        partial_transcription=transcription,
+        audio_buffer=None,
+        transcriber=None
+    )
+    
+    if not transcription.strip():
+        scheduler.finish(job, status='no_speech')
+        update_state(
+            session_id,
+            is_processing=False,
+            error='Nenhuma fala detectada'
+        )
+        return
+    
+    job['transcription'] = transcription
+    scheduler.forward(job, 'llm')
+
+def llm_stage(job):
+    """Stream the LLM answer; TTS starts as soon as the first sentence is ready"""
+    session_id = job.session_id
+    segments = []
+    job['segments'] = queue.Queue()
+    
+    def on_segment(segment):
+        if not segments:
+            scheduler.forward(job, 'tts')
+        segments.append(segment)
+        job['segments'].put(segment)
+        update_state(session_id, last_response=' '.join(segments))
+    
+    try:
+        response = ask_llm(
+            job['transcription'],
+            on_segment=on_segment,
+            conversation=job['conversation'],
+            cancel=job['cancel']
+        )
+    finally:
+        job['segments'].put(None)
+    update_state(session_id, last_response=response)
+    
+    if not segments:
+        close_audio_relay(job)
+        scheduler.finish(job)
+        update_state(session_id, is_processing=False)
+
+# One streaming player per TTS worker thread
+_players = threading.local()
+
+def tts_stage(job):
+    """Synthesize the segments of a job in order and play them (or relay them to the client)"""
+    session_id = job.session_id
+    cancel = job['cancel']
+    relay = job['audio_relay']
+    
+    def chunks():
+        first = True
+        for chunk in synthesize_segments(iter(job['segments'].get, None), cancel=cancel):
+            if first:
+                # End-to-end turn: end of user speech → first answer audio
+                metrics.TURN_LATENCY.observe(endpoint_latency(job['capture']))
+                update_state(
+                    session_id,
+                    is_processing=False,
+                    is_speaking=True
+                )
+                if job['barge_in']:
+                    start_barge_in_monitor(job)
+                first = False
+            yield chunk
+    
+    if relay is not None:
+        # Client playback: /voice/audio sends each chunk as soon as XTTS produces it
+        try:
+            for chunk in chunks():
+                relay.put(chunk)
+        finally:
+            relay.close()
+        if cancel.cancelled:
+            return
+        print(f"⏱️ [{session_id}] Áudio da resposta enviado ao cliente")
+        scheduler.finish(job)
+        update_state(
+            session_id,
+            is_processing=False,
+            is_speaking=False
+        )
+        return
+    
+    if not hasattr(_players, 'player'):
+        _players.player = StreamingPlayer(samplerate=XTTS_SAMPLERATE)
     try:
-        state = get_state()
+        stats = _players.player.play_stream(chunks(), cancel=cancel)
+    finally:
+        stop_barge_in_monitor(job)
+    if cancel.cancelled:
+        return
+    if stats.duration:
+        metrics.PLAYBACK_DURATION.observe(stats.duration)
+    print(f"⏱️ [{session_id}] Primeiro áudio em {stats.time_to_first_audio:.2f}s, "
+          f"underruns: {stats.underruns} ({stats.backend})")
+    scheduler.finish(job)
+    update_state(
+        session_id,
+        is_processing=False,
+        is_speaking=False
+    )
+
+def start_barge_in_monitor(job):
+    """Listen while the answer plays; confirmed user speech cancels it and becomes the next turn"""
+    session_id = job.session_id
+    capture = new_capture(RECORD_SECS, 'vad')
+    capture.min_speech_ms = BARGE_IN_MIN_SPEECH_MS
+    stop_event = threading.Event()
+    job['barge_in_stop'] = stop_event
+    
+    def on_speech():
+        # Atomic hand-over: either the answer ended first, or this capture becomes the new turn
+        with sessions.locked(session_id) as state:
+            if state['job'] is not job or stop_event.is_set():
+                return
+            state.update(
+                is_recording=True,
+                is_processing=False,
+                is_speaking=False,
+                last_transcription='',
+                partial_transcription='',
+                last_response='',
+                audio_buffer=capture,
+                stop_event=stop_event,
+                record_mode='vad',
+                stt_mode='batch',
+                transcriber=None,
+                endpoint_latency=None,
+                job=None,
+                error=None
+            )
+        print(f"🗣️ [{session_id}] Barge-in: resposta interrompida")
+        metrics.BARGE_INS.inc()
+        job['cancel'].cancel('barge-in')
+        scheduler.finish(job, status='interrupted')
+        publish_changes(session_id, {'is_recording': True})
+    
+    # Keeps listening for the whole answer (no silence timeout); VAD then ends the new turn
+    threading.Thread(
+        target=record_turn,
+        args=(session_id, 'vad', capture, stop_event),
+        kwargs={'on_speech': on_speech, 'no_speech_timeout_ms': MAX_RECORD_SECS * 1000},
+        daemon=True
+    ).start()
+
+def close_audio_relay(job):
+    """End the client audio stream of a turn that produces no (more) audio"""
+    relay = job.get('audio_relay')
+    if relay is not None and not relay.closed:
+        relay.close()
+
+def stop_barge_in_monitor(job):
+    """Stop listening unless the monitor already took over as the next turn"""
+    stop_event = job.get('barge_in_stop')
+    if stop_event is None:
+        return
+    with sessions.locked(job.session_id) as state:
+        if state['stop_event'] is not stop_event:
+            stop_event.set()
+
+# Staged pipeline: STT pool → LLM I/O pool → TTS pool
+scheduler = StagedScheduler(max_inflight=MAX_INFLIGHT_JOBS)
+scheduler.add_stage('stt', stt_stage, workers=STT_WORKERS, max_queue=STAGE_QUEUE_SIZE, on_error=on_stage_error)
+scheduler.add_stage('llm', llm_stage, workers=LLM_WORKERS, max_queue=STAGE_QUEUE_SIZE * 2, on_error=on_stage_error)
+scheduler.add_stage('tts', tts_stage, workers=TTS_WORKERS, max_queue=STAGE_QUEUE_SIZE, on_error=on_stage_error)
+
+def begin_processing(session_id):
+    """Move from recording to processing exactly once per turn (may raise QueueFull)"""
+    with sessions.locked(session_id) as state:
+        if state['is_processing'] or state['audio_buffer'] is None:
+            return None
+        job = Job(
+            session_id,
+            capture=state['audio_buffer'],
+            transcriber=state['transcriber'],
+            record_mode=state['record_mode'],
+            conversation=state['conversation'],
+            barge_in=state['barge_in'],
+            audio_relay=AudioRelay() if state['audio_output'] == 'client' else None,
+            cancel=CancelToken()
+        )
+        stop_event = state['stop_event']
+        state.update(is_recording=False, is_processing=True, job=job)
+    publish_changes(session_id, {'is_processing': True})
+    if stop_event is not None:
+        stop_event.set()
+    try:
+        scheduler.submit(job)
+    except QueueFull:
+        if job['transcriber'] is not None:
+            job['transcriber'].stop()
+        update_state(
+            session_id,
+            is_processing=False,
+            audio_buffer=None,
+            transcriber=None,
+            error='Servidor ocupado, tente novamente'
+        )
+        raise
+    return job
+
+def record_turn(session_id, mode, capture, stop_event, **record_kwargs):
+    """Record one turn into `capture` (background thread); VAD mode ends the turn by itself"""
+    try:
+        # Record audio into the in-memory capture buffer
+        record(RECORD_SECS, mode=mode, capture=capture, stop_event=stop_event, **record_kwargs)
         
-        if state['is_recording'] or state['is_processing']:
-            return jsonify({'error': 'Gravação já ativa'}), 400
+        # VAD mode ends the turn by itself (if this capture is still the session's turn)
+        if mode == 'vad' and not stop_event.is_set() and get_state(session_id)['audio_buffer'] is capture:
+            begin_processing(session_id)
         
+    except QueueFull:
+        pass
+    except Exception as e:
+        capture.finish()
         update_state(
+            session_id,
+            is_recording=False,
+            error=str(e)
+        )
+
+def open_turn(session_id, data, upload_format=None):
+    """Validate the turn options and switch the session to recording (raises ValueError / QueueFull)
+
+    With `upload_format`, the audio comes from the client (see /voice/upload) instead of the microphone.
+    """
+    mode = data.get('mode', RECORD_MODE)
+    if mode not in RECORD_MODES:
+        raise ValueError(f'Modo inválido: {mode}')
+    stt_mode = data.get('stt', STT_MODE)
+    if stt_mode not in STT_MODES:
+        raise ValueError(f'Modo de STT inválido: {stt_mode}')
+    barge_in = bool(data.get('bargeIn', BARGE_IN))
+    # A browser that captures the audio usually wants to hear the answer too
+    audio_output = data.get('audioOutput', 'client' if upload_format is not None else 'server')
+    if audio_output not in AUDIO_OUTPUTS:
+        raise ValueError(f'Saída de áudio inválida: {audio_output}')
+    if audio_output == 'client':
+        # Barge-in stops the server player, which this turn doesn't use
+        barge_in = False
+    
+    # Refuse new turns early when the pipeline is already saturated
+    scheduler.check_admission()
+    
+    capture = new_capture(RECORD_SECS, mode)
+    stop_event = threading.Event()
+    upload = None
+    if upload_format is not None:
+        upload = ClientAudioStream(
+            capture,
+            upload_format,
+            mode=mode,
+            seconds=RECORD_SECS,
+            detector=VAD_DETECTOR,
+            hangover_ms=VAD_HANGOVER_MS,
+            on_end=lambda: end_upload_turn(session_id, capture)
+        )
+        # Barge-in listens on the server microphone, which a remote client doesn't use
+        barge_in = False
+    transcriber = None
+    if stt_mode == 'streaming':
+        transcriber = IncrementalTranscriber(
+            transcribe_words,
+            capture,
+            interval=STT_PARTIAL_INTERVAL,
+            on_partial=lambda text: update_state(session_id, partial_transcription=text)
+        )
+    
+    with sessions.locked(session_id) as state:
+        if state['is_recording'] or state['is_processing']:
+            raise ValueError('Gravação já ativa')
+        state.update(
             is_recording=True,
             is_processing=False,
             is_speaking=False,
             last_transcription='',
+            partial_transcription='',
             last_response='',
+            audio_buffer=capture,
+            stop_event=stop_event,
+            upload=upload,
+            record_mode=mode,
+            stt_mode=stt_mode,
+            barge_in=barge_in,
+            audio_output=audio_output,
+            transcriber=transcriber,
+            endpoint_latency=None,
+            job=None,
             error=None
         )
-        
-        def record_audio():
-            try:
-                # Record audio
-                audio_file = record(RECORD_SECS)
-                update_state(audio_file=audio_file)
-                
-            except Exception as e:
-                update_state(
-                    is_recording=False,
-                    error=str(e)
-                )
+    publish_changes(session_id, {'is_recording': True})
+    return {
+        'mode': mode,
+        'stt': stt_mode,
+        'bargeIn': barge_in,
+        'audioOutput': audio_output,
+        'capture': capture,
+        'stop_event': stop_event,
+        'transcriber': transcriber,
+        'upload': upload
+    }
+
+@app.route('/voice/start', methods=['POST'])
+def start_voice_recording():
+    """Start voice recording"""
+    try:
+        session_id = current_session_id()
+        turn = open_turn(session_id, request.get_json(silent=True) or {})
         
         # Start recording in background
-        threading.Thread(target=record_audio, daemon=True).start()
+        threading.Thread(
+            target=record_turn,
+            args=(session_id, turn['mode'], turn['capture'], turn['stop_event']),
+            daemon=True
+        ).start()
+        if turn['transcriber'] is not None:
+            turn['transcriber'].start()
         
         return jsonify({
             'message': 'Gravação iniciada',
-            'duration': RECORD_SECS
+            'session': session_id,
+            'mode': turn['mode'],
+            'stt': turn['stt'],
+            'bargeIn': turn['bargeIn'],
+            'audioOutput': turn['audioOutput'],
+            'duration': RECORD_SECS if turn['mode'] == 'fixed' else MAX_RECORD_SECS
+        })
+        
+    except QueueFull as e:
+        return too_busy(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def end_upload_turn(session_id, capture):
+    """The client's audio ended the turn (VAD, duration limit, end of upload or idle client)"""
+    if get_state(session_id)['audio_buffer'] is not capture:
+        return
+    try:
+        begin_processing(session_id)
+    except QueueFull:
+        pass
+
+def upload_turn(session_id, upload, stop_event):
+    """Close the client stream once the turn ends; a client that stops sending ends it too"""
+    while not stop_event.wait(0.5):
+        if upload.idle_secs > UPLOAD_IDLE_SECS:
+            print(f"⏱️ [{session_id}] Cliente parou de enviar áudio, encerrando o turno")
+            end_upload_turn(session_id, upload.capture)
+            break
+    upload.close()
+
+@app.route('/voice/upload/start', methods=['POST'])
+def start_voice_upload():
+    """Start a turn whose audio is captured by the client and uploaded to /voice/upload"""
+    try:
+        session_id = current_session_id()
+        data = request.get_json(silent=True) or {}
+        upload_format = data.get('format', 'pcm16')
+        turn = open_turn(session_id, data, upload_format=upload_format)
+        
+        threading.Thread(
+            target=upload_turn,
+            args=(session_id, turn['upload'], turn['stop_event']),
+            daemon=True
+        ).start()
+        if turn['transcriber'] is not None:
+            turn['transcriber'].start()
+        
+        return jsonify({
+            'message': 'Envio de áudio iniciado',
+            'session': session_id,
+            'format': upload_format,
+            'sampleRate': SAMPLERATE,
+            'mode': turn['mode'],
+            'stt': turn['stt'],
+            'audioOutput': turn['audioOutput'],
+            'duration': RECORD_SECS if turn['mode'] == 'fixed' else MAX_RECORD_SECS
         })
         
+    except QueueFull as e:
+        return too_busy(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/voice/upload', methods=['POST'])
+def upload_voice_audio():
+    """Append client audio to the current turn (one streamed body or many short ones, in order)
+
+    `?end=1` ends the turn after this body, like /voice/stop.
+    """
+    try:
+        session_id = current_session_id()
+        upload = get_state(session_id)['upload']
+        if upload is None:
+            return jsonify({'error': 'Nenhum envio de áudio ativo'}), 400
+        
+        # Decoded block by block straight into the turn's buffer while the body arrives
+        while not upload.finished:
+            block = request.stream.read(UPLOAD_BLOCK_BYTES)
+            if not block:
+                break
+            upload.feed(block)
+        
+        if request.args.get('end') == '1':
+            end_upload_turn(session_id, upload.capture)
+        return jsonify(upload.stats())
+        
+    except QueueFull as e:
+        return too_busy(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        update_state(is_recording=False, error=str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/voice/stop', methods=['POST'])
 def stop_voice_recording():
     """Stop voice recording and process"""
     try:
-        state = get_state()
+        session_id = current_session_id()
+        state = get_state(session_id)
         
-        if not state['is_recording'] and not state['audio_file']:
+        if not state['is_recording'] and state['audio_buffer'] is None:
             return jsonify({'error': 'Nenhuma gravação ativa'}), 400
         
-        update_state(
-            is_recording=False,
-            is_processing=True
-        )
-        
-        def process_audio():
-            try:
-                state = get_state()
-                audio_file = state['audio_file']
-                
-                if not audio_file or not os.path.exists(audio_file):
-                    update_state(
-                        is_processing=False,
-                        error='Arquivo de áudio não encontrado'
-                    )
-                    return
-                
-                # Speech to text
-                transcription = speech_to_text(audio_file)
-                update_state(last_transcription=transcription)
-                
-                # Clean up audio file
-                try:
-                    os.remove(audio_file)
-                except:
-                    pass
-                
-                if not transcription.strip():
-                    update_state(
-                        is_processing=False,
-                        error='Nenhuma fala detectada'
-                    )
-                    return
-                
-                # Get LLM response
-                response = ask_llm(transcription)
-                update_state(last_response=response)
-                
-                # Speak response
-                update_state(
-                    is_processing=False,
-                    is_speaking=True
-                )
-                
-                say_text(response)
-                
-                update_state(is_speaking=False)
-                
-            except Exception as e:
-                update_state(
-                    is_recording=False,
-                    is_processing=False,
-                    is_speaking=False,
-                    error=str(e)
-                )
-        
-        # Process in background
-        threading.Thread(target=process_audio, daemon=True).start()
+        # Stops the capture early and queues it for processing
+        job = begin_processing(session_id)
+        if job is None:
+            job = state['job']
+            return jsonify({
+                'message': 'Processamento já iniciado',
+                'jobId': job.id if job else None
+            })
         
         return jsonify({
-            'message': 'Processamento iniciado'
+            'message': 'Processamento iniciado',
+            'jobId': job.id
         })
         
+    except QueueFull as e:
+        return too_busy(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         update_state(
+            session_id,
             is_recording=False,
             is_processing=False,
             error=str(e)
@@ -203,43 +904,114 @@ def stop_voice_recording():
 @app.route('/voice/status', methods=['GET'])
 def get_voice_status():
     """Get current voice recording status"""
-    state = get_state()
-    return jsonify({
-        'recording': state['is_recording'],
-        'processing': state['is_processing'],
-        'speaking': state['is_speaking'],
-        'lastTranscription': state['last_transcription'],
-        'lastResponse': state['last_response'],
-        'error': state['error'],
-        'timestamp': time.time()
-    })
+    try:
+        session_id = current_session_id()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(public_status(session_id, get_state(session_id)))
+
+@app.route('/voice/events', methods=['GET'])
+def voice_events():
+    """Server-Sent Events stream of the session's state transitions"""
+    try:
+        session_id = current_session_id()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    initial = ('status', public_status(session_id, get_state(session_id)))
+    return Response(
+        events.stream(session_id, initial=initial),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/voice/audio', methods=['GET'])
+def voice_audio():
+    """Stream the answer audio of the current turn (turns started with audioOutput=client)"""
+    started = time.perf_counter()
+    try:
+        session_id = current_session_id()
+        fmt = audio_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    job = get_state(session_id)['job']
+    relay = job.get('audio_relay') if job is not None else None
+    if relay is None:
+        return jsonify({'error': 'Nenhuma resposta em áudio para este turno'}), 404
+    return audio_response(relay.chunks(timeout=AUDIO_RELAY_TIMEOUT), fmt, 'voice_audio', started)
+
+@app.route('/voice/queues', methods=['GET'])
+def get_queue_status():
+    """Stage pool and queue depths of the voice pipeline"""
+    stats = scheduler.stats()
+    stats['sessions'] = len(sessions)
+    if stt_batcher is not None:
+        stats['stt_batching'] = stt_batcher.stats()
+    stats['tts_cache'] = tts_cache.stats()
+    tts_pool = models.try_get('xtts_pool', timeout=0)
+    if tts_pool is not None:
+        stats['tts_pool'] = tts_pool.stats()
+    if llm_cache is not None:
+        stats['llm_cache'] = llm_cache.stats()
+    return jsonify(stats)
+
+@app.route('/cpu', methods=['GET'])
+def get_cpu_allocation():
+    """Cores and PyTorch threads assigned to each stage"""
+    return jsonify(cpu_budgets.allocation())
+
+@app.route('/cpu/profile', methods=['POST'])
+def set_cpu_profile():
+    """Switch the CPU partitioning profile (off / latency / throughput)"""
+    data = request.get_json(silent=True) or {}
+    try:
+        cpu_budgets.set_profile(data.get('profile', ''))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(cpu_budgets.allocation())
 
 @app.route('/voice/cancel', methods=['POST'])
 def cancel_voice_operation():
     """Cancel current voice operation"""
     try:
-        state = get_state()
+        session_id = current_session_id()
+        state = get_state(session_id)
         
-        # Clean up audio file if exists
-        if state['audio_file'] and os.path.exists(state['audio_file']):
-            try:
-                os.remove(state['audio_file'])
-            except:
-                pass
+        # Stop an ongoing microphone capture and partial transcription
+        if state['stop_event'] is not None:
+            state['stop_event'].set()
+        if state['transcriber'] is not None:
+            state['transcriber'].stop()
+        if state['job'] is not None:
+            # Aborts the LLM stream, the XTTS generator and playback of this turn
+            state['job']['cancel'].cancel()
+            close_audio_relay(state['job'])
+            scheduler.finish(state['job'], status='cancelled')
         
         update_state(
+            session_id,
             is_recording=False,
             is_processing=False,
             is_speaking=False,
-            audio_file=None,
+            audio_buffer=None,
+            upload=None,
+            transcriber=None,
             error=None
         )
         
         return jsonify({'message': 'Operação cancelada'})
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def after_fork():
+    """gunicorn post_fork hook: threads started at import time don't survive the fork"""
+    scheduler.after_fork()
+    voice_after_fork()
+    print(f"👷 Worker {os.getpid()} pronto para receber requisições (warm-up em andamento)")
+
 if __name__ == "__main__":
     port = int(os.getenv("FLASK_RUN_PORT", 8080))
     print("🚀 Starting Voice Assistant Backend Server...")
@@ -250,4 +1022,8 @@ if __name__ == "__main__":
     print("   npm start")
     print("\n✅ Usando servidor personalizado: https://gpt-proxy.ahvideoscdn.net/v1")
     
-    app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
+    # The debug reloader would start a second process and load every model again
+    debug = os.getenv("FLASK_DEBUG", "0") == "1"
+    if debug:
+        print("⚠️ FLASK_DEBUG=1: modo debug sem reloader (produção: gunicorn -c gunicorn.conf.py wsgi:app)")
+    app.run(host="0.0.0.0", port=port, debug=debug, use_reloader=False, threaded=True)
\ No newline at end of file
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline do pipeline de voz (sem rede, sem reprodução de áudio).
+
+Mede, por estágio, latência p50/p95, RTF e pico de RSS:
+  - stt:  `speech_to_text` sobre os WAVs de fixture, para cada motor × tamanho de Whisper
+  - llm:  `ask_llm` contra o servidor stub local (primeira frase e tempo total)
+  - tts:  a síntese do `say_text` (`synthesize_stream`) sem tocar o áudio
+
+Cada combinação de motor de STT e tamanho roda num subprocesso próprio, para que
+o pico de RSS seja o do processo com aquele modelo (mais o XTTS). Os modelos
+precisam estar no cache local (~/.cache/whisper, ~/.cache/huggingface para o
+faster-whisper, ~/.local/share/tts).
+
+Uso:
+    python benchmark.py --make-fixtures                 # gera bench_fixtures/ com o XTTS
+    python benchmark.py --whisper tiny,base --runs 5 --out bench.json
+    python benchmark.py --whisper base --out novo.json --compare bench.json --threshold 0.15
+    python benchmark.py --engines whisper,faster-whisper --whisper base,small   # latência/RTF/WER lado a lado
+
+Fixtures: `bench_fixtures/*.wav` (qualquer taxa, mono) com a transcrição
+esperada em `<nome>.txt` ao lado (opcional, usada para o WER).
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import scipy.io.wavfile as wav
+
+FIXTURE_DIR = "bench_fixtures"
+FIXTURE_SENTENCES = (
+    "Qual é a previsão do tempo para amanhã?",
+    "Me lembre de comprar pão e leite depois do trabalho.",
+    "Quantos quilômetros tem a distância entre Lisboa e o Porto?",
+    "Explique em poucas palavras o que é aprendizado de máquina.",
+)
+TTS_TEXTS = (
+    "Olá! Tudo bem com você?",
+    "Esta é uma frase média, usada para medir a síntese de voz do sistema.",
+)
+# Diferença absoluta mínima para contar como regressão (evita ruído em valores pequenos)
+MIN_ABS_DELTA = {"secs": 0.02, "rtf": 0.02, "mb": 20.0}
+
+
+########################
+# Estatística
+########################
+def summarize(values, rtfs=None):
+    """p50/p95/média de uma lista de latências (s) e, se houver, dos RTFs."""
+    values = np.asarray(values, dtype=np.float64)
+    summary = {
+        "n": int(len(values)),
+        "p50": round(float(np.percentile(values, 50)), 4),
+        "p95": round(float(np.percentile(values, 95)), 4),
+        "mean": round(float(values.mean()), 4),
+    }
+    if rtfs:
+        summary["rtf_p50"] = round(float(np.percentile(rtfs, 50)), 4)
+        summary["rtf_p95"] = round(float(np.percentile(rtfs, 95)), 4)
+    return summary
+
+
+def _words(text: str):
+    return re.sub(r"[^\w\s]", " ", text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """WER por distância de edição entre palavras normalizadas."""
+    ref, hyp = _words(reference), _words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1] / len(ref)
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+########################
+# Fixtures
+########################
+def load_fixtures(directory: str):
+    """[(nome, áudio float32 16 kHz, transcrição ou None)]"""
+    from scipy.signal import resample_poly
+
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        sr, audio = wav.read(path)
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1)
+        if np.issubdtype(audio.dtype, np.integer):
+            audio = audio / float(np.iinfo(audio.dtype).max)
+        audio = audio.astype(np.float32)
+        if sr != 16_000:
+            g = np.gcd(sr, 16_000)
+            audio = resample_poly(audio, 16_000 // g, sr // g).astype(np.float32)
+        txt = os.path.splitext(path)[0] + ".txt"
+        reference = open(txt, encoding="utf-8").read().strip() if os.path.exists(txt) else None
+        fixtures.append((os.path.basename(path), audio, reference))
+    return fixtures
+
+
+def make_fixtures(directory: str):
+    """Sintetiza as frases de fixture com o XTTS (16 kHz) e grava WAV + transcrição."""
+    from scipy.signal import resample_poly
+    import voice_assistant as va
+
+    va.models.get("xtts")
+    os.makedirs(directory, exist_ok=True)
+    for i, sentence in enumerate(FIXTURE_SENTENCES):
+        audio = np.concatenate(list(va.synthesize_stream(sentence)))
+        audio = resample_poly(audio, 2, 3).astype(np.float32)  # 24 kHz -> 16 kHz
+        name = os.path.join(directory, f"pt_{i:02d}")
+        wav.write(name + ".wav", 16_000, audio)
+        with open(name + ".txt", "w", encoding="utf-8") as f:
+            f.write(sentence + "\n")
+        print(f"💾 {name}.wav ({len(audio) / 16_000:.1f}s)")
+
+
+########################
+# Estágios (rodam no subprocesso)
+########################
+def bench_stt(va, fixtures, runs):
+    latencies, rtfs, wers = [], [], []
+    for _ in range(runs):
+        for name, audio, reference in fixtures:
+            start = time.perf_counter()
+            text = va.speech_to_text(audio)
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            rtfs.append(elapsed / (len(audio) / va.SAMPLERATE))
+            if reference is not None:
+                wers.append(word_error_rate(reference, text))
+    result = summarize(latencies, rtfs)
+    if wers:
+        result["wer"] = round(float(np.mean(wers)), 4)
+    return result
+
+
+def bench_llm(va, runs, ttft, token_delay):
+    from stub_llm_server import start_stub_server
+
+    server, base_url = start_stub_server(port=0, ttft=ttft, token_delay=token_delay)
+    va.openai.api_base = base_url
+    first, total = [], []
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            segment_times = []
+            va.ask_llm(FIXTURE_SENTENCES[0], on_segment=lambda s: segment_times.append(time.perf_counter()))
+            total.append(time.perf_counter() - start)
+            if segment_times:
+                # Primeira frase completa: é quando o TTS pode começar
+                first.append(segment_times[0] - start)
+    finally:
+        server.shutdown()
+    return {"first_segment": summarize(first) if first else None, "total": summarize(total)}
+
+
+def bench_tts(va, runs):
+    first, total, rtfs = [], [], []
+    for _ in range(runs):
+        for text in TTS_TEXTS:
+            start = time.perf_counter()
+            samples = 0
+            for chunk in va.synthesize_stream(text, use_cache=False):
+                if samples == 0:
+                    first.append(time.perf_counter() - start)
+                samples += len(chunk)
+            elapsed = time.perf_counter() - start
+            total.append(elapsed)
+            if samples:
+                rtfs.append(elapsed / (samples / va.XTTS_SAMPLERATE))
+    return {"first_chunk": summarize(first), "total": summarize(total, rtfs)}
+
+
+def run_worker(args):
+    """Executa os estágios pedidos neste processo e grava o JSON em `args.result`."""
+    import voice_assistant as va
+
+    va.models.wait_ready()
+    stages = set(args.stages.split(","))
+    result = {"whisper": va.WHISPER_MODEL, "engine": va.STT_ENGINE, "models": va.models.status(), "stages": {}}
+    if "stt" in stages:
+        fixtures = load_fixtures(args.fixtures)
+        if fixtures:
+            result["stages"]["stt"] = bench_stt(va, fixtures, args.runs)
+        else:
+            print(f"⚠️ Nenhum WAV em {args.fixtures}/ (use --make-fixtures)")
+    if "llm" in stages:
+        result["stages"]["llm"] = bench_llm(va, args.runs, args.ttft, args.token_delay)
+    if "tts" in stages:
+        result["stages"]["tts"] = bench_tts(va, args.runs)
+    result["peak_rss_mb"] = peak_rss_mb()
+    with open(args.result, "w") as f:
+        json.dump(result, f)
+
+
+########################
+# Orquestração e comparação
+########################
+def run_all(args):
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "runs": args.runs,
+            "llm_ttft": args.ttft,
+            "llm_token_delay": args.token_delay,
+        },
+        "runs": {},
+    }
+    combos = [(engine, size) for engine in args.engines.split(",") for size in args.whisper.split(",")]
+    for i, (engine, size) in enumerate(combos):
+        # LLM e TTS não dependem do Whisper: medidos só no primeiro subprocesso
+        stages = "stt,llm,tts" if i == 0 else "stt"
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            result_path = tmp.name
+        # Sem cache de respostas: as repetições da mesma pergunta mediriam o cache, não o servidor
+        env = dict(os.environ, WHISPER_MODEL=size, STT_ENGINE=engine, STT_BATCH_SIZE="1", LLM_CACHE_TTL="0")
+        cmd = [
+            sys.executable, os.path.abspath(__file__), "--worker",
+            "--result", result_path, "--stages", stages, "--fixtures", args.fixtures,
+            "--runs", str(args.runs), "--ttft", str(args.ttft), "--token-delay", str(args.token_delay),
+        ]
+        print(f"▶️ {engine} {size}: {stages}")
+        subprocess.run(cmd, env=env, check=True)
+        with open(result_path) as f:
+            report["runs"][f"{engine}-{size}"] = json.load(f)
+        os.unlink(result_path)
+    return report
+
+
+def _flatten(report):
+    """{(run, caminho da métrica): (valor, unidade)} para a comparação."""
+    flat = {}
+    for run, result in report["runs"].items():
+        flat[(run, "peak_rss_mb")] = (result["peak_rss_mb"], "mb")
+
+        def walk(prefix, node):
+            for key, value in (node or {}).items():
+                if isinstance(value, dict):
+                    walk(f"{prefix}.{key}", value)
+                elif key in ("p50", "p95"):
+                    flat[(run, f"{prefix}.{key}")] = (value, "secs")
+                elif key.startswith("rtf_"):
+                    flat[(run, f"{prefix}.{key}")] = (value, "rtf")
+
+        walk("stages", result["stages"])
+    return flat
+
+
+def compare(current, baseline, threshold: float):
+    """Lista de regressões (valor atual pior que baseline × (1 + threshold))."""
+    regressions = []
+    base = _flatten(baseline)
+    for key, (value, unit) in _flatten(current).items():
+        if key not in base or value is None or base[key][0] is None:
+            continue
+        old = base[key][0]
+        if value > old * (1 + threshold) and value - old > MIN_ABS_DELTA[unit]:
+            regressions.append({
+                "run": key[0], "metric": key[1], "baseline": old, "current": value,
+                "change": round((value - old) / old, 3) if old else None,
+            })
+    return regressions
+
+
+def print_report(report):
+    for run, result in report["runs"].items():
+        print(f"\n📊 {run} (pico RSS {result['peak_rss_mb']} MB)")
+        for stage, summary in result["stages"].items():
+            print(f"   {stage}: {json.dumps(summary, ensure_ascii=False)}")
+
+
+def print_stt_comparison(report):
+    """Tabela de STT entre motores/tamanhos do mesmo relatório (speedup contra a primeira linha)."""
+    rows = [(run, result) for run, result in report["runs"].items() if "stt" in result["stages"]]
+    if len(rows) < 2:
+        return
+    base_p50 = rows[0][1]["stages"]["stt"]["p50"]
+    print(f"\n🏁 STT ({rows[0][0]} = 1.0x)")
+    print(f"   {'motor-tamanho':<22}{'p50 s':>8}{'p95 s':>8}{'RTF p50':>9}{'WER':>8}{'RSS MB':>9}{'speedup':>9}")
+    for run, result in rows:
+        stt = result["stages"]["stt"]
+        wer = f"{stt['wer']:.3f}" if "wer" in stt else "-"
+        speedup = f"{base_p50 / stt['p50']:.1f}x" if stt["p50"] else "-"
+        print(f"   {run:<22}{stt['p50']:>8.3f}{stt['p95']:>8.3f}{stt['rtf_p50']:>9.3f}{wer:>8}"
+              f"{result['peak_rss_mb']:>9.0f}{speedup:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline de voz")
+    parser.add_argument("--whisper", default="base", help="tamanhos separados por vírgula (tiny,base,small…)")
+    parser.add_argument("--engines", default="whisper",
+                        help="motores de STT separados por vírgula (whisper,faster-whisper)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--ttft", type=float, default=0.2, help="latência do primeiro token no stub (s)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="latência por token no stub (s)")
+    parser.add_argument("--out", help="grava o relatório JSON neste arquivo")
+    parser.add_argument("--compare", help="baseline JSON para detectar regressões")
+    parser.add_argument("--threshold", type=float, default=0.10, help="piora relativa tolerada (0.10 = 10%%)")
+    parser.add_argument("--make-fixtures", action="store_true", help="gera os WAVs de fixture com o XTTS")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    parser.add_argument("--stages", default="stt,llm,tts", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+    if args.make_fixtures:
+        make_fixtures(args.fixtures)
+        return
+
+    report = run_all(args)
+    print_report(report)
+    print_stt_comparison(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Relatório salvo em {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressão(ões) acima de {args.threshold:.0%}:")
+            for r in regressions:
+                print(f"   {r['run']} {r['metric']}: {r['baseline']} → {r['current']}")
+            sys.exit(1)
+        print(f"\n✅ Sem regressões acima de {args.threshold:.0%} em relação a {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
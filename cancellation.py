@@ -0,0 +1,69 @@
+"""
+Cancelamento cooperativo de um turno (STT → LLM → TTS → reprodução).
+
+Um `CancelToken` acompanha o turno. Cada estágio confere `cancelled` entre
+unidades de trabalho (evento do stream do LLM, chunk do XTTS, bloco de
+áudio) e levanta `Cancelled`; quem está bloqueado em I/O registra um
+callback com `on_cancel` (ex.: fechar o stream HTTP, parar o dispositivo).
+O token também serve onde se espera um `threading.Event` (`is_set`/`wait`).
+"""
+
+import threading
+
+
+class Cancelled(Exception):
+    """O turno foi cancelado (pelo usuário ou por barge-in)."""
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self.reason = None
+
+    def cancel(self, reason: str = "cancelled"):
+        """Cancela (idempotente) e dispara os callbacks registrados."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Callback de cancelamento falhou: {e}")
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._event.wait(timeout)
+
+    def check(self):
+        """Levanta `Cancelled` se o token já foi cancelado."""
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+    def on_cancel(self, callback):
+        """Registra `callback()` para o cancelamento; retorna uma função que desfaz o registro.
+
+        Se o token já estiver cancelado, o callback roda imediatamente.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
@@ -0,0 +1,181 @@
+"""
+Áudio capturado no navegador e enviado ao servidor em pedaços.
+
+O microfone do servidor (`sounddevice`) só atende uma pessoa numa máquina.
+Aqui o cliente grava e envia o áudio por HTTP (um corpo em streaming ou
+vários POSTs curtos, na ordem), e cada pedaço é decodificado direto no
+buffer pré-alocado do `Capture` do turno, sem arquivos temporários. A partir
+daí o turno segue igual ao do microfone: mesmo VAD/endpointing
+(`TurnDetector`) e o mesmo `speech_to_text`.
+
+Formatos:
+- pcm16: PCM 16 bits little-endian, mono, 16 kHz (AudioContext a 16 kHz no navegador)
+- webm / ogg: Opus do MediaRecorder, decodificado com PyAV (pip install av)
+  numa thread que lê de um pipe em memória
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from audio_capture import Capture, TurnDetector
+
+try:
+    import av
+except ImportError:
+    av = None
+
+FORMATS = ("pcm16", "webm", "ogg")
+
+
+class _BytePipe:
+    """Arquivo só-leitura em memória: `read` bloqueia até chegarem bytes ou o pipe fechar."""
+
+    def __init__(self):
+        self._chunks = []
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def write(self, data: bytes):
+        with self._cond:
+            self._chunks.append(bytes(data))
+            self._size += len(data)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def read(self, n: int = -1) -> bytes:
+        with self._cond:
+            while not self._size and not self._closed:
+                self._cond.wait()
+            data = b"".join(self._chunks)
+            if 0 <= n < len(data):
+                self._chunks = [data[n:]]
+                data = data[:n]
+            else:
+                self._chunks = []
+            self._size -= len(data)
+            return data
+
+
+class ClientAudioStream:
+    """Decodifica o áudio enviado pelo cliente para um `Capture`, com VAD e fim de turno."""
+
+    def __init__(self, capture: Capture, fmt: str = "pcm16", mode: str = "fixed", seconds: float = 4,
+                 detector: str = "energy", hangover_ms: int = 700, no_speech_timeout_ms: int = 5000,
+                 on_end=None):
+        """`on_end()` é chamado uma vez quando o turno termina pelo áudio (VAD, duração ou buffer cheio)."""
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato de áudio inválido: {fmt} (use {', '.join(FORMATS)})")
+        if fmt != "pcm16" and av is None:
+            raise ValueError("Áudio Opus requer PyAV no servidor (pip install av); envie pcm16")
+        self.capture = capture
+        self.format = fmt
+        self.mode = mode
+        self.max_samples = int(seconds * capture.samplerate) if mode == "fixed" else None
+        self.on_end = on_end
+        self.bytes_received = 0
+        self.last_data = time.monotonic()
+        self.error = None
+        self.ended = False
+        self._turn = TurnDetector(capture, mode, detector, hangover_ms, no_speech_timeout_ms)
+        self._analyzed = 0          # amostras já passadas pelo VAD
+        self._carry = b""           # byte ímpar de um pedaço PCM16
+        self._lock = threading.Lock()
+        self._closed = False
+        self._pipe = None
+        self._decoder = None
+        if fmt != "pcm16":
+            self._pipe = _BytePipe()
+            self._decoder = threading.Thread(target=self._decode_opus, name="opus-decoder", daemon=True)
+            self._decoder.start()
+
+    @property
+    def finished(self) -> bool:
+        """O turno já terminou (pelo áudio, por /voice/stop ou cancelamento): novos bytes são ignorados."""
+        return self.ended or self.capture.finished.is_set()
+
+    @property
+    def idle_secs(self) -> float:
+        return time.monotonic() - self.last_data
+
+    def feed(self, data: bytes):
+        """Recebe um pedaço do corpo HTTP (qualquer tamanho, na ordem de envio)."""
+        if self.error is not None:
+            raise ValueError(f"Áudio inválido: {self.error}")
+        if not data:
+            return
+        self.bytes_received += len(data)
+        self.last_data = time.monotonic()
+        if self._pipe is not None:
+            self._pipe.write(data)
+            return
+        with self._lock:
+            if self._closed:
+                return
+            data = self._carry + data
+            usable = len(data) - len(data) % 2
+            self._carry = data[usable:]
+            samples = np.frombuffer(data, dtype="<i2", count=usable // 2)
+        self._push(samples)
+
+    def close(self, timeout: float = 5.0):
+        """Fim do envio: termina a decodificação pendente e encerra a captura (idempotente)."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if self._pipe is not None:
+            self._pipe.close()
+            self._decoder.join(timeout)
+        self.capture.finish()
+
+    def stats(self):
+        return {
+            "format": self.format,
+            "bytes": self.bytes_received,
+            "seconds": round(len(self.capture) / self.capture.samplerate, 2),
+            "speech": self.capture.has_speech,
+            "ended": self.finished,
+        }
+
+    def _push(self, samples: np.ndarray):
+        """Escreve no buffer do turno e passa os frames completos pelo VAD."""
+        capture = self.capture
+        with self._lock:
+            if self.ended:
+                return
+            capture.append(samples)
+            ended = capture.full
+            while not ended and self._analyzed + capture.frame_len <= len(capture):
+                start = self._analyzed
+                self._analyzed += capture.frame_len
+                ended = self._turn.process(start, self._analyzed)
+            if self.max_samples is not None and len(capture) >= self.max_samples:
+                ended = True
+            if ended:
+                self.ended = True
+        if ended and self.on_end is not None:
+            self.on_end()
+
+    def _decode_opus(self):
+        """Thread: demux (WebM/Ogg) + decodificação Opus + reamostragem para float32 mono."""
+        try:
+            container = av.open(self._pipe, mode="r")
+            stream = container.streams.audio[0]
+            resampler = av.AudioResampler(format="flt", layout="mono", rate=self.capture.samplerate)
+            for frame in container.decode(stream):
+                for out in resampler.resample(frame):
+                    self._push(out.to_ndarray().reshape(-1))
+            for out in resampler.resample(None):
+                self._push(out.to_ndarray().reshape(-1))
+            container.close()
+        except Exception as e:
+            if self.bytes_received:
+                self.error = str(e)
+                print(f"⚠️ Falha ao decodificar áudio do cliente ({self.format}): {e}")
@@ -0,0 +1,128 @@
+"""
+Histórico de conversa por sessão com orçamento de tokens.
+
+As mensagens enviadas ao LLM são sempre `[system, (resumo), turnos..., user]`.
+Turnos antigos nunca são reescritos: o texto fica exatamente como foi enviado
+e recebido, para que o prefixo do prompt seja idêntico byte a byte entre
+turnos e o cache de prefixo (KV cache) do servidor possa reaproveitá-lo.
+
+Quando o prompt passaria do orçamento (`max_tokens`), os turnos mais antigos
+saem de uma vez até o histórico cair para `low_water` do orçamento. Assim o
+prefixo muda só de vez em quando, e não a cada turno como numa janela
+deslizante. Se um `summarize(texto) -> str` for passado, os turnos removidos
+são condensados numa mensagem de resumo logo depois do prompt de sistema.
+"""
+
+import threading
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Sobrecarga aproximada por mensagem no formato de chat (papel + separadores)
+MESSAGE_OVERHEAD = 4
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens do texto (tiktoken `o200k_base` se instalado; senão ~3,5 caracteres por token)."""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            try:
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                _encoding = False  # tabela indisponível (ex.: sem rede): usa a estimativa
+        if _encoding:
+            return len(_encoding.encode(text))
+    return max(1, round(len(text) / 3.5))
+
+
+def count_message_tokens(messages) -> int:
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages)
+
+
+class Conversation:
+    """Turnos de uma sessão e montagem do prompt dentro do orçamento."""
+
+    def __init__(self, system_prompt: str, max_tokens: int = 3000, low_water: float = 0.6,
+                 summarize=None):
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.low_water = low_water
+        self.summarize = summarize
+        self.summary = None
+        self.turns = []             # [(pergunta, resposta, tokens do par)]
+        self.prompt_tokens = []     # tokens do prompt enviado em cada turno
+        self.compactions = 0
+        self._lock = threading.Lock()
+
+    def messages(self, prompt: str):
+        """Mensagens para a próxima pergunta (pode compactar o histórico antes)."""
+        with self._lock:
+            user_tokens = count_tokens(prompt) + MESSAGE_OVERHEAD
+            if self._history_tokens() + user_tokens > self.max_tokens:
+                self._compact(user_tokens)
+            return self._context() + [{"role": "user", "content": prompt}]
+
+    def add_turn(self, prompt: str, answer: str, prompt_tokens: int = None):
+        """Registra um turno respondido (respostas de erro não devem entrar)."""
+        pair = [{"role": "user", "content": prompt}, {"role": "assistant", "content": answer}]
+        with self._lock:
+            self.turns.append((prompt, answer, count_message_tokens(pair)))
+            if prompt_tokens is not None:
+                self.prompt_tokens.append(prompt_tokens)
+
+    def reset(self):
+        with self._lock:
+            self.turns = []
+            self.summary = None
+            self.prompt_tokens = []
+
+    def stats(self):
+        with self._lock:
+            return {
+                "turns": len(self.turns),
+                "history_tokens": self._history_tokens(),
+                "max_tokens": self.max_tokens,
+                "summarized": self.summary is not None,
+                "compactions": self.compactions,
+                "last_prompt_tokens": self.prompt_tokens[-1] if self.prompt_tokens else None,
+                "prompt_tokens": list(self.prompt_tokens[-20:]),
+            }
+
+    def _context(self):
+        """Sistema + resumo + turnos, sempre na mesma ordem e com o mesmo texto."""
+        messages = [{"role": "system", "content": self.system_prompt}]
+        if self.summary:
+            messages.append({"role": "system", "content": f"Resumo da conversa até aqui: {self.summary}"})
+        for prompt, answer, _ in self.turns:
+            messages.append({"role": "user", "content": prompt})
+            messages.append({"role": "assistant", "content": answer})
+        return messages
+
+    def _history_tokens(self):
+        fixed = count_tokens(self.system_prompt) + MESSAGE_OVERHEAD
+        if self.summary:
+            fixed += count_tokens(self.summary) + MESSAGE_OVERHEAD + 8
+        return fixed + sum(tokens for _, _, tokens in self.turns)
+
+    def _compact(self, reserve: int):
+        """Remove turnos antigos de uma vez até caber em `low_water` do orçamento (chamar com o lock)."""
+        target = self.max_tokens * self.low_water - reserve
+        dropped = []
+        while self.turns and self._history_tokens() > target:
+            dropped.append(self.turns.pop(0))
+        if not dropped:
+            return
+        self.compactions += 1
+        if self.summarize is None:
+            return
+        text = "\n".join(f"Usuário: {p}\nAssistente: {a}" for p, a, _ in dropped)
+        if self.summary:
+            text = f"{self.summary}\n{text}"
+        try:
+            self.summary = self.summarize(text)
+        except Exception as e:
+            print(f"⚠️ Falha ao resumir histórico, turnos antigos descartados: {e}")
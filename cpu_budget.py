@@ -0,0 +1,196 @@
+"""
+Partição dos núcleos da CPU entre os estágios que rodam PyTorch (Whisper e XTTS).
+
+Sem limite, cada modelo usa todos os núcleos nas operações intra-op; quando o
+STT de um turno coincide com o TTS de outro, as duas cargas disputam os mesmos
+núcleos e ambas ficam mais lentas. Aqui cada estágio recebe um conjunto de
+núcleos e um número de threads, aplicados na thread que executa a inferência:
+`os.sched_setaffinity(0, ...)` (Linux) prende a thread e os threads do OpenMP
+que ela criar, e `torch.set_num_threads` limita o paralelismo intra-op.
+
+Perfis:
+- off: nada é alterado (padrão do PyTorch)
+- latency: o TTS do turno atual fica com ~3/4 dos núcleos; o STT, com o resto
+- throughput: metade para cada estágio, sem sobreposição, para turnos simultâneos
+
+As threads do OpenMP são criadas na primeira inferência de cada thread e herdam
+a afinidade daquele momento; trocar de perfil em execução vale por completo
+para threads novas e, nas antigas, pelo menos para o número de threads.
+"""
+
+import os
+import threading
+
+PROFILES = ("off", "latency", "throughput")
+STAGES = ("stt", "tts")
+
+
+def available_cores():
+    """Núcleos que o processo pode usar (respeita taskset/cgroups quando o SO informa)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cores(spec: str):
+    """'0-3,6' -> [0, 1, 2, 3, 6]"""
+    cores = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cores.update(range(int(first), int(last) + 1))
+        else:
+            cores.add(int(part))
+    return sorted(cores)
+
+
+def partition(profile: str, cores):
+    """Núcleos de cada estágio para um perfil ({} em "off")."""
+    if profile not in PROFILES:
+        raise ValueError(f"Perfil de CPU desconhecido: {profile} (use {', '.join(PROFILES)})")
+    if profile == "off":
+        return {}
+    if len(cores) < 2:
+        return {stage: list(cores) for stage in STAGES}
+    if profile == "latency":
+        stt_count = max(1, len(cores) // 4)
+    else:
+        stt_count = len(cores) // 2
+    return {"stt": list(cores[:stt_count]), "tts": list(cores[stt_count:])}
+
+
+class CpuBudgets:
+    """Núcleos e threads por estágio, trocáveis em execução."""
+
+    def __init__(self, profile: str = "off", cores=None, overrides=None):
+        """`overrides`: {estágio: {"cores": [...], "threads": n}} que prevalecem sobre o perfil."""
+        self.cores = list(cores) if cores is not None else available_cores()
+        self.overrides = overrides or {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._budgets = {}
+        self.profile = None
+        self.set_profile(profile)
+
+    def set_profile(self, profile: str):
+        budgets = {
+            stage: {"cores": cores, "threads": len(cores)}
+            for stage, cores in partition(profile, self.cores).items()
+        }
+        for stage, override in self.overrides.items():
+            values = {k: v for k, v in override.items() if v}
+            if values:
+                budgets.setdefault(stage, {"cores": None, "threads": None}).update(values)
+        with self._lock:
+            self.profile = profile
+            self._budgets = budgets
+        print(f"🧮 Perfil de CPU '{profile}': {self._describe(budgets)}")
+
+    def allocation(self):
+        with self._lock:
+            return {
+                "profile": self.profile,
+                "profiles": list(PROFILES),
+                "cores": list(self.cores),
+                "stages": {stage: dict(budget) for stage, budget in self._budgets.items()},
+            }
+
+    def guard(self, stage: str, lock=None):
+        """Context manager reutilizável: pega `lock` (opcional) e roda o bloco no orçamento do estágio."""
+        return _StageGuard(self, stage, lock)
+
+    def enter(self, stage: str):
+        """Aplica o orçamento na thread atual, guardando o estado anterior para `exit`."""
+        with self._lock:
+            budget = self._budgets.get(stage)
+        saved = None
+        if budget:
+            saved = (_get_affinity(), _get_threads())
+            if budget.get("cores") and saved[0] is not None:
+                _set_affinity(budget["cores"])
+            if budget.get("threads") and saved[1] is not None:
+                _set_threads(budget["threads"])
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(saved)
+
+    def exit(self):
+        saved = self._local.stack.pop()
+        if saved is None:
+            return
+        affinity, threads = saved
+        if affinity is not None:
+            _set_affinity(affinity)
+        if threads is not None:
+            _set_threads(threads)
+
+    @staticmethod
+    def _describe(budgets):
+        if not budgets:
+            return "padrão do PyTorch"
+        return ", ".join(
+            f"{stage}={_format_cores(b.get('cores'))} ({b.get('threads') or '-'} threads)"
+            for stage, b in sorted(budgets.items())
+        )
+
+
+class _StageGuard:
+    def __init__(self, budgets, stage, lock):
+        self.budgets = budgets
+        self.stage = stage
+        self.lock = lock
+
+    def __enter__(self):
+        if self.lock is not None:
+            self.lock.acquire()
+        try:
+            self.budgets.enter(self.stage)
+        except BaseException:
+            if self.lock is not None:
+                self.lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.budgets.exit()
+        finally:
+            if self.lock is not None:
+                self.lock.release()
+        return False
+
+
+def _format_cores(cores):
+    if not cores:
+        return "todos"
+    return ",".join(str(c) for c in cores)
+
+
+def _get_affinity():
+    if not hasattr(os, "sched_getaffinity"):
+        return None
+    return sorted(os.sched_getaffinity(0))
+
+
+def _set_affinity(cores):
+    try:
+        os.sched_setaffinity(0, cores)  # 0 = a thread atual no Linux
+    except OSError as e:
+        print(f"⚠️ Não foi possível fixar os núcleos {_format_cores(cores)}: {e}")
+
+
+def _get_threads():
+    try:
+        import torch
+    except ImportError:
+        return None
+    return torch.get_num_threads()
+
+
+def _set_threads(threads):
+    import torch
+    torch.set_num_threads(threads)
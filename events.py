@@ -0,0 +1,74 @@
+"""
+Barramento de eventos para Server-Sent Events (SSE).
+
+Cada cliente inscrito numa sessão recebe uma fila própria; `publish` entrega o
+evento a todos os inscritos daquela sessão. Filas de clientes lentos descartam
+os eventos mais antigos em vez de bloquear quem publica.
+"""
+
+import json
+import queue
+import threading
+
+
+def format_sse(event: str, data) -> str:
+    """Serializa um evento no formato text/event-stream."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class EventBus:
+    """Pub/sub em memória por chave (id de sessão)."""
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, key: str) -> queue.Queue:
+        q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(q)
+        return q
+
+    def unsubscribe(self, key: str, q: queue.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[key]
+
+    def has_subscribers(self, key: str) -> bool:
+        with self._lock:
+            return bool(self._subscribers.get(key))
+
+    def publish(self, key: str, event: str, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+        for q in subscribers:
+            while True:
+                try:
+                    q.put_nowait((event, data))
+                    break
+                except queue.Full:
+                    try:
+                        q.get_nowait()  # descarta o mais antigo
+                    except queue.Empty:
+                        pass
+
+    def stream(self, key: str, initial=None, keepalive: float = 15.0):
+        """Gerador de texto SSE para uma resposta HTTP em streaming."""
+        q = self.subscribe(key)
+        try:
+            yield "retry: 3000\n\n"
+            if initial is not None:
+                yield format_sse(*initial)
+            while True:
+                try:
+                    event, data = q.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event, data)
+        finally:
+            self.unsubscribe(key, q)
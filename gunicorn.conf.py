@@ -0,0 +1,47 @@
+"""
+Configuração do gunicorn para produção:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker gunicorn -c gunicorn.conf.py asgi:app
+
+- preload_app: o master importa o app e carrega os modelos uma vez; os
+  workers (fork) dividem os pesos copy-on-write
+- gthread: cada worker atende GUNICORN_THREADS requisições ao mesmo tempo
+  (streams SSE e de áudio ocupam uma thread enquanto abertos); com o worker
+  do uvicorn (asgi.py), o chat roda em corrotinas e GUNICORN_THREADS não se aplica
+- max_requests: cada worker é reciclado depois de ~N requisições (com
+  jitter, para não reciclarem todos juntos); o substituto é um novo fork do
+  master, sem recarregar modelos
+"""
+
+import os
+
+# Antes de importar o app: o ModelRegistry só carrega pesos no master
+os.environ.setdefault("VOICE_PREFORK", "1")
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('FLASK_RUN_PORT', 8080)}"
+workers = int(os.getenv("GUNICORN_WORKERS", 1))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", 32))
+preload_app = True
+
+# Reciclagem graciosa: o worker termina as requisições em andamento antes de sair
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = max(1, max_requests // 10)
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 60))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+keepalive = 5
+
+pidfile = os.getenv("GUNICORN_PIDFILE")
+accesslog = "-" if os.getenv("GUNICORN_ACCESS_LOG", "0") == "1" else None
+
+
+def post_fork(server, worker):
+    # Threads criadas no import (scheduler, batcher) não existem no filho
+    from backend_server import after_fork
+    after_fork()
+
+
+def when_ready(server):
+    server.log.info(f"Master {os.getpid()}: {workers} workers x {threads} threads "
+                    f"(memória: python memory_report.py --pid {os.getpid()})")
@@ -0,0 +1,379 @@
+"""
+Cache de respostas do LLM com coalescência de requisições em andamento.
+
+A chave é o contexto da conversa (modelo, parâmetros, prompt de sistema,
+histórico) mais a pergunta normalizada. Entradas expiram por TTL e o total é
+limitado (LRU). Perguntas idênticas que chegam enquanto a primeira ainda está
+sendo respondida não vão ao servidor: esperam a mesma chamada (single-flight)
+e recebem as frases à medida que o líder as produz. Opcionalmente, perguntas
+quase iguais (similaridade ≥ `similarity`) dentro do mesmo contexto reutilizam
+a resposta já guardada.
+
+Cancelar uma requisição só a tira da chamada compartilhada: o stream ao
+servidor é interrompido quando ninguém mais (líder ou seguidor) espera a
+resposta. Um líder cancelado com seguidores continua a chamada por eles, sem
+entregar mais nada ao próprio chamador.
+
+`ask_async` é a mesma lógica para o servidor asyncio (asgi.py): o líder é uma
+corrotina e os seguidores esperam a chamada em andamento sem ocupar uma thread.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from difflib import SequenceMatcher
+
+from cancellation import Cancelled, CancelToken
+
+
+def normalize_question(text: str) -> str:
+    """Minúsculas, NFC, espaços colapsados e sem pontuação nas pontas."""
+    text = unicodedata.normalize("NFC", text).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.strip(" .,;:!?¿¡…\"'")
+
+
+class _Entry:
+    __slots__ = ("answer", "segments", "expires", "context_key", "question")
+
+    def __init__(self, answer, segments, expires, context_key, question):
+        self.answer = answer
+        self.segments = segments
+        self.expires = expires
+        self.context_key = context_key
+        self.question = question
+
+
+class _Flight:
+    """Uma chamada ao LLM em andamento, compartilhada por requisições idênticas."""
+
+    def __init__(self):
+        self.segments = []
+        self.answer = None
+        self.error = None
+        self.done = False
+        self.aborted = False
+        self._interested = 0   # líder + seguidores que ainda esperam a resposta
+        self._abort = None     # interrompe a chamada do líder
+        self._cond = threading.Condition()
+        self._listeners = []   # seguidores asyncio: acordados a cada frase e no fim
+
+    def join(self):
+        """Registra um interessado; retorna `leave()` (idempotente) para quando ele desistir ou terminar."""
+        with self._cond:
+            self._interested += 1
+        left = []
+
+        def leave():
+            with self._cond:
+                if left:
+                    return
+                left.append(True)
+                self._interested -= 1
+                if self._interested > 0 or self.done or self.aborted:
+                    return
+                self.aborted = True
+                abort = self._abort
+            if abort is not None:
+                abort()
+        return leave
+
+    def set_abort(self, abort):
+        """Como interromper a chamada do líder quando o último interessado sair."""
+        with self._cond:
+            self._abort = abort
+
+    def add_segment(self, segment: str):
+        with self._cond:
+            self.segments.append(segment)
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+
+    def finish(self, answer=None, error=None):
+        with self._cond:
+            self.answer = answer
+            self.error = error
+            self.done = True
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+
+    def follow(self, on_segment=None, cancel=None):
+        """Repassa as frases do líder conforme chegam e retorna a resposta (ou levanta o erro dele).
+
+        `cancel` (CancelToken) faz só este seguidor desistir; o líder continua.
+        """
+        sent = 0
+        while True:
+            with self._cond:
+                while sent == len(self.segments) and not self.done:
+                    if cancel is not None:
+                        cancel.check()
+                        self._cond.wait(0.1)
+                    else:
+                        self._cond.wait()
+                pending = self.segments[sent:]
+                done = self.done
+            sent += len(pending)
+            if on_segment is not None:
+                for segment in pending:
+                    on_segment(segment)
+            if done and sent == len(self.segments):
+                break
+        if self.error is not None:
+            raise self.error
+        return self.answer
+
+    async def follow_async(self, on_segment=None):
+        """Como `follow`, no event loop: o líder (de qualquer thread) acorda um `asyncio.Event`.
+
+        Cancelar a task só faz este seguidor desistir.
+        """
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+
+        def listener():
+            loop.call_soon_threadsafe(wake.set)
+
+        with self._cond:
+            self._listeners.append(listener)
+        try:
+            sent = 0
+            while True:
+                wake.clear()
+                with self._cond:
+                    pending = self.segments[sent:]
+                    done = self.done
+                sent += len(pending)
+                if on_segment is not None:
+                    for segment in pending:
+                        on_segment(segment)
+                if done:
+                    break
+                if not pending:
+                    await wake.wait()
+        finally:
+            with self._cond:
+                self._listeners.remove(listener)
+        if self.error is not None:
+            raise self.error
+        return self.answer
+
+
+class ResponseCache:
+    """TTL + LRU de respostas, single-flight e nível opcional por similaridade."""
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 256, similarity: float = 0.0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity      # 0 = desligado
+        self._entries = OrderedDict()     # chave -> _Entry
+        self._inflight = {}               # chave -> _Flight
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    @staticmethod
+    def context_key(context) -> str:
+        """Hash estável de tudo que vem antes da pergunta (modelo, parâmetros, mensagens)."""
+        blob = json.dumps(context, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode()).hexdigest()[:32]
+
+    def ask(self, context, question: str, compute, on_segment=None, cancel=None):
+        """Responde do cache, seguindo uma chamada idêntica em andamento ou chamando `compute`.
+
+        compute(on_segment, cancel) -> resposta; deve levantar exceção em caso de falha (nada é
+        guardado) e parar quando o `cancel` recebido (o da chamada compartilhada) for cancelado.
+        Retorna `(resposta, origem)` com origem em hit / similar / coalesced / miss.
+        """
+        key, context_key, normalized, entry, source, flight, leave = self._claim(context, question)
+        if entry is not None:
+            if on_segment is not None:
+                for segment in entry.segments:
+                    on_segment(segment)
+            return entry.answer, source
+        if source == "coalesced":
+            try:
+                return flight.follow(on_segment, cancel), source
+            finally:
+                leave()
+
+        # A chamada só é interrompida quando ninguém mais espera por ela
+        flight_cancel = CancelToken()
+        flight.set_abort(lambda: flight_cancel.cancel("ninguém mais espera a resposta"))
+        unregister = cancel.on_cancel(leave) if cancel is not None else None
+        gone = (lambda: cancel.cancelled) if cancel is not None else None
+        try:
+            answer = compute(self._leader_callback(flight, on_segment, gone), flight_cancel)
+        except Exception as e:
+            flight.finish(error=e)
+            raise
+        else:
+            self._complete(key, context_key, normalized, flight, answer)
+        finally:
+            if unregister is not None:
+                unregister()
+            leave()
+            self._release(key, flight)
+        if cancel is not None:
+            cancel.check()  # terminou pelos seguidores; este chamador já tinha desistido
+        return answer, "miss"
+
+    async def ask_async(self, context, question: str, compute, on_segment=None):
+        """Versão asyncio de `ask`: `compute(on_segment)` é uma corrotina.
+
+        Chamadas em andamento são compartilhadas com o caminho síncrono (nos dois sentidos).
+        Cancelar a task do líder só a tira da chamada, que segue enquanto houver seguidores.
+        """
+        key, context_key, normalized, entry, source, flight, leave = self._claim(context, question)
+        if entry is not None:
+            if on_segment is not None:
+                for segment in entry.segments:
+                    on_segment(segment)
+            return entry.answer, source
+        if source == "coalesced":
+            try:
+                return await flight.follow_async(on_segment), source
+            finally:
+                leave()
+
+        gone = []
+
+        async def lead():
+            try:
+                answer = await compute(self._leader_callback(flight, on_segment, lambda: bool(gone)))
+            except asyncio.CancelledError:
+                flight.finish(error=Cancelled("ninguém mais espera a resposta"))
+                raise
+            except Exception as e:
+                flight.finish(error=e)
+                raise
+            else:
+                self._complete(key, context_key, normalized, flight, answer)
+                return answer
+            finally:
+                self._release(key, flight)
+
+        # A chamada roda numa task própria: se este chamador for cancelado com seguidores
+        # esperando, ela continua por eles
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(lead())
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())  # erro já repassado a quem espera
+        flight.set_abort(lambda: loop.call_soon_threadsafe(task.cancel))
+        try:
+            answer = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            gone.append(True)
+            raise
+        finally:
+            leave()
+        return answer, "miss"
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.similar_hits + self.coalesced + self.misses
+            return {
+                "entries": len(self._entries),
+                "inflight": len(self._inflight),
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "hit_rate": round((lookups - self.misses) / lookups, 3) if lookups else 0.0,
+            }
+
+    def _claim(self, context, question):
+        """Entrada válida ou voo desta pergunta (criado se for o líder), contando a origem.
+
+        Retorna `(chave, chave do contexto, pergunta normalizada, entrada, origem, voo, leave)`,
+        com `leave` encerrando a participação no voo (ver `_Flight.join`).
+        """
+        context_key = self.context_key(context)
+        normalized = normalize_question(question)
+        key = hashlib.sha256(f"{context_key}\0{normalized}".encode()).hexdigest()[:32]
+
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return key, context_key, normalized, entry, "hit", None, None
+            if self.similarity > 0:
+                entry = self._lookup_similar(context_key, normalized)
+                if entry is not None:
+                    self.similar_hits += 1
+                    return key, context_key, normalized, entry, "similar", None, None
+            flight = self._inflight.get(key)
+            if flight is not None and not flight.aborted:
+                self.coalesced += 1
+                return key, context_key, normalized, None, "coalesced", flight, flight.join()
+            # Sem voo (ou um abandonado, ainda terminando): esta requisição lidera uma nova chamada
+            flight = self._inflight[key] = _Flight()
+            self.misses += 1
+            return key, context_key, normalized, None, "miss", flight, flight.join()
+
+    @staticmethod
+    def _leader_callback(flight, on_segment, gone=None):
+        """Frases do líder: para os seguidores e para o próprio chamador (até `gone()` indicar que ele saiu)."""
+        def handle_segment(segment):
+            flight.add_segment(segment)
+            if on_segment is not None and not (gone is not None and gone()):
+                on_segment(segment)
+        return handle_segment
+
+    def _release(self, key, flight):
+        """Tira o voo terminado da tabela (se ainda for o dessa chave)."""
+        with self._lock:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+
+    def _complete(self, key, context_key, normalized, flight, answer):
+        if answer:
+            self._store(key, _Entry(answer, list(flight.segments), time.monotonic() + self.ttl,
+                                    context_key, normalized))
+        flight.finish(answer=answer)
+
+    def _lookup(self, key):
+        """Entrada válida para a chave (chamar com o lock)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _lookup_similar(self, context_key, question):
+        """Entrada mais parecida no mesmo contexto, se passar do limiar (chamar com o lock)."""
+        now = time.monotonic()
+        best, best_ratio = None, self.similarity
+        for key, entry in list(self._entries.items()):
+            if entry.expires < now:
+                del self._entries[key]
+                continue
+            if entry.context_key != context_key:
+                continue
+            ratio = SequenceMatcher(None, question, entry.question).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = key, ratio
+        if best is None:
+            return None
+        self._entries.move_to_end(best)
+        return self._entries[best]
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Memória do servidor de produção: master do gunicorn + workers (Linux).
+
+O RSS de cada worker inclui os pesos herdados do master copy-on-write, então
+somar os RSS conta os modelos N+1 vezes. O PSS divide cada página
+compartilhada entre os processos que a usam: a soma dos PSS é a memória real
+do conjunto. A coluna "privada" é o que cada worker copiou/alocou só para si
+(o custo marginal de mais um worker).
+
+Uso:
+    python memory_report.py                 # acha o master do gunicorn (wsgi:app ou asgi:app)
+    python memory_report.py --pid 12345     # master explícito
+    python memory_report.py --pidfile gunicorn.pid --json
+"""
+
+import argparse
+import json
+import os
+
+from model_registry import process_memory
+
+
+def _cmdline(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().replace(b"\0", b" ").decode(errors="replace").strip()
+    except OSError:
+        return ""
+
+
+def _parent(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # o nome do processo (2º campo) pode ter espaços: o ppid vem depois do último ')'
+            return int(f.read().rsplit(")", 1)[1].split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _all_pids():
+    return [int(p) for p in os.listdir("/proc") if p.isdigit()]
+
+
+def find_master():
+    """Processo gunicorn servindo wsgi:app (ou asgi:app) que é pai dos workers.
+
+    Wrappers (ex.: `timeout gunicorn ...`) têm a mesma linha de comando; o master é o
+    processo com filhos gunicorn cujo filho gunicorn não tem, por sua vez, workers.
+    """
+    candidates = {pid for pid in _all_pids()
+                  if "gunicorn" in _cmdline(pid) and ("wsgi:app" in _cmdline(pid) or "asgi:app" in _cmdline(pid))}
+    parents = {_parent(pid) for pid in candidates} & candidates
+    masters = [pid for pid in parents if not any(_parent(other) == pid for other in parents)]
+    if masters:
+        return masters[0]
+    return min(candidates) if candidates else None
+
+
+def descendants(pid):
+    """Filhos (workers) e netos (ex.: processos do pool XTTS) do master."""
+    parents = {p: _parent(p) for p in _all_pids()}
+    found, frontier = [], [pid]
+    while frontier:
+        current = frontier.pop()
+        children = sorted(p for p, parent in parents.items() if parent == current)
+        found.extend(children)
+        frontier.extend(children)
+    return found
+
+
+def report(master):
+    rows = []
+    for pid in [master] + descendants(master):
+        memory = process_memory(pid)
+        if memory is None:
+            continue
+        role = "master" if pid == master else ("worker" if _parent(pid) == master else "filho")
+        rows.append({"pid": pid, "role": role, **{k: round(v / 2**20, 1) for k, v in memory.items()}})
+    totals = {key: round(sum(r[key] for r in rows), 1) for key in ("rss", "pss", "private")}
+    return {"master": master, "processes": rows, "totals": totals}
+
+
+def print_report(result):
+    print(f"{'pid':>8} {'papel':<7} {'RSS MB':>9} {'PSS MB':>9} {'compart.':>9} {'privada':>9}")
+    for r in result["processes"]:
+        print(f"{r['pid']:>8} {r['role']:<7} {r['rss']:>9.1f} {r['pss']:>9.1f} {r['shared']:>9.1f} {r['private']:>9.1f}")
+    totals = result["totals"]
+    workers = sum(r["role"] == "worker" for r in result["processes"])
+    print(f"\n{workers} workers: soma dos RSS {totals['rss']:.0f} MB (conta as páginas compartilhadas várias vezes)")
+    print(f"Memória real (soma dos PSS): {totals['pss']:.0f} MB; privada: {totals['private']:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSS/PSS do master do gunicorn e dos workers")
+    parser.add_argument("--pid", type=int, help="PID do master (padrão: detectar)")
+    parser.add_argument("--pidfile", help="Arquivo de PID do gunicorn (GUNICORN_PIDFILE)")
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    master = args.pid
+    if master is None and args.pidfile:
+        with open(args.pidfile) as f:
+            master = int(f.read().strip())
+    if master is None:
+        master = find_master()
+    if master is None or process_memory(master) is None:
+        raise SystemExit("❌ Master do gunicorn não encontrado (use --pid; requer Linux /proc)")
+
+    result = report(master)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    main()
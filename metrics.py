@@ -0,0 +1,188 @@
+"""
+Métricas por estágio do turno de voz, no formato texto do Prometheus.
+
+Implementação mínima (sem dependências) de contadores e histogramas com
+labels. Os objetos de métrica do pipeline ficam definidos aqui para que
+`voice_assistant` e `backend_server` instrumentem os mesmos instrumentos;
+`render()` gera o corpo da rota `/metrics`.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 7.5, 10.0, 20.0, 30.0, 60.0)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0)
+DURATION_BUCKETS = (0.5, 1.0, 2.0, 3.0, 4.0, 6.0, 8.0, 10.0, 15.0, 20.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name}: labels esperados {self.labels}, recebidos {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_label_str(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS, labels=()):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # key -> [contagens por bucket, soma, total]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Mede o bloco `with` e registra a duração em segundos."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = _label_str(self.labels, key, ['le="%s"' % bound])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _label_str(self.labels, key, ['le="+Inf"'])
+            lines.append(f"{self.name}_bucket{le} {count}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, labels=()):
+        metric = Histogram(name, help, buckets, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+########################
+# Métricas do pipeline
+########################
+CAPTURE_DURATION = REGISTRY.histogram(
+    "voice_capture_duration_seconds", "Duração do áudio capturado por turno", DURATION_BUCKETS)
+STT_LATENCY = REGISTRY.histogram(
+    "voice_stt_latency_seconds", "Tempo de transcrição do Whisper", labels=("mode",))
+STT_RTF = REGISTRY.histogram(
+    "voice_stt_real_time_factor", "Tempo de STT dividido pela duração do áudio", RTF_BUCKETS)
+LLM_TTFT = REGISTRY.histogram(
+    "voice_llm_time_to_first_token_seconds", "Tempo até o primeiro token do LLM")
+LLM_DURATION = REGISTRY.histogram(
+    "voice_llm_duration_seconds", "Tempo total da resposta do LLM")
+LLM_PROMPT_TOKENS = REGISTRY.histogram(
+    "voice_llm_prompt_tokens", "Tokens do prompt enviado ao LLM por turno",
+    (100, 250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000))
+LLM_CACHE_LOOKUPS = REGISTRY.counter(
+    "voice_llm_cache_lookups_total", "Respostas do LLM por origem (hit, similar, coalesced, miss)",
+    labels=("result",))
+TTS_TTFC = REGISTRY.histogram(
+    "voice_tts_time_to_first_chunk_seconds", "Tempo até o primeiro chunk de áudio do XTTS")
+TTS_RTF = REGISTRY.histogram(
+    "voice_tts_real_time_factor", "Tempo de síntese dividido pela duração do áudio gerado", RTF_BUCKETS)
+TTS_CACHE_LOOKUPS = REGISTRY.counter(
+    "voice_tts_cache_lookups_total", "Consultas ao cache de áudio sintetizado", labels=("result",))
+PLAYBACK_DURATION = REGISTRY.histogram(
+    "voice_playback_duration_seconds", "Duração do áudio reproduzido por resposta", DURATION_BUCKETS)
+CHAT_STREAM_TTFT = REGISTRY.histogram(
+    "voice_chat_stream_ttft_seconds", "Pedido /chat/stream até o primeiro token enviado ao cliente")
+AUDIO_STREAM_TTFB = REGISTRY.histogram(
+    "voice_audio_stream_ttfb_seconds", "Pedido HTTP até o primeiro byte de áudio enviado ao cliente",
+    labels=("route",))
+AUDIO_STREAM_BYTES = REGISTRY.counter(
+    "voice_audio_stream_bytes_total", "Bytes de áudio enviados ao cliente por formato", labels=("format",))
+TURN_LATENCY = REGISTRY.histogram(
+    "voice_turn_latency_seconds", "Fim da fala do usuário até o primeiro áudio da resposta")
+BARGE_INS = REGISTRY.counter(
+    "voice_barge_ins_total", "Respostas interrompidas pela fala do usuário")
+ERRORS = REGISTRY.counter(
+    "voice_errors_total", "Erros por estágio do pipeline", labels=("stage",))
+FALLBACKS = REGISTRY.counter(
+    "voice_fallbacks_total", "Caminhos de fallback usados", labels=("kind",))
+
+
+def render() -> str:
+    return REGISTRY.render()
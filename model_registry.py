@@ -0,0 +1,273 @@
+"""
+Registro de modelos com carregamento em background.
+
+Cada modelo (Whisper, XTTS, ...) é carregado numa thread própria e passa pelos
+estados pending → loading → warming → ready (ou failed). Quem precisa de um
+modelo chama `get()`, que espera o carregamento terminar; o servidor HTTP
+pode responder `/health` enquanto isso e usar `ready` para a readiness.
+
+Com `prefork` (gunicorn com preload_app), o master só carrega os pesos
+(estado loaded) e faz fork; os workers herdam essas páginas copy-on-write.
+Em cada worker, `after_fork()` roda os warm-ups (a primeira inferência, e as
+threads do PyTorch/OpenMP, ficam fora do master) e carrega os modelos
+registrados com `per_process=True`, cujos recursos (threads, processos
+filhos) não sobrevivem ao fork.
+"""
+
+import os
+import resource
+import sys
+import threading
+import time
+import traceback
+
+PENDING = "pending"
+LOADING = "loading"
+LOADED = "loaded"     # pesos na memória, warm-up pendente (master do prefork)
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+
+def process_rss_bytes() -> int:
+    """RSS atual do processo (Linux: /proc; outros: pico via getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def process_memory(pid="self"):
+    """RSS, PSS e memória privada (USS) de um processo, em bytes (Linux; None em outros sistemas).
+
+    Em workers que dividem páginas copy-on-write, o RSS conta as páginas compartilhadas em
+    cada processo; o PSS divide cada página entre quem a usa, então a soma dos PSS é o total real.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[-1] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[-2]) * 1024
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def tensor_bytes(model) -> int:
+    """Bytes ocupados pelos parâmetros e buffers de um módulo PyTorch (tensores compartilhados contam uma vez)."""
+    if not hasattr(model, "parameters"):
+        return 0
+    seen = set()
+    total = 0
+    tensors = list(model.parameters()) + list(model.buffers() if hasattr(model, "buffers") else [])
+    for t in tensors:
+        ptr = t.data_ptr()
+        if ptr in seen:
+            continue
+        seen.add(ptr)
+        total += t.numel() * t.element_size()
+    return total
+
+
+class ModelUnavailable(RuntimeError):
+    """O modelo falhou ao carregar (ou não ficou pronto a tempo)."""
+
+
+class _Slot:
+    def __init__(self, name, loader, warmup, required, per_process):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.required = required
+        self.per_process = per_process
+        self.state = PENDING
+        self.model = None
+        self.error = None
+        self.load_secs = None
+        self.warmup_secs = None
+        self.weights_bytes = None      # parâmetros + buffers
+        self.rss_delta_bytes = None    # crescimento do RSS durante o load (ruidoso com loads paralelos)
+        self.loaded = threading.Event()   # carregado (ou falhou): já dá para usar
+        self.done = threading.Event()     # warm-up terminado (ou falhou)
+
+
+class ModelRegistry:
+    """Carrega modelos em threads de background e expõe o estado de cada um."""
+
+    def __init__(self, prefork: bool = False):
+        """`prefork`: este processo só carrega os pesos; warm-ups e modelos per_process vêm em `after_fork()`."""
+        self.prefork = prefork
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def register(self, name: str, loader, warmup=None, required: bool = True, per_process: bool = False):
+        """`loader()` retorna o modelo; `warmup(model)` roda uma inferência de aquecimento.
+
+        `per_process`: o modelo usa threads ou processos filhos e, no prefork, é carregado em cada worker.
+        """
+        with self._lock:
+            self._slots[name] = _Slot(name, loader, warmup, required, per_process)
+
+    def start(self):
+        """Dispara o carregamento de todos os modelos registrados (idempotente)."""
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+            slots = [s for s in self._slots.values() if not (self.prefork and s.per_process)]
+        for slot in slots:
+            threading.Thread(target=self._load, args=(slot,), name=f"load-{slot.name}", daemon=True).start()
+        return self
+
+    def after_fork(self):
+        """No worker recém-criado: warm-ups dos modelos herdados e carga dos modelos per_process."""
+        if not self.prefork:
+            return self
+        for slot in list(self._slots.values()):
+            if slot.per_process:
+                target = self._load
+            elif slot.state == LOADED:
+                target = self._warm
+            else:
+                continue
+            threading.Thread(target=target, args=(slot,), name=f"load-{slot.name}", daemon=True).start()
+        return self
+
+    def get(self, name: str, timeout: float = None):
+        """Retorna o modelo, esperando o carregamento. Levanta `ModelUnavailable` se falhou."""
+        slot = self._slots[name]
+        if not self._started:
+            self.start()
+        if not slot.loaded.wait(timeout):
+            raise ModelUnavailable(f"Modelo '{name}' ainda carregando")
+        if slot.state == FAILED:
+            raise ModelUnavailable(f"Modelo '{name}' indisponível: {slot.error}")
+        return slot.model
+
+    def try_get(self, name: str, timeout: float = None):
+        """Como `get`, mas retorna None se o modelo falhou ou não existe."""
+        if name not in self._slots:
+            return None
+        try:
+            return self.get(name, timeout)
+        except ModelUnavailable:
+            return None
+
+    def state(self, name: str) -> str:
+        return self._slots[name].state
+
+    @property
+    def ready(self) -> bool:
+        """Todos os modelos obrigatórios carregados e aquecidos."""
+        return all(s.state == READY for s in self._slots.values() if s.required)
+
+    def wait_loaded(self, timeout: float = None) -> bool:
+        """Espera os pesos de todos os modelos que este processo carrega (prontos para o fork)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for slot in list(self._slots.values()):
+            if self.prefork and slot.per_process:
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not slot.loaded.wait(remaining):
+                return False
+        return all(
+            s.state != FAILED for s in self._slots.values()
+            if s.required and not (self.prefork and s.per_process)
+        )
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """Espera todos os modelos terminarem (prontos ou falhos)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for slot in list(self._slots.values()):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not slot.done.wait(remaining):
+                return False
+        return self.ready
+
+    def status(self):
+        return {
+            name: {
+                "state": slot.state,
+                "required": slot.required,
+                "error": slot.error,
+                "load_secs": slot.load_secs,
+                "warmup_secs": slot.warmup_secs,
+                "weights_mb": _mb(slot.weights_bytes),
+                "rss_delta_mb": _mb(slot.rss_delta_bytes),
+            }
+            for name, slot in self._slots.items()
+        }
+
+    def memory(self):
+        """Memória residente por modelo e do processo inteiro, em MB."""
+        shared = process_memory() or {}
+        return {
+            "pid": os.getpid(),
+            "process_rss_mb": _mb(process_rss_bytes()),
+            "process_pss_mb": _mb(shared.get("pss")),
+            "process_private_mb": _mb(shared.get("private")),
+            "models": {
+                name: {"weights_mb": _mb(slot.weights_bytes), "rss_delta_mb": _mb(slot.rss_delta_bytes)}
+                for name, slot in self._slots.items()
+            },
+        }
+
+    def _load(self, slot: _Slot):
+        start = time.perf_counter()
+        rss_before = process_rss_bytes()
+        slot.state = LOADING
+        try:
+            slot.model = slot.loader()
+        except Exception as e:
+            slot.state = FAILED
+            slot.error = str(e)
+            print(f"❌ Falha ao carregar '{slot.name}': {e}")
+            traceback.print_exc()
+            slot.loaded.set()
+            slot.done.set()
+            return
+        slot.load_secs = time.perf_counter() - start
+        slot.rss_delta_bytes = process_rss_bytes() - rss_before
+        try:
+            slot.weights_bytes = tensor_bytes(slot.model)
+        except Exception:
+            slot.weights_bytes = None
+        print(f"✅ Modelo '{slot.name}' carregado em {slot.load_secs:.1f}s "
+              f"(pesos: {_mb(slot.weights_bytes)} MB, RSS +{_mb(slot.rss_delta_bytes)} MB)")
+
+        if self.prefork and not slot.per_process and slot.warmup is not None:
+            # O warm-up roda em cada worker, depois do fork
+            slot.state = LOADED
+            slot.loaded.set()
+            return
+        self._warm(slot)
+
+    def _warm(self, slot: _Slot):
+        if slot.warmup is not None:
+            slot.state = WARMING
+            slot.loaded.set()
+            start = time.perf_counter()
+            try:
+                slot.warmup(slot.model)
+                slot.warmup_secs = time.perf_counter() - start
+                print(f"🔥 Modelo '{slot.name}' aquecido em {slot.warmup_secs:.1f}s")
+            except Exception as e:
+                # Warm-up é best effort: o modelo continua utilizável
+                print(f"⚠️ Warm-up de '{slot.name}' falhou: {e}")
+        slot.state = READY
+        slot.loaded.set()
+        slot.done.set()
+
+
+def _mb(n):
+    return None if n is None else round(n / (1024 * 1024), 1)
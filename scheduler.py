@@ -0,0 +1,190 @@
+"""
+Scheduler em estágios para o pipeline de voz (STT → LLM → TTS).
+
+Cada estágio tem seu próprio pool de workers e uma fila limitada na frente.
+Turnos de sessões diferentes avançam em paralelo: enquanto o Whisper
+transcreve a sessão B, o LLM da sessão A pode estar gerando e o XTTS da
+sessão C sintetizando. A admissão olha a profundidade das filas e recusa
+trabalho novo (`QueueFull`, com sugestão de retry) em vez de empilhar threads.
+"""
+
+import math
+import queue
+import threading
+import time
+import uuid
+
+
+class QueueFull(Exception):
+    """Sem capacidade para aceitar o job agora."""
+
+    def __init__(self, stage: str, retry_after: float):
+        super().__init__(f"Fila '{stage}' cheia, tente novamente em {retry_after:.0f}s")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class Job:
+    """Um turno de conversa atravessando os estágios."""
+
+    def __init__(self, session_id: str, **data):
+        self.id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.created = time.time()
+        self.status = "queued"
+        self.stage = None
+        self.error = None
+        self.data = data
+        self.finished = threading.Event()
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+
+class Stage:
+    """Pool de workers com fila limitada e estimativa de tempo de serviço."""
+
+    def __init__(self, name: str, handler, workers: int, max_queue: int, on_error=None):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.on_error = on_error
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.avg_secs = 1.0      # média móvel do tempo por job
+        self.active = 0
+        self.processed = 0
+        self._lock = threading.Lock()
+        self._start_workers()
+
+    def _start_workers(self):
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True).start()
+
+    def after_fork(self):
+        """No processo filho de um fork só a thread que chamou o fork existe: recria fila e workers."""
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.processed = 0
+        self._start_workers()
+
+    def submit(self, job: Job, block: bool = False):
+        """Enfileira o job; sem `block`, levanta `QueueFull` se a fila estiver cheia."""
+        job.stage = self.name
+        job.status = f"queued:{self.name}"
+        try:
+            self.queue.put(job, block=block)
+        except queue.Full:
+            raise QueueFull(self.name, self.retry_after())
+
+    def retry_after(self) -> float:
+        """Segundos estimados até liberar uma vaga na fila."""
+        with self._lock:
+            backlog = self.queue.qsize() + self.active
+            return max(1.0, math.ceil(backlog * self.avg_secs / max(1, self.workers)))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "active": self.active,
+                "queued": self.queue.qsize(),
+                "capacity": self.queue.maxsize,
+                "processed": self.processed,
+                "avg_secs": round(self.avg_secs, 3),
+            }
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            if job.finished.is_set():
+                continue
+            with self._lock:
+                self.active += 1
+            job.status = self.name
+            start = time.perf_counter()
+            try:
+                self.handler(job)
+            except Exception as e:
+                job.error = str(e)
+                if self.on_error is not None:
+                    self.on_error(job, e)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.active -= 1
+                    self.processed += 1
+                    self.avg_secs = 0.8 * self.avg_secs + 0.2 * elapsed
+
+
+class StagedScheduler:
+    """Encadeia estágios nomeados e controla a admissão de jobs novos."""
+
+    def __init__(self, max_inflight: int = 16):
+        self.max_inflight = max_inflight
+        self.stages = {}
+        self._order = []
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, handler, workers: int = 1, max_queue: int = 8, on_error=None):
+        self.stages[name] = Stage(name, handler, workers, max_queue, on_error=on_error)
+        self._order.append(name)
+        return self.stages[name]
+
+    def after_fork(self):
+        """Recria os pools de workers de todos os estágios (worker do gunicorn com preload)."""
+        self._lock = threading.Lock()
+        self._inflight = {}
+        for stage in self.stages.values():
+            stage.after_fork()
+
+    def check_admission(self):
+        """Levanta `QueueFull` se um job novo não caberia agora."""
+        first = self.stages[self._order[0]]
+        with self._lock:
+            inflight = len(self._inflight)
+        if inflight >= self.max_inflight:
+            raise QueueFull("inflight", max(s.retry_after() for s in self.stages.values()))
+        if first.queue.full():
+            raise QueueFull(first.name, first.retry_after())
+
+    def submit(self, job: Job):
+        """Admite o job no primeiro estágio (ou levanta `QueueFull`)."""
+        self.check_admission()
+        with self._lock:
+            self._inflight[job.id] = job
+        try:
+            self.stages[self._order[0]].submit(job)
+        except QueueFull:
+            self.finish(job, status="rejected")
+            raise
+        return job
+
+    def forward(self, job: Job, stage: str):
+        """Passa o job para outro estágio (bloqueia se a fila estiver cheia: backpressure)."""
+        if not job.finished.is_set():
+            self.stages[stage].submit(job, block=True)
+
+    def finish(self, job: Job, status: str = "done", error: str = None):
+        job.status = status
+        if error is not None:
+            job.error = error
+        job.finished.set()
+        with self._lock:
+            self._inflight.pop(job.id, None)
+
+    def stats(self):
+        with self._lock:
+            inflight = len(self._inflight)
+        return {
+            "inflight": inflight,
+            "max_inflight": self.max_inflight,
+            "stages": {name: self.stages[name].stats() for name in self._order},
+        }
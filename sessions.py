@@ -0,0 +1,84 @@
+"""
+Estado por sessão de conversa.
+
+Cada cliente envia um id de sessão (header `X-Session-Id`); o backend guarda
+um dicionário de estado separado para cada um. Sessões ociosas expiram.
+"""
+
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_SESSION = "default"
+_VALID_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def valid_session_id(session_id: str) -> bool:
+    return bool(session_id) and bool(_VALID_ID.match(session_id))
+
+
+class SessionStore:
+    """Dicionários de estado por sessão, protegidos por um único lock."""
+
+    def __init__(self, factory, idle_ttl: float = 3600.0, max_sessions: int = 1000):
+        self._factory = factory
+        self._sessions = {}
+        self._touched = {}
+        self._lock = threading.Lock()
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+
+    def _ensure(self, session_id: str):
+        state = self._sessions.get(session_id)
+        if state is None:
+            self._evict_idle()
+            state = self._sessions[session_id] = self._factory()
+        self._touched[session_id] = time.monotonic()
+        return state
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        idle = [
+            sid for sid, t in self._touched.items()
+            if now - t > self.idle_ttl and not self._busy(self._sessions[sid])
+        ]
+        if len(self._sessions) >= self.max_sessions:
+            idle += sorted(
+                (sid for sid in self._sessions if not self._busy(self._sessions[sid])),
+                key=self._touched.get,
+            )[:len(self._sessions) - self.max_sessions + 1]
+        for sid in set(idle):
+            self._sessions.pop(sid, None)
+            self._touched.pop(sid, None)
+
+    @staticmethod
+    def _busy(state) -> bool:
+        return any(state.get(k) for k in ("is_recording", "is_processing", "is_speaking"))
+
+    def update(self, session_id: str, **kwargs):
+        """Atualiza o estado e retorna só as chaves cujo valor mudou."""
+        with self._lock:
+            state = self._ensure(session_id)
+            changed = {k: v for k, v in kwargs.items() if state.get(k) is not v and state.get(k) != v}
+            state.update(kwargs)
+        return changed
+
+    def get(self, session_id: str):
+        """Cópia do estado da sessão (criada com os valores padrão se não existir)."""
+        with self._lock:
+            return self._ensure(session_id).copy()
+
+    @contextmanager
+    def locked(self, session_id: str):
+        """Acesso direto ao dicionário da sessão sob o lock (para test-and-set)."""
+        with self._lock:
+            yield self._ensure(session_id)
+
+    def ids(self):
+        with self._lock:
+            return list(self._sessions)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,108 @@
+"""
+Pipeline LLM → TTS → playback por segmentos.
+
+O chamador empurra segmentos de texto (frases) à medida que o LLM os gera.
+Um worker sintetiza cada segmento e joga os chunks de áudio numa fila que o
+player consome continuamente, de modo que a síntese da frase 1 se sobrepõe à
+geração da frase 2 e à reprodução da frase 0.
+"""
+
+import queue
+import threading
+
+from audio_playback import PlaybackStats
+from cancellation import Cancelled
+
+_DONE = object()
+
+
+class SpeechPipeline:
+    """Fila de segmentos → worker de síntese → fila de áudio → player."""
+
+    def __init__(self, synthesize, player, max_pending: int = 8, on_audio_start=None, cancel=None):
+        """
+        synthesize: callable(texto) -> iterável de chunks float32
+        player: objeto com `play_stream(chunks, cancel) -> PlaybackStats`
+        on_audio_start: callback opcional chamado quando o primeiro chunk fica pronto
+        cancel: CancelToken opcional; ao cancelar, segmentos pendentes são descartados e a reprodução para
+        """
+        self.synthesize = synthesize
+        self.player = player
+        self.on_audio_start = on_audio_start
+        self.cancel = cancel
+        self.segments = []
+        self.errors = []
+        self.stats = PlaybackStats()
+        self._text_q = queue.Queue(maxsize=max_pending)
+        self._audio_q = queue.Queue(maxsize=64)
+        self._audio_done = False
+        self._tts_thread = threading.Thread(target=self._tts_worker, daemon=True)
+        self._play_thread = threading.Thread(target=self._play_worker, daemon=True)
+
+    def start(self):
+        self._tts_thread.start()
+        self._play_thread.start()
+        return self
+
+    def push(self, segment: str):
+        """Enfileira um segmento de texto para síntese."""
+        segment = segment.strip()
+        if segment:
+            self.segments.append(segment)
+            self._text_q.put(segment)
+
+    def finish(self) -> PlaybackStats:
+        """Sinaliza o fim do texto e espera a reprodução terminar."""
+        self._text_q.put(_DONE)
+        self._tts_thread.join()
+        self._play_thread.join()
+        return self.stats
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.finish()
+
+    def _tts_worker(self):
+        first = True
+        try:
+            while True:
+                segment = self._text_q.get()
+                if segment is _DONE:
+                    break
+                if self.cancel is not None and self.cancel.cancelled:
+                    continue  # continua drenando para não travar quem empurra
+                try:
+                    for chunk in self.synthesize(segment):
+                        if self.cancel is not None and self.cancel.cancelled:
+                            break
+                        if first and self.on_audio_start is not None:
+                            self.on_audio_start()
+                        first = False
+                        self._audio_q.put(chunk)
+                except Cancelled:
+                    pass
+                except Exception as e:
+                    print(f"❌ TTS Erro no segmento '{segment[:40]}': {e}")
+                    self.errors.append(e)
+        finally:
+            self._audio_q.put(_DONE)
+
+    def _audio_chunks(self):
+        while not self._audio_done:
+            chunk = self._audio_q.get()
+            if chunk is _DONE:
+                self._audio_done = True
+                return
+            yield chunk
+
+    def _play_worker(self):
+        try:
+            self.stats = self.player.play_stream(self._audio_chunks(), cancel=self.cancel)
+        except Exception as e:
+            print(f"❌ Erro na reprodução: {e}")
+            self.errors.append(e)
+        # Drena a fila (erro ou cancelamento) para não travar o worker de síntese
+        for _ in self._audio_chunks():
+            pass
@@ -1,7 +1,7 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
-import { Send, Bot, User, Loader } from 'lucide-react';
-import { sendChatMessage } from '../services/api';
+import { Send, Bot, User, Loader, Volume2 } from 'lucide-react';
+import { streamChatMessage, speakText } from '../services/api';
 
 const ChatInterface = ({ isConnected }) => {
   const [messages, setMessages] = useState([
@@ -14,13 +14,18 @@ const ChatInterface = ({ isConnected }) => {
   ]);
   const [inputText, setInputText] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  const [speakingId, setSpeakingId] = useState(null);
   const messagesEndRef = useRef(null);
   const inputRef = useRef(null);
+  const abortRef = useRef(null);
 
   useEffect(() => {
     scrollToBottom();
   }, [messages]);
 
+  // Leaving the page closes the stream (and the server closes the LLM stream)
+  useEffect(() => () => abortRef.current?.abort(), []);
+
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   };
@@ -40,17 +45,48 @@ const ChatInterface = ({ isConnected }) => {
     setInputText('');
     setIsLoading(true);
 
+    const assistantId = Date.now() + 1;
+    const updateAssistant = (update) => setMessages(prev => prev.map(m =>
+      m.id === assistantId ? { ...m, ...update(m) } : m
+    ));
+    let started = false;
+    abortRef.current = new AbortController();
+
     try {
-      const response = await sendChatMessage(inputText);
-      
-      const assistantMessage = {
-        id: Date.now() + 1,
-        text: response.response,
-        sender: 'assistant',
-        timestamp: new Date().toLocaleTimeString()
-      };
+      // Tokens are rendered as they arrive; the bubble appears with the first one
+      const response = await streamChatMessage(inputText, {
+        signal: abortRef.current.signal,
+        onToken: (text) => {
+          if (!started) {
+            started = true;
+            setIsLoading(false);
+            setMessages(prev => [...prev, {
+              id: assistantId,
+              text,
+              sender: 'assistant',
+              timestamp: new Date().toLocaleTimeString(),
+              streaming: true
+            }]);
+          } else {
+            updateAssistant(m => ({ text: m.text + text }));
+          }
+        },
+      });
 
-      setMessages(prev => [...prev, assistantMessage]);
+      if (started) {
+        updateAssistant(() => ({
+          text: response.response,
+          tokenTtft: response.clientTtft,
+          streaming: false
+        }));
+      } else {
+        setMessages(prev => [...prev, {
+          id: assistantId,
+          text: response.response,
+          sender: 'assistant',
+          timestamp: new Date().toLocaleTimeString()
+        }]);
+      }
     } catch (error) {
       const errorMessage = {
         id: Date.now() + 1,
@@ -59,13 +95,32 @@ const ChatInterface = ({ isConnected }) => {
         timestamp: new Date().toLocaleTimeString(),
         isError: true
       };
-      setMessages(prev => [...prev, errorMessage]);
+      setMessages(prev => [...prev.filter(m => m.id !== assistantId), errorMessage]);
     } finally {
+      abortRef.current = null;
       setIsLoading(false);
       inputRef.current?.focus();
     }
   };
 
+  // Vorlesen: audio streamed from /speak and played while XTTS is still synthesizing
+  const handleSpeak = async (message) => {
+    if (speakingId !== null) return;
+    setSpeakingId(message.id);
+    try {
+      const playback = await speakText(message.text, {
+        onFirstAudio: (ttfb) => setMessages(prev => prev.map(m =>
+          m.id === message.id ? { ...m, ttfb } : m
+        )),
+      });
+      await playback.finished;
+    } catch (error) {
+      console.error('Speech playback failed:', error);
+    } finally {
+      setSpeakingId(null);
+    }
+  };
+
   const TypingIndicator = () => (
     <motion.div
       initial={{ opacity: 0, y: 10 }}
@@ -83,8 +138,11 @@ const ChatInterface = ({ isConnected }) => {
     </motion.div>
   );
 
-  const MessageBubble = ({ message }) => (
+  // Rendered as a plain function (not a component defined in render), so bubbles
+  // are not remounted (and re-animated) on every streamed token
+  const renderMessage = (message) => (
     <motion.div
+      key={message.id}
       initial={{ opacity: 0, y: 20 }}
       animate={{ opacity: 1, y: 0 }}
       className={`chat-message ${
@@ -112,9 +170,36 @@ const ChatInterface = ({ isConnected }) => {
           <p className="text-sm leading-relaxed whitespace-pre-wrap">
             {message.text}
           </p>
-          <p className="text-xs opacity-60 mt-2">
-            {message.timestamp}
-          </p>
+          <div className="flex items-center space-x-3 mt-2">
+            <p className="text-xs opacity-60">
+              {message.timestamp}
+            </p>
+            {message.sender === 'assistant' && !message.isError && !message.streaming && (
+              <button
+                type="button"
+                onClick={() => handleSpeak(message)}
+                disabled={!isConnected || speakingId !== null}
+                className="flex items-center space-x-1 text-xs text-primary-600 hover:text-primary-700 disabled:opacity-50 disabled:cursor-not-allowed"
+              >
+                {speakingId === message.id ? (
+                  <Loader className="w-3 h-3 animate-spin" />
+                ) : (
+                  <Volume2 className="w-3 h-3" />
+                )}
+                <span>Vorlesen</span>
+              </button>
+            )}
+            {message.tokenTtft != null && (
+              <span className="text-xs opacity-60">
+                Erstes Token nach {Math.round(message.tokenTtft)} ms
+              </span>
+            )}
+            {message.ttfb !== undefined && (
+              <span className="text-xs opacity-60">
+                Erstes Audio nach {Math.round(message.ttfb)} ms
+              </span>
+            )}
+          </div>
         </div>
       </div>
     </motion.div>
@@ -145,9 +230,7 @@ const ChatInterface = ({ isConnected }) => {
         {/* Messages Container */}
         <div className="chat-container h-96 overflow-y-auto p-6 space-y-4 bg-gray-50">
           <AnimatePresence>
-            {messages.map((message) => (
-              <MessageBubble key={message.id} message={message} />
-            ))}
+            {messages.map(renderMessage)}
             {isLoading && <TypingIndicator />}
           </AnimatePresence>
           <div ref={messagesEndRef} />
@@ -1,7 +1,16 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { Mic, MicOff, Volume2, Settings } from 'lucide-react';
-import { startRecording, stopRecording, getCurrentStatus } from '../services/api';
+import {
+  startRecording,
+  stopRecording,
+  getCurrentStatus,
+  subscribeToStatus,
+  supportsClientCapture,
+  startClientRecording,
+  playTurnAudio,
+} from '../services/api';
+import { getAudioContext } from '../services/audioStream';
 
 const VoiceMode = ({ isConnected }) => {
   const [isRecording, setIsRecording] = useState(false);
@@ -10,36 +19,79 @@ const VoiceMode = ({ isConnected }) => {
   const [currentText, setCurrentText] = useState('');
   const [lastResponse, setLastResponse] = useState('');
   const [recordingDuration, setRecordingDuration] = useState(0);
+  // Mikrofon im Browser (Upload zum Server) statt Mikrofon des Servers
+  const [browserMic, setBrowserMic] = useState(supportsClientCapture);
+  // Time-to-first-byte da resposta tocada no navegador (ms)
+  const [audioTtfb, setAudioTtfb] = useState(null);
   // Removido isListening pois não está sendo usado
   
   const intervalRef = useRef(null);
   const statusIntervalRef = useRef(null);
+  const senderRef = useRef(null);
+  const playbackRef = useRef(null);
 
   useEffect(() => {
-    // Check status every second
-    if (isConnected) {
-      statusIntervalRef.current = setInterval(checkStatus, 1000);
-    }
+    if (!isConnected) return undefined;
+
+    // Status push via SSE; polling every second only as fallback
+    const unsubscribe = subscribeToStatus(
+      {
+        status: applyStatus,
+        partial: ({ text }) => setCurrentText(text),
+        transcription: ({ text }) => setCurrentText(text),
+        response: ({ text }) => setLastResponse(text),
+      },
+      () => {
+        if (!statusIntervalRef.current) {
+          statusIntervalRef.current = setInterval(checkStatus, 1000);
+        }
+      }
+    );
     
     return () => {
+      unsubscribe();
+      if (senderRef.current) senderRef.current.cancel();
+      senderRef.current = null;
+      if (playbackRef.current) playbackRef.current.stop();
+      playbackRef.current = null;
       if (intervalRef.current) clearInterval(intervalRef.current);
       if (statusIntervalRef.current) clearInterval(statusIntervalRef.current);
+      statusIntervalRef.current = null;
     };
   }, [isConnected]);
 
+  const applyStatus = (status) => {
+    setIsProcessing(status.processing);
+    setIsSpeaking(status.speaking);
+    if (status.partialTranscription) {
+      setCurrentText(status.partialTranscription);
+    }
+    if (status.lastResponse) {
+      setLastResponse(status.lastResponse);
+    }
+  };
+
   const checkStatus = async () => {
     try {
-      const status = await getCurrentStatus();
-      setIsProcessing(status.processing);
-      setIsSpeaking(status.speaking);
-      if (status.lastResponse) {
-        setLastResponse(status.lastResponse);
-      }
+      applyStatus(await getCurrentStatus());
     } catch (error) {
       console.error('Status check failed:', error);
     }
   };
 
+  // Turnos do Browser-Mikrofon: a resposta vem em streaming e toca aqui, não no servidor
+  const playAnswer = async () => {
+    try {
+      const playback = await playTurnAudio({ onFirstAudio: setAudioTtfb });
+      playbackRef.current = playback;
+      await playback.finished;
+    } catch (error) {
+      console.error('Answer playback failed:', error);
+    } finally {
+      playbackRef.current = null;
+    }
+  };
+
   const handleVoiceToggle = async () => {
     if (!isConnected) return;
 
@@ -50,9 +102,17 @@ const VoiceMode = ({ isConnected }) => {
       clearInterval(intervalRef.current);
       
       try {
-        const response = await stopRecording();
-        setCurrentText(response.transcription);
-        setLastResponse(response.response);
+        if (senderRef.current) {
+          // Sends the last chunk and ends the turn; results arrive via status events
+          const sender = senderRef.current;
+          senderRef.current = null;
+          await sender.stop();
+          playAnswer();
+        } else {
+          const response = await stopRecording();
+          setCurrentText(response.transcription);
+          setLastResponse(response.response);
+        }
       } catch (error) {
         console.error('Recording failed:', error);
         setCurrentText('Fehler bei der Aufnahme');
@@ -65,6 +125,8 @@ const VoiceMode = ({ isConnected }) => {
       setIsRecording(true);
       setCurrentText('');
       setRecordingDuration(0);
+      setAudioTtfb(null);
+      if (playbackRef.current) playbackRef.current.stop();
       
       // Start timer
       intervalRef.current = setInterval(() => {
@@ -72,7 +134,22 @@ const VoiceMode = ({ isConnected }) => {
       }, 1000);
       
       try {
-        await startRecording();
+        if (browserMic) {
+          // Inside the click: unlocks Web Audio playback of the answer
+          getAudioContext();
+          senderRef.current = await startClientRecording({
+            // Server ended the turn (VAD or duration limit)
+            onEnded: () => {
+              senderRef.current = null;
+              setIsRecording(false);
+              clearInterval(intervalRef.current);
+              setRecordingDuration(0);
+              playAnswer();
+            },
+          });
+        } else {
+          await startRecording();
+        }
       } catch (error) {
         console.error('Failed to start recording:', error);
         setIsRecording(false);
@@ -144,6 +221,12 @@ const VoiceMode = ({ isConnected }) => {
           👂 Bereit zum Zuhören
         </div>
       )}
+
+      {audioTtfb !== null && (
+        <div className="text-xs text-gray-500">
+          Erstes Audio nach {Math.round(audioTtfb)} ms
+        </div>
+      )}
     </motion.div>
   );
 
@@ -283,6 +366,17 @@ const VoiceMode = ({ isConnected }) => {
                   ? "Klicke den Mikrofon-Button und sprich deine Frage"
                   : "Backend nicht verbunden - stelle sicher, dass der Server läuft"}
               </p>
+              {isConnected && supportsClientCapture() && (
+                <label className="flex items-center justify-center space-x-2 text-xs">
+                  <input
+                    type="checkbox"
+                    checked={browserMic}
+                    disabled={isRecording || isProcessing}
+                    onChange={(e) => setBrowserMic(e.target.checked)}
+                  />
+                  <span>Browser-Mikrofon verwenden</span>
+                </label>
+              )}
               {isConnected && (
                 <div className="flex items-center justify-center space-x-4 text-xs">
                   <span className="flex items-center">
@@ -1,3 +1,5 @@
+import { playWavStream } from './audioStream';
+
 const API_BASE_URL = 'http://localhost:8080';
 
 class APIError extends Error {
@@ -8,22 +10,40 @@ class APIError extends Error {
   }
 }
 
+// Uma sessão de voz por aba do navegador
+const getSessionId = () => {
+  let sessionId = sessionStorage.getItem('voiceSessionId');
+  if (!sessionId) {
+    sessionId = window.crypto?.randomUUID
+      ? window.crypto.randomUUID()
+      : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    sessionStorage.setItem('voiceSessionId', sessionId);
+  }
+  return sessionId;
+};
+
+export const SESSION_ID = getSessionId();
+
 const apiRequest = async (endpoint, options = {}) => {
   try {
     const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+      ...options,
       headers: {
         'Content-Type': 'application/json',
+        'X-Session-Id': SESSION_ID,
         ...options.headers,
       },
-      ...options,
     });
 
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}));
-      throw new APIError(
+      const error = new APIError(
         errorData.error || `HTTP ${response.status}: ${response.statusText}`,
         response.status
       );
+      // 429: servidor ocupado, com sugestão de quando tentar de novo
+      error.retryAfter = errorData.retryAfter;
+      throw error;
     }
 
     return await response.json();
@@ -39,6 +59,35 @@ const apiRequest = async (endpoint, options = {}) => {
   }
 };
 
+// Como apiRequest, mas devolve a Response para ler o corpo em streaming
+const streamRequest = async (endpoint, options = {}) => {
+  let response;
+  try {
+    response = await fetch(`${API_BASE_URL}${endpoint}`, {
+      ...options,
+      headers: {
+        'X-Session-Id': SESSION_ID,
+        ...options.headers,
+      },
+    });
+  } catch (error) {
+    throw new APIError(
+      'Verbindung zum Backend fehlgeschlagen. Ist der Server gestartet?',
+      0
+    );
+  }
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    const error = new APIError(
+      errorData.error || `HTTP ${response.status}: ${response.statusText}`,
+      response.status
+    );
+    error.retryAfter = errorData.retryAfter;
+    throw error;
+  }
+  return response;
+};
+
 // Chat API
 export const sendChatMessage = async (message) => {
   return await apiRequest('/chat', {
@@ -47,10 +96,66 @@ export const sendChatMessage = async (message) => {
   });
 };
 
+// Resposta do chat token a token: SSE lido com fetch (EventSource só faz GET).
+// onToken(text) recebe cada pedaço. Resolve com o evento final (response, promptTokens,
+// ttft do servidor em s) mais clientTtft: ms do envio até o primeiro token.
+// Abortar via `signal` fecha a conexão, e o servidor encerra o stream do LLM.
+export const streamChatMessage = async (message, { onToken, signal } = {}) => {
+  const startedAt = performance.now();
+  const response = await streamRequest('/chat/stream', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ message }),
+    signal,
+  });
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let clientTtft = null;
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = 'message';
+      const data = [];
+      block.split('\n').forEach((line) => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data.push(line.slice(5).trimStart());
+      });
+      // Sem data: comentário de keep-alive
+      if (!data.length) continue;
+      const payload = JSON.parse(data.join('\n'));
+      if (event === 'token') {
+        if (clientTtft === null) clientTtft = performance.now() - startedAt;
+        if (onToken) onToken(payload.text);
+      } else if (event === 'done') {
+        reader.cancel().catch(() => {});
+        return { ...payload, clientTtft };
+      } else if (event === 'error') {
+        reader.cancel().catch(() => {});
+        throw new APIError(payload.error, 500);
+      }
+    }
+  }
+  throw new APIError('Antwort-Stream vorzeitig beendet', 0);
+};
+
 // Voice API
-export const startRecording = async () => {
+// mode: 'fixed' (duração fixa) ou 'vad' (termina sozinho quando a fala para)
+// stt: 'batch' ou 'streaming' (transcrição parcial enquanto fala)
+export const startRecording = async (mode, stt, bargeIn) => {
+  const body = {};
+  if (mode) body.mode = mode;
+  if (stt) body.stt = stt;
+  if (bargeIn !== undefined) body.bargeIn = bargeIn;
   return await apiRequest('/voice/start', {
     method: 'POST',
+    body: JSON.stringify(body),
   });
 };
 
@@ -60,10 +165,164 @@ export const stopRecording = async () => {
   });
 };
 
+// Captura no navegador: o áudio vai para o servidor em pedaços, sem usar o microfone dele
+export const startUpload = async ({ format, mode, stt } = {}) => {
+  const body = { format };
+  if (mode) body.mode = mode;
+  if (stt) body.stt = stt;
+  return await apiRequest('/voice/upload/start', {
+    method: 'POST',
+    body: JSON.stringify(body),
+  });
+};
+
+// Envia um pedaço (Blob/ArrayBuffer); end=true encerra o turno depois dele
+export const uploadAudioChunk = async (chunk, end = false) => {
+  return await apiRequest(`/voice/upload${end ? '?end=1' : ''}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/octet-stream' },
+    body: chunk,
+  });
+};
+
+const OPUS_TYPES = [
+  ['audio/webm;codecs=opus', 'webm'],
+  ['audio/ogg;codecs=opus', 'ogg'],
+];
+
+export const supportsClientCapture = () =>
+  Boolean(
+    navigator.mediaDevices?.getUserMedia &&
+    window.MediaRecorder &&
+    OPUS_TYPES.some(([type]) => MediaRecorder.isTypeSupported(type))
+  );
+
+// Grava o microfone do navegador com MediaRecorder (Opus) e envia um pedaço a cada
+// `timeslice` ms, sempre em ordem. onEnded é chamado quando o servidor encerra o
+// turno sozinho (VAD ou duração). Retorna { stop, cancel }.
+export const startClientRecording = async ({ mode, stt, timeslice = 250, onEnded } = {}) => {
+  const [mimeType, format] = OPUS_TYPES.find(([type]) => MediaRecorder.isTypeSupported(type));
+  const stream = await navigator.mediaDevices.getUserMedia({
+    audio: { channelCount: 1, echoCancellation: true, noiseSuppression: true },
+  });
+  const stopTracks = () => stream.getTracks().forEach((track) => track.stop());
+
+  try {
+    await startUpload({ format, mode, stt });
+  } catch (error) {
+    stopTracks();
+    throw error;
+  }
+
+  const recorder = new MediaRecorder(stream, { mimeType, audioBitsPerSecond: 32000 });
+  let sending = Promise.resolve();
+  let ended = false;
+
+  const finish = () => {
+    if (ended) return;
+    ended = true;
+    if (recorder.state !== 'inactive') recorder.stop();
+    stopTracks();
+  };
+
+  const send = (chunk, end = false) => {
+    sending = sending
+      .then(() => uploadAudioChunk(chunk, end))
+      .then((result) => {
+        if (result.ended && !ended) {
+          finish();
+          if (onEnded) onEnded(result);
+        }
+        return result;
+      })
+      .catch((error) => {
+        console.error('Audio upload failed:', error);
+        finish();
+      });
+    return sending;
+  };
+
+  recorder.ondataavailable = (event) => {
+    if (event.data.size && !ended) send(event.data);
+  };
+  recorder.start(timeslice);
+
+  return {
+    mimeType,
+    // Último pedaço + fim do turno (o dataavailable final chega antes do evento stop)
+    stop: () =>
+      new Promise((resolve) => {
+        if (ended) {
+          resolve(sending);
+          return;
+        }
+        recorder.onstop = () => {
+          stopTracks();
+          resolve(send(new Blob(), true));
+        };
+        recorder.stop();
+      }).finally(() => {
+        ended = true;
+      }),
+    cancel: finish,
+  };
+};
+
+// Áudio sintetizado tocado no navegador enquanto o XTTS gera
+// format: 'pcm16' ou 'mulaw' (metade da banda). onFirstAudio(ms) recebe o time-to-first-byte.
+// Retornam { stop, finished } (ver playWavStream).
+export const speakText = async (text, { format = 'pcm16', onFirstAudio } = {}) => {
+  const startedAt = performance.now();
+  const response = await streamRequest('/speak', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ text, format }),
+  });
+  return playWavStream(response, { startedAt, onFirstAudio });
+};
+
+// Resposta do turno atual (turnos com audioOutput 'client', o padrão da captura no navegador)
+export const playTurnAudio = async ({ format = 'pcm16', onFirstAudio } = {}) => {
+  const startedAt = performance.now();
+  const response = await streamRequest(`/voice/audio?format=${encodeURIComponent(format)}`);
+  return playWavStream(response, { startedAt, onFirstAudio });
+};
+
 export const getCurrentStatus = async () => {
   return await apiRequest('/voice/status');
 };
 
+// Push de status via Server-Sent Events; retorna uma função para encerrar.
+// Se o stream não abrir (ou o navegador não suportar), chama onUnavailable.
+export const subscribeToStatus = (handlers, onUnavailable) => {
+  if (!window.EventSource) {
+    onUnavailable();
+    return () => {};
+  }
+
+  const source = new EventSource(
+    `${API_BASE_URL}/voice/events?session=${encodeURIComponent(SESSION_ID)}`
+  );
+  let opened = false;
+
+  source.onopen = () => {
+    opened = true;
+  };
+  source.onerror = () => {
+    // Nunca conectou ou o servidor fechou de vez: volta para polling
+    if (!opened || source.readyState === EventSource.CLOSED) {
+      source.close();
+      onUnavailable();
+    }
+  };
+
+  Object.entries(handlers).forEach(([event, handler]) => {
+    source.addEventListener(event, (e) => handler(JSON.parse(e.data)));
+  });
+
+  return () => source.close();
+};
+
 // Health check
 export const checkHealth = async () => {
   return await apiRequest('/health');
@@ -83,9 +342,17 @@ export const updateConfig = async (config) => {
 
 const api = {
   sendChatMessage,
+  streamChatMessage,
   startRecording,
   stopRecording,
+  startUpload,
+  uploadAudioChunk,
+  supportsClientCapture,
+  startClientRecording,
+  speakText,
+  playTurnAudio,
   getCurrentStatus,
+  subscribeToStatus,
   checkHealth,
   getConfig,
   updateConfig,
@@ -0,0 +1,160 @@
+// Reprodução de WAV em streaming (cabeçalho com tamanho indefinido) via Web Audio:
+// cada pedaço é decodificado e agendado assim que chega, com uma folga mínima,
+// sem esperar o arquivo inteiro como um <audio> faria.
+
+// Folga antes do primeiro pedaço (e depois de um underrun)
+const LEAD_SECONDS = 0.05;
+
+// G.711 μ-law -> float
+const MULAW_TABLE = (() => {
+  const table = new Float32Array(256);
+  for (let i = 0; i < 256; i += 1) {
+    const u = ~i & 0xff;
+    const exponent = (u >> 4) & 0x07;
+    const magnitude = ((((u & 0x0f) << 3) + 0x84) << exponent) - 0x84;
+    table[i] = (u & 0x80 ? -magnitude : magnitude) / 32768;
+  }
+  return table;
+})();
+
+const WAV_FORMATS = { 1: 'pcm16', 7: 'mulaw' };
+
+let sharedContext = null;
+
+// Um AudioContext para a aba; chame num gesto do usuário (clique) para liberar o autoplay
+export const getAudioContext = () => {
+  if (!sharedContext) {
+    const AudioContextClass = window.AudioContext || window.webkitAudioContext;
+    sharedContext = new AudioContextClass();
+  }
+  if (sharedContext.state === 'suspended') sharedContext.resume();
+  return sharedContext;
+};
+
+const concat = (a, b) => {
+  const out = new Uint8Array(a.length + b.length);
+  out.set(a, 0);
+  out.set(b, a.length);
+  return out;
+};
+
+// Percorre os chunks RIFF até "data"; null enquanto o cabeçalho não chegou inteiro
+const parseWavHeader = (bytes) => {
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  const tag = (offset) => String.fromCharCode(...bytes.subarray(offset, offset + 4));
+  if (bytes.length < 12) return null;
+  if (tag(0) !== 'RIFF' || tag(8) !== 'WAVE') {
+    throw new Error('Antwort ist kein WAV-Audio');
+  }
+  let offset = 12;
+  let fmt = null;
+  while (offset + 8 <= bytes.length) {
+    const id = tag(offset);
+    const size = view.getUint32(offset + 4, true);
+    if (id === 'data') {
+      if (!fmt) throw new Error('WAV ohne fmt-Chunk');
+      return { ...fmt, dataOffset: offset + 8 };
+    }
+    if (id === 'fmt ') {
+      if (offset + 24 > bytes.length) return null;
+      const code = view.getUint16(offset + 8, true);
+      fmt = {
+        format: WAV_FORMATS[code],
+        channels: view.getUint16(offset + 10, true),
+        sampleRate: view.getUint32(offset + 12, true),
+      };
+      if (!fmt.format || fmt.channels !== 1) {
+        throw new Error(`Nicht unterstütztes WAV-Format (${code}, ${fmt.channels} Kanäle)`);
+      }
+    }
+    offset += 8 + size + (size % 2);
+  }
+  return null;
+};
+
+// Toca o corpo WAV de `response` enquanto ele chega.
+// startedAt: performance.now() de antes do fetch, para medir o time-to-first-byte.
+// Retorna { stop, finished }; finished resolve com { ttfb, duration, underruns, format }.
+export const playWavStream = (response, { startedAt = performance.now(), onFirstAudio } = {}) => {
+  const context = getAudioContext();
+  const reader = response.body.getReader();
+  const sources = new Set();
+  let stopped = false;
+  let header = null;
+  let pending = new Uint8Array(0);
+  let playAt = 0;
+  let samples = 0;
+  let underruns = 0;
+  let ttfb = null;
+
+  const schedule = (channel) => {
+    if (!channel.length || stopped) return;
+    const buffer = context.createBuffer(1, channel.length, header.sampleRate);
+    buffer.copyToChannel(channel, 0);
+    const source = context.createBufferSource();
+    source.buffer = buffer;
+    source.connect(context.destination);
+    if (playAt < context.currentTime) {
+      if (samples) underruns += 1;
+      playAt = context.currentTime + LEAD_SECONDS;
+    }
+    source.start(playAt);
+    playAt += buffer.duration;
+    samples += channel.length;
+    sources.add(source);
+    source.onended = () => sources.delete(source);
+  };
+
+  // Decodifica o que estiver completo em `pending` (PCM16 pode chegar com um byte a mais)
+  const decode = () => {
+    if (header.format === 'mulaw') {
+      const channel = Float32Array.from(pending, (b) => MULAW_TABLE[b]);
+      pending = new Uint8Array(0);
+      return channel;
+    }
+    const usable = pending.length - (pending.length % 2);
+    const pcm = new Int16Array(pending.slice(0, usable).buffer);
+    pending = pending.slice(usable);
+    return Float32Array.from(pcm, (s) => s / 32768);
+  };
+
+  const run = async () => {
+    while (!stopped) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      pending = concat(pending, value);
+      if (!header) {
+        header = parseWavHeader(pending);
+        if (!header) continue;
+        pending = pending.slice(header.dataOffset);
+      }
+      if (!pending.length) continue;
+      if (ttfb === null) {
+        ttfb = performance.now() - startedAt;
+        if (onFirstAudio) onFirstAudio(ttfb);
+      }
+      schedule(decode());
+    }
+    // Espera o fim do que já foi agendado
+    const remaining = Math.max(0, playAt - context.currentTime);
+    if (!stopped && remaining) {
+      await new Promise((resolve) => setTimeout(resolve, remaining * 1000));
+    }
+    return {
+      ttfb,
+      duration: header ? samples / header.sampleRate : 0,
+      underruns,
+      format: header?.format,
+    };
+  };
+
+  return {
+    stop: () => {
+      stopped = true;
+      reader.cancel().catch(() => {});
+      sources.forEach((source) => source.stop());
+      sources.clear();
+    },
+    finished: run(),
+  };
+};
@@ -0,0 +1,151 @@
+"""
+Transcrição incremental enquanto o usuário ainda está falando.
+
+Uma thread retranscreve periodicamente a janela ainda não confirmada do
+buffer de captura (`audio_capture.Capture`). Palavras que aparecem iguais em
+duas passadas consecutivas (política *local agreement*) são confirmadas e
+não voltam a ser decodificadas. Ao fim da fala só a cauda instável precisa
+passar pelo Whisper.
+
+`transcribe_words(audio, initial_prompt)` deve retornar uma lista de
+`(inicio_s, fim_s, palavra)` com tempos relativos ao início de `audio`.
+"""
+
+import re
+import threading
+
+_NORMALIZE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def _norm(word: str) -> str:
+    return _NORMALIZE.sub("", word.lower())
+
+
+class LocalAgreement:
+    """Confirma o maior prefixo comum entre duas hipóteses consecutivas."""
+
+    def __init__(self):
+        self.committed = []    # [(inicio, fim, palavra)] em segundos absolutos
+        self._previous = []
+
+    @property
+    def committed_end(self) -> float:
+        return self.committed[-1][1] if self.committed else 0.0
+
+    def update(self, hypothesis):
+        """Recebe a hipótese nova (tempos absolutos) e retorna as palavras recém-confirmadas."""
+        cutoff = self.committed_end - 0.05
+        hypothesis = [w for w in hypothesis if w[1] > cutoff and w[0] >= cutoff]
+        agreed = []
+        for new, old in zip(hypothesis, self._previous):
+            if _norm(new[2]) != _norm(old[2]):
+                break
+            agreed.append(new)
+        self.committed.extend(agreed)
+        self._previous = hypothesis[len(agreed):]
+        return agreed
+
+    def finish(self, hypothesis):
+        """Última passada: confirma tudo que vier depois do ponto já confirmado."""
+        cutoff = self.committed_end - 0.05
+        self.committed.extend(w for w in hypothesis if w[0] >= cutoff)
+        self._previous = []
+
+    def tail(self):
+        """Hipótese ainda não confirmada da última passada."""
+        return list(self._previous)
+
+    @staticmethod
+    def text(words) -> str:
+        return "".join(w[2] for w in words).strip()
+
+
+class IncrementalTranscriber:
+    """Roda o STT em janela deslizante sobre uma captura em andamento."""
+
+    def __init__(self, transcribe_words, capture, interval: float = 1.0,
+                 window_secs: float = 15.0, min_new_secs: float = 0.5, on_partial=None):
+        self.transcribe_words = transcribe_words
+        self.capture = capture
+        self.interval = interval
+        self.window_secs = window_secs
+        self.min_new_secs = min_new_secs
+        self.on_partial = on_partial
+        self.agreement = LocalAgreement()
+        self.passes = 0
+        self._window_start = 0      # amostra onde começa a janela decodificada
+        self._decoded_until = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def committed_text(self) -> str:
+        return LocalAgreement.text(self.agreement.committed)
+
+    @property
+    def partial_text(self) -> str:
+        """Texto confirmado + hipótese instável atual (para mostrar ao vivo)."""
+        return LocalAgreement.text(self.agreement.committed + self.agreement.tail())
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Interrompe as passadas parciais sem decodificar a cauda."""
+        self._stop.set()
+
+    def finalize(self) -> str:
+        """Para a thread e decodifica apenas a cauda ainda não confirmada."""
+        self._stop.set()
+        self._thread.join()
+        self.capture.finished.wait()
+        with self._lock:
+            if self.agreement.committed:
+                # Só a cauda depois da última palavra confirmada (com 100 ms de folga)
+                tail_start = int(max(0.0, self.agreement.committed_end - 0.1) * self.capture.samplerate)
+                self._window_start = max(self._window_start, tail_start)
+            self._pass(final=True)
+        return self.committed_text
+
+    def _run(self):
+        sr = self.capture.samplerate
+        while not self._stop.wait(self.interval):
+            if self.capture.finished.is_set():
+                break
+            if len(self.capture) - self._decoded_until < self.min_new_secs * sr:
+                continue
+            with self._lock:
+                try:
+                    self._pass(final=False)
+                except Exception as e:
+                    print(f"⚠️ STT incremental falhou: {e}")
+                    return
+            if self.on_partial is not None:
+                self.on_partial(self.partial_text)
+
+    def _pass(self, final: bool):
+        sr = self.capture.samplerate
+        end = len(self.capture)
+        if end <= self._window_start:
+            return
+        audio = self.capture.audio[self._window_start:end]
+        offset = self._window_start / sr
+        prompt = self.committed_text[-200:] or None
+        words = [
+            (offset + start, offset + stop, word)
+            for start, stop, word in self.transcribe_words(audio, prompt)
+        ]
+        self.passes += 1
+        self._decoded_until = end
+
+        if final:
+            self.agreement.finish(words)
+            return
+
+        self.agreement.update(words)
+        # Janela longa demais: começa a próxima no fim da última palavra confirmada
+        if (end - self._window_start) / sr > self.window_secs and self.agreement.committed:
+            self._window_start = max(self._window_start, int(self.agreement.committed_end * sr))
+
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Micro-batching de transcrições Whisper entre requisições.
+
+Clipes que chegam dentro de uma janela curta (`max_wait_ms`) são juntados:
+os log-mel spectrogramas são preenchidos até 30 s, empilhados e passam pelo
+encoder e decoder numa única chamada de `whisper.decode`. Cada chamador
+recebe o próprio texto de volta. Clipes com mais de 30 s (ou cujo resultado
+em lote parece degenerado) caem no `model.transcribe` normal.
+
+Medição de throughput contra o caminho um-a-um:
+    python stt_batcher.py --model base --clips 16 --batch 8 --wait-ms 50 [arquivos.wav ...]
+"""
+
+import argparse
+import queue
+import threading
+import time
+
+import numpy as np
+
+WHISPER_SAMPLERATE = 16_000
+MAX_CLIP_SECS = 30
+
+
+class _Request:
+    def __init__(self, audio):
+        self.audio = audio
+        self.text = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class WhisperBatcher:
+    """Agrupa clipes pendentes e decodifica em lote no mesmo modelo Whisper."""
+
+    def __init__(self, get_model, language: str = "pt", max_batch: int = 8,
+                 max_wait_ms: float = 50, lock=None):
+        self.get_model = get_model
+        self.language = language
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.lock = lock or threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.fallbacks = 0
+        self._queue = queue.Queue()
+        self._start()
+
+    def _start(self):
+        threading.Thread(target=self._run, name="whisper-batcher", daemon=True).start()
+
+    def after_fork(self):
+        """A thread do lote não sobrevive ao fork: cada processo filho sobe a sua."""
+        self._queue = queue.Queue()
+        self._start()
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        """Transcreve um buffer float32 de 16 kHz; bloqueia até o lote ser decodificado."""
+        if len(audio) > MAX_CLIP_SECS * WHISPER_SAMPLERATE:
+            return self._transcribe_single(audio)
+        request = _Request(np.ascontiguousarray(audio, dtype=np.float32))
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.text
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "fallbacks": self.fallbacks,
+        }
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                texts = self._decode_batch([r.audio for r in batch])
+                for request, text in zip(batch, texts):
+                    request.text = text
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            finally:
+                for request in batch:
+                    request.done.set()
+
+    def _decode_batch(self, clips):
+        import torch
+        import whisper
+
+        model = self.get_model()
+        mels = [
+            whisper.log_mel_spectrogram(
+                whisper.pad_or_trim(torch.from_numpy(clip)), n_mels=model.dims.n_mels
+            )
+            for clip in clips
+        ]
+        mel = torch.stack(mels).to(model.device)
+        options = whisper.DecodingOptions(
+            language=self.language,
+            fp16=model.device.type != "cpu",
+            without_timestamps=True,
+        )
+        with self.lock:
+            results = whisper.decode(model, mel, options)
+        self.batches += 1
+        self.items += len(clips)
+
+        texts = []
+        for clip, result in zip(clips, results):
+            if result.compression_ratio > 2.4 or result.avg_logprob < -1.0:
+                # Resultado suspeito: repete com o fallback de temperatura do transcribe
+                self.fallbacks += 1
+                texts.append(self._transcribe_single(clip))
+            else:
+                texts.append(result.text.strip())
+        return texts
+
+    def _transcribe_single(self, audio):
+        model = self.get_model()
+        with self.lock:
+            result = model.transcribe(np.ascontiguousarray(audio, dtype=np.float32), language=self.language)
+        return result["text"].strip()
+
+
+def _load_clips(paths, count):
+    """Carrega WAVs (reamostrados para 16 kHz) ou gera ruído de teste."""
+    clips = []
+    if paths:
+        import whisper
+        for path in paths:
+            clips.append(whisper.load_audio(path))
+    else:
+        rng = np.random.default_rng(0)
+        clips.append((0.01 * rng.standard_normal(5 * WHISPER_SAMPLERATE)).astype(np.float32))
+    return [clips[i % len(clips)] for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput do Whisper: um-a-um vs. micro-batching")
+    parser.add_argument("files", nargs="*", help="WAVs de teste (padrão: ruído sintético)")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--language", default="pt")
+    parser.add_argument("--clips", type=int, default=16)
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--wait-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    import whisper
+    model = whisper.load_model(args.model)
+    clips = _load_clips(args.files, args.clips)
+
+    start = time.perf_counter()
+    for clip in clips:
+        model.transcribe(clip, language=args.language)
+    sequential = time.perf_counter() - start
+
+    batcher = WhisperBatcher(lambda: model, args.language, args.batch, args.wait_ms)
+    threads = [threading.Thread(target=batcher.transcribe, args=(clip,)) for clip in clips]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batched = time.perf_counter() - start
+
+    print(f"📊 {len(clips)} clipes, modelo {args.model}")
+    print(f"   um-a-um:  {sequential:.2f}s ({len(clips) / sequential:.2f} clipes/s)")
+    print(f"   em lote:  {batched:.2f}s ({len(clips) / batched:.2f} clipes/s) "
+          f"batch={args.batch} wait={args.wait_ms:.0f}ms {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
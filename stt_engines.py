@@ -0,0 +1,111 @@
+"""
+Motores de STT com um contrato comum.
+
+Todo motor recebe áudio float32 mono de 16 kHz (ou um caminho de arquivo) e oferece:
+- `transcribe(audio, language) -> str`
+- `transcribe_words(audio, language, initial_prompt) -> [(inicio_s, fim_s, palavra)]`,
+  usado pelo STT incremental
+
+Motores:
+- whisper: openai-whisper em PyTorch (o caminho original)
+- faster-whisper: o mesmo modelo convertido para CTranslate2 com pesos int8
+  (pip install faster-whisper); na CPU costuma ser várias vezes mais rápido e
+  usar bem menos memória, com WER praticamente igual
+
+Os dois decodificam de forma gulosa com o fallback de temperatura padrão, para
+que latência e WER sejam comparáveis (`python benchmark.py --engines ...`).
+"""
+
+import warnings
+
+import numpy as np
+
+
+class WhisperEngine:
+    """openai-whisper (PyTorch)."""
+
+    name = "whisper"
+
+    def __init__(self, model_size: str = "base", **_):
+        import whisper
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.model = whisper.load_model(model_size)
+        self.model_size = model_size
+
+    def transcribe(self, audio, language: str = "pt") -> str:
+        result = self.model.transcribe(_as_input(audio), language=language)
+        return result["text"].strip()
+
+    def transcribe_words(self, audio, language: str = "pt", initial_prompt: str = None):
+        result = self.model.transcribe(
+            _as_input(audio),
+            language=language,
+            word_timestamps=True,
+            initial_prompt=initial_prompt,
+            condition_on_previous_text=False,
+        )
+        return [
+            (word["start"], word["end"], word["word"])
+            for segment in result["segments"]
+            for word in segment.get("words", [])
+        ]
+
+    # Para o ModelRegistry medir o tamanho dos pesos
+    def parameters(self):
+        return self.model.parameters()
+
+    def buffers(self):
+        return self.model.buffers()
+
+
+class FasterWhisperEngine:
+    """faster-whisper (CTranslate2), int8 na CPU por padrão."""
+
+    name = "faster-whisper"
+
+    def __init__(self, model_size: str = "base", compute_type: str = "int8", cpu_threads: int = 0, **_):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+        self.model_size = model_size
+        self.compute_type = compute_type
+
+    def transcribe(self, audio, language: str = "pt") -> str:
+        segments, _ = self.model.transcribe(_as_input(audio), language=language, beam_size=1)
+        return "".join(segment.text for segment in segments).strip()
+
+    def transcribe_words(self, audio, language: str = "pt", initial_prompt: str = None):
+        segments, _ = self.model.transcribe(
+            _as_input(audio),
+            language=language,
+            beam_size=1,
+            word_timestamps=True,
+            initial_prompt=initial_prompt,
+            condition_on_previous_text=False,
+        )
+        return [
+            (word.start, word.end, word.word)
+            for segment in segments
+            for word in (segment.words or [])
+        ]
+
+
+ENGINES = {
+    WhisperEngine.name: WhisperEngine,
+    FasterWhisperEngine.name: FasterWhisperEngine,
+}
+
+
+def load_engine(name: str, model_size: str, **options):
+    """Instancia o motor `name` com o tamanho de modelo pedido (tiny, base, small…)."""
+    if name not in ENGINES:
+        raise ValueError(f"Motor de STT desconhecido: {name} (use {', '.join(ENGINES)})")
+    print(f"📥 Carregando STT {name} ({model_size})...")
+    return ENGINES[name](model_size, **options)
+
+
+def _as_input(audio):
+    """Arrays vão contíguos em float32 (sem cópia se já estiverem); caminhos passam direto."""
+    if isinstance(audio, np.ndarray):
+        return np.ascontiguousarray(audio, dtype=np.float32)
+    return audio
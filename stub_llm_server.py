@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Servidor stub compatível com a API da OpenAI, para testes e benchmarks offline.
+
+Responde `/v1/models` e `/v1/chat/completions` (com e sem `stream=True`)
+com uma resposta fixa, simulando latência de primeiro token e por token.
+
+Uso:
+    python stub_llm_server.py --port 8765 --ttft 0.3 --token-delay 0.02
+    LLM_API_BASE=http://127.0.0.1:8765/v1 python voice_assistant.py
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "Claro! Esta é uma resposta de teste do servidor local. "
+    "Ela tem algumas frases, para exercitar o pipeline de voz. "
+    "Obrigado por testar."
+)
+
+
+class StubConfig:
+    reply = DEFAULT_REPLY
+    ttft = 0.2          # s até o primeiro token
+    token_delay = 0.02  # s entre tokens
+    model = "gpt-oss-1"
+
+
+def _tokens(text: str):
+    """Quebra o texto em 'tokens' aproximados (palavras com o espaço anterior)."""
+    words = text.split(" ")
+    return [words[0]] + [" " + w for w in words[1:]]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    config = StubConfig
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json({"object": "list", "data": [{"id": self.config.model, "object": "model"}]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json({"error": "not found"}, status=404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        created = int(time.time())
+        tokens = _tokens(self.config.reply)
+        time.sleep(self.config.ttft)
+
+        if not request.get("stream"):
+            time.sleep(self.config.token_delay * len(tokens))
+            self._send_json({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": created,
+                "model": request.get("model", self.config.model),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": self.config.reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(self.config.token_delay)
+                self._send_event(request, created, {"content": token}, None)
+            self._send_event(request, created, {}, "stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+    def _send_event(self, request, created, delta, finish_reason):
+        event = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": request.get("model", self.config.model),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+        self.wfile.flush()
+
+
+def start_stub_server(host="127.0.0.1", port=0, reply=None, ttft=None, token_delay=None):
+    """Sobe o stub numa thread e retorna `(server, base_url)`. Use `server.shutdown()` para parar."""
+    config = type("Config", (StubConfig,), {})
+    if reply is not None:
+        config.reply = reply
+    if ttft is not None:
+        config.ttft = ttft
+    if token_delay is not None:
+        config.token_delay = token_delay
+    handler = type("Handler", (StubHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub local da API OpenAI (chat completions)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft", type=float, default=StubConfig.ttft, help="latência do primeiro token (s)")
+    parser.add_argument("--token-delay", type=float, default=StubConfig.token_delay, help="latência por token (s)")
+    parser.add_argument("--reply", default=DEFAULT_REPLY)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.host, args.port, args.reply, args.ttft, args.token_delay)
+    print(f"🧪 Stub LLM rodando em {base_url} – Ctrl-C para sair")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("\n👋 Stub encerrado")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Testes do crossfade entre frases do pool XTTS (só numpy; rodar com `python -m pytest test_tts_pool.py`).
+"""
+
+import numpy as np
+
+from tts_pool import crossfade_chunks
+
+
+def _clips(pulled, *clips):
+    for index, clip in enumerate(clips):
+        pulled.append(index)
+        yield clip
+
+
+def test_first_clip_body_is_yielded_before_the_second_clip_is_pulled():
+    pulled = []
+    chunks = crossfade_chunks(_clips(pulled, np.ones(1000, np.float32), np.full(1000, 2.0, np.float32)), 100)
+
+    first = next(chunks)
+
+    assert pulled == [0]
+    assert len(first) == 900
+    assert np.all(first == 1.0)
+
+
+def test_overlap_is_mixed_and_tail_flushed_at_the_end():
+    a = np.ones(1000, np.float32)
+    b = np.full(500, 2.0, np.float32)
+
+    out = np.concatenate(list(crossfade_chunks(iter([a, b]), 100)))
+
+    assert len(out) == 1000 + 500 - 100
+    fade_in = np.linspace(0.0, 1.0, 100, dtype=np.float32)
+    np.testing.assert_allclose(out[900:1000], 1.0 * (1.0 - fade_in) + 2.0 * fade_in)
+    assert np.all(out[1000:] == 2.0)
+    assert np.all(a == 1.0) and np.all(b == 2.0)  # entradas intactas
+
+
+def test_clips_shorter_than_the_overlap():
+    clips = [np.ones(1000, np.float32), np.full(30, 2.0, np.float32), np.full(1000, 3.0, np.float32)]
+
+    out = np.concatenate(list(crossfade_chunks(iter(clips), 100)))
+
+    # O clipe curto limita as duas sobreposições a 30 amostras
+    assert len(out) == 1000 + 30 + 1000 - 30 - 30
+    assert out[-1] == 3.0
+
+
+def test_no_overlap_passes_clips_through():
+    clips = [np.ones(10, np.float32), np.full(5, 2.0, np.float32)]
+
+    out = list(crossfade_chunks(iter(clips), 0))
+
+    assert [len(o) for o in out] == [10, 5]
@@ -0,0 +1,75 @@
+"""
+Segmentação incremental de texto para TTS.
+
+Recebe os deltas de uma resposta em streaming do LLM e devolve frases (ou
+cláusulas) completas assim que elas terminam, respeitando o limite de
+caracteres por chamada do XTTS (~203 para português).
+"""
+
+import re
+
+# Fim de frase: pontuação final seguida de espaço/quebra de linha
+SENTENCE_END = re.compile(r'[.!?…]+["\')\]]*\s+|\n{2,}')
+# Pontos de corte secundários quando a frase passa do limite
+CLAUSE_END = re.compile(r'[,;:—–]\s+')
+
+
+class SentenceSegmenter:
+    """Acumula deltas e emite segmentos prontos para síntese."""
+
+    def __init__(self, max_chars: int = 200, min_chars: int = 12):
+        self.max_chars = max_chars
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, delta: str):
+        """Adiciona um delta e retorna a lista de segmentos completos."""
+        self._buffer += delta
+        segments = []
+        while True:
+            segment = self._next_segment()
+            if segment is None:
+                break
+            if segment:
+                segments.append(segment)
+        return segments
+
+    def flush(self):
+        """Retorna o que sobrou no buffer (fim do stream)."""
+        rest, self._buffer = self._buffer.strip(), ""
+        segments = []
+        while len(rest) > self.max_chars:
+            cut = self._split_point(rest)
+            segments.append(rest[:cut].strip())
+            rest = rest[cut:].strip()
+        if rest:
+            segments.append(rest)
+        return segments
+
+    def _next_segment(self):
+        for match in SENTENCE_END.finditer(self._buffer):
+            if match.end() > self.max_chars:
+                break
+            if len(self._buffer[:match.end()].strip()) >= self.min_chars:
+                return self._take(match.end())
+        if len(self._buffer) > self.max_chars:
+            return self._take(self._split_point(self._buffer))
+        return None
+
+    def _split_point(self, text: str) -> int:
+        window = text[:self.max_chars]
+        clauses = [m.end() for m in CLAUSE_END.finditer(window) if m.end() >= self.min_chars]
+        if clauses:
+            return clauses[-1]
+        space = window.rfind(" ")
+        return space + 1 if space >= self.min_chars else self.max_chars
+
+    def _take(self, end: int) -> str:
+        segment, self._buffer = self._buffer[:end], self._buffer[end:]
+        return segment.strip()
+
+
+def split_text(text: str, max_chars: int = 200, min_chars: int = 12):
+    """Divide um texto completo em segmentos para o XTTS."""
+    segmenter = SentenceSegmenter(max_chars=max_chars, min_chars=min_chars)
+    return segmenter.feed(text) + segmenter.flush()
@@ -0,0 +1,167 @@
+"""
+Cache endereçado por conteúdo do áudio sintetizado pelo XTTS.
+
+Frases repetidas (a resposta fixa de erro, saudações, respostas curtas comuns)
+custam segundos de CPU a cada síntese. Aqui o áudio final fica guardado sob uma
+chave = hash do texto normalizado + idioma + perfil de voz (hash do WAV de
+referência) + modelo + parâmetros de amostragem. Há um LRU em memória limitado
+em bytes e um nível em disco (`.npy` float32) limitado em tamanho total, que
+descarta os arquivos usados há mais tempo.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Forma canônica do texto para a chave (NFC, espaços colapsados)."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class SpeechCache:
+    """LRU em memória + nível em disco para áudio float32 já sintetizado."""
+
+    def __init__(self, cache_dir=".tts_cache", max_memory_mb: float = 64, max_disk_mb: float = 256,
+                 model_id: str = ""):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self.model_id = model_id
+        self._lru = OrderedDict()      # chave -> np.ndarray
+        self._memory_bytes = 0
+        self._disk = OrderedDict()     # chave -> tamanho em bytes (ordem: menos recente primeiro)
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._scan_disk()
+
+    def key_for(self, text: str, language: str, voice_key: str, params: dict) -> str:
+        """Chave estável: texto normalizado + idioma + voz + modelo + parâmetros de amostragem."""
+        params = ",".join(f"{k}={params[k]}" for k in sorted(params))
+        h = hashlib.sha256()
+        for part in (normalize_text(text), language, voice_key, self.model_id, params):
+            h.update(part.encode())
+            h.update(b"\0")
+        return h.hexdigest()[:32]
+
+    def get(self, key: str):
+        """Áudio em cache (memória, depois disco) ou None."""
+        with self._lock:
+            audio = self._lru.get(key)
+            if audio is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return audio
+            on_disk = key in self._disk
+
+        audio = self._load_from_disk(key) if on_disk else None
+        with self._lock:
+            if audio is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, audio)
+        return audio
+
+    def put(self, key: str, audio: np.ndarray):
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        audio.setflags(write=False)  # compartilhado entre chamadores
+        with self._lock:
+            self._remember(key, audio)
+        self._save_to_disk(key, audio)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._lru),
+                "memory_mb": round(self._memory_bytes / (1024 * 1024), 1),
+                "disk_entries": len(self._disk),
+                "disk_mb": round(self._disk_bytes / (1024 * 1024), 1),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+    def _remember(self, key, audio):
+        """Insere no LRU em memória (chamar com o lock)."""
+        previous = self._lru.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.nbytes
+        if audio.nbytes > self.max_memory_bytes:
+            return
+        self._lru[key] = audio
+        self._memory_bytes += audio.nbytes
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._lru.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def _scan_disk(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npy"):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def _load_from_disk(self, key: str):
+        path = self._path_for(key)
+        try:
+            audio = np.load(path)
+            os.utime(path)  # marca como usado recentemente
+        except Exception as e:
+            print(f"⚠️ Áudio em cache ilegível em {path}, descartando: {e}")
+            with self._lock:
+                self._disk_bytes -= self._disk.pop(key, 0)
+            return None
+        audio.setflags(write=False)
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+        return audio
+
+    def _save_to_disk(self, key: str, audio: np.ndarray):
+        if self.max_disk_bytes <= 0 or audio.nbytes > self.max_disk_bytes:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path_for(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, audio)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except Exception as e:
+            print(f"⚠️ Não foi possível salvar áudio em cache no disco: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += size - self._disk.pop(key, 0)
+            self._disk[key] = size
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Remove os arquivos menos usados até caber no limite (chamar com o lock)."""
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self._path_for(key))
+            except OSError:
+                pass
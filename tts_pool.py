@@ -0,0 +1,382 @@
+"""
+Síntese XTTS em paralelo num pool de processos, para respostas longas.
+
+Um único XTTS em CPU fica bem abaixo do tempo real, então uma resposta de
+várias frases demora mais para sintetizar do que para tocar. Aqui a resposta
+é dividida em frases (dentro do limite de caracteres do XTTS) e cada frase vai
+para um processo worker; cada worker carrega o próprio modelo e lê os speaker
+latents do cache em disco de `VoiceProfileStore`. O áudio volta na ordem do
+texto, com um crossfade curto entre frases.
+
+O despacho é feito no processo principal: cada worker recebe uma frase por
+vez, só quando está livre, e a próxima é sempre a de menor índice dentro da
+resposta (a frase 0 de uma resposta nova passa na frente das frases finais
+de outra). Assim a reprodução começa assim que a primeira frase fica pronta.
+
+Cada worker ocupa a memória de um XTTS inteiro (~2 GB) e divide os núcleos
+da CPU com os demais (`torch.set_num_threads`).
+"""
+
+import heapq
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+
+def load_xtts_model(model_id: str, on_fallback=None):
+    """Carrega o XTTS V2 (low-level; se falhar, pela API simplificada). Usado também nos workers."""
+    from TTS.tts.configs.xtts_config import XttsConfig
+    from TTS.tts.models.xtts import Xtts
+    from TTS.utils.generic_utils import get_user_data_dir
+    from TTS.utils.manage import ModelManager
+    try:
+        print("📥 Preparando XTTS V2 (low-level)...")
+        ModelManager().download_model(model_id)
+        model_path = os.path.join(get_user_data_dir("tts"), model_id.replace("/", "--"))
+        config = XttsConfig()
+        config.load_json(os.path.join(model_path, "config.json"))
+        model = Xtts.init_from_config(config)
+        model.load_checkpoint(
+            config,
+            checkpoint_path=os.path.join(model_path, "model.pth"),
+            vocab_path=os.path.join(model_path, "vocab.json"),
+            eval=True,
+            use_deepspeed=False,
+        )
+        # Não usar CUDA em ambiente local sem GPU
+        return model
+    except Exception as e:
+        # API simplificada como alternativa de carregamento: usa-se o Xtts interno dela
+        print(f"⚠️ XTTS low-level indisponível, carregando via API simplificada. Motivo: {e}")
+        if on_fallback is not None:
+            on_fallback()
+        from TTS.api import TTS
+        tts = TTS(model_name=model_id, progress_bar=False, gpu=False)
+        return tts.synthesizer.tts_model
+
+
+def crossfade_chunks(chunks, samples: int):
+    """Junta áudios consecutivos sobrepondo `samples` amostras (fade linear); gera os pedaços em ordem.
+
+    Cada áudio sai assim que chega, menos as últimas `samples` amostras, retidas para a mistura
+    com o início do próximo (e liberadas no fim). Não altera os arrays de entrada (os do cache
+    são somente leitura).
+    """
+    tail = None
+    for audio in chunks:
+        audio = np.asarray(audio, dtype=np.float32)
+        keep = min(max(samples, 0), len(audio))  # a sobreposição nunca passa do tamanho do áudio
+        if tail is not None:
+            n = min(len(tail), len(audio))
+            if n > 0:
+                fade_in = np.linspace(0.0, 1.0, n, dtype=np.float32)
+                mixed = tail[-n:] * (1.0 - fade_in) + audio[:n] * fade_in
+                audio = np.concatenate([tail[:-n], mixed, audio[n:]])
+            else:
+                audio = np.concatenate([tail, audio])
+        body, tail = audio[:len(audio) - keep], audio[len(audio) - keep:]
+        if len(body):
+            yield body
+    if tail is not None and len(tail):
+        yield tail
+
+
+# Serializa a troca do `__main__` em `_start_without_main` (vários pools podem iniciar juntos)
+_spawn_lock = threading.Lock()
+
+
+def _start_without_main(process):
+    """Inicia um processo spawn sem reimportar o script principal do pai no filho.
+
+    O spawn (e também o forkserver) manda ao filho o caminho ou o nome do `__main__` do pai, e o
+    filho o reexecuta como `__mp_main__`. Com `python backend_server.py`, isso subiria o servidor
+    e todos os modelos de novo em cada worker, que só precisam deste módulo (`_worker_main`).
+    Durante o `start()`, o `__main__` fica trocado por um módulo vazio, sem caminho nem nome.
+    A troca vale para o processo inteiro: o lock impede que dois inícios se cruzem (um deles
+    restauraria o módulo vazio). A janela é curta, porque o `start()` só monta os dados de
+    preparação e lança o filho.
+    """
+    with _spawn_lock:
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            process.start()
+        finally:
+            sys.modules["__main__"] = main
+
+
+def _worker_main(index, model_id, language, profile_dir, threads, tasks, results):
+    """Loop de um processo worker: carrega o modelo uma vez e sintetiza frases até receber None."""
+    import torch
+    from voice_profiles import VoiceProfileStore
+
+    torch.set_num_threads(threads)
+    try:
+        model = load_xtts_model(model_id)
+        profiles = VoiceProfileStore(cache_dir=profile_dir, model_id=model_id)
+    except Exception as e:
+        results.put((index, None, None, f"{type(e).__name__}: {e}"))
+        return
+    results.put((index, None, os.getpid(), None))  # pronto
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        task_id, text, reference_audio, params = task
+        try:
+            gpt_cond_latent, speaker_embedding = profiles.get(model, reference_audio)
+            with torch.inference_mode():
+                out = model.inference(text, language, gpt_cond_latent, speaker_embedding, **params)
+            audio = np.asarray(out["wav"], dtype=np.float32).squeeze()
+            results.put((index, task_id, audio, None))
+        except Exception as e:
+            results.put((index, task_id, None, f"{type(e).__name__}: {e}"))
+
+
+class _Task:
+    def __init__(self, task_id, priority, text, reference_audio, params):
+        self.task_id = task_id
+        self.priority = priority
+        self.text = text
+        self.reference_audio = reference_audio
+        self.params = params
+        self.audio = None
+        self.error = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+    def result(self, cancel=None):
+        """Espera o áudio da frase; com `cancel` (CancelToken), desiste assim que ele for cancelado."""
+        while not self.done.wait(0.05 if cancel is not None else None):
+            cancel.check()
+        if self.error is not None:
+            raise self.error
+        return self.audio
+
+
+class XttsProcessPool:
+    """Processos com um XTTS cada; frases despachadas por prioridade a workers livres."""
+
+    def __init__(self, workers: int, model_id: str, language: str = "pt",
+                 profile_dir: str = ".voice_profiles", threads_per_worker: int = None,
+                 max_restarts: int = 3):
+        self.workers = workers
+        self.model_id = model_id
+        self.language = language
+        self.profile_dir = profile_dir
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.max_restarts = max_restarts  # reposições por worker antes de desistir dele
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self._ctx = mp.get_context("spawn")  # fork + threads do PyTorch não combinam
+        self._processes = []
+        self._task_queues = []
+        self._results = None
+        self._pending = []                # heap de (prioridade, task_id, _Task)
+        self._running = {}                # índice do worker -> _Task
+        self._idle = []
+        self._restarted = [0] * workers   # reposições de cada worker
+        self._lost = set()                # workers que morreram e não serão repostos
+        self._last_check = 0.0
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+
+    def start(self, timeout: float = None):
+        """Inicia os workers e espera todos carregarem o modelo. Retorna o próprio pool."""
+        started = time.perf_counter()
+        self._results = self._ctx.Queue()
+        for index in range(self.workers):
+            process, tasks = self._spawn(index)
+            self._processes.append(process)
+            self._task_queues.append(tasks)
+
+        for _ in range(self.workers):
+            try:
+                index, _, pid, error = self._results.get(timeout=timeout)
+            except queue.Empty:
+                self.close()
+                raise RuntimeError("Workers do XTTS não ficaram prontos a tempo")
+            if error is not None:
+                self.close()
+                raise RuntimeError(f"Worker {index} do XTTS falhou ao carregar: {error}")
+            self._idle.append(index)
+            print(f"✅ Worker {index} do XTTS pronto (pid {pid})")
+        print(f"✅ Pool XTTS com {self.workers} processos pronto em {time.perf_counter() - started:.1f}s "
+              f"({self.threads_per_worker} threads cada)")
+
+        threading.Thread(target=self._dispatch, name="xtts-pool-dispatch", daemon=True).start()
+        threading.Thread(target=self._collect, name="xtts-pool-collect", daemon=True).start()
+        return self
+
+    def _spawn(self, index):
+        """Lança o processo do worker `index` com uma fila de tarefas nova."""
+        tasks = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(index, self.model_id, self.language, self.profile_dir,
+                  self.threads_per_worker, tasks, self._results),
+            name=f"xtts-worker-{index}",
+            daemon=True,
+        )
+        _start_without_main(process)
+        return process, tasks
+
+    @property
+    def healthy(self) -> bool:
+        """Falso depois de encerrado ou quando todos os workers morreram sem reposição."""
+        return not self._closed and len(self._lost) < self.workers
+
+    def submit(self, text: str, reference_audio: str, params: dict, priority: int = 0) -> _Task:
+        """Enfileira uma frase; menor `priority` sai primeiro (use o índice da frase na resposta)."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Pool XTTS encerrado")
+            if len(self._lost) >= self.workers:
+                raise RuntimeError("Nenhum worker do XTTS vivo")
+            task = _Task(next(self._ids), priority, text, reference_audio, params)
+            heapq.heappush(self._pending, (priority, task.task_id, task))
+            self._wakeup.notify()
+        return task
+
+    def cancel(self, tasks):
+        """Tira da fila as frases que ainda não começaram (as em andamento terminam e são descartadas)."""
+        with self._lock:
+            for task in tasks:
+                task.cancelled = True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "alive": sum(p.is_alive() for p in self._processes),
+                "healthy": self.healthy,
+                "restarts": self.restarts,
+                "busy": len(self._running),
+                "queued": sum(not t.cancelled for _, _, t in self._pending),
+                "completed": self.completed,
+                "failed": self.failed,
+                "threads_per_worker": self.threads_per_worker,
+            }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify_all()
+        for tasks in self._task_queues:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    def _dispatch(self):
+        """Entrega a frase de maior prioridade a cada worker que ficar livre."""
+        while True:
+            with self._lock:
+                while not self._closed and not (self._idle and self._pending):
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                _, _, task = heapq.heappop(self._pending)
+                if task.cancelled:
+                    task.error = RuntimeError("Síntese cancelada")
+                    task.done.set()
+                    continue
+                index = self._idle.pop()
+                self._running[index] = task
+            self._task_queues[index].put((task.task_id, task.text, task.reference_audio, task.params))
+
+    def _collect(self):
+        """Recebe os áudios dos workers e libera cada worker para a próxima frase."""
+        while True:
+            try:
+                index, task_id, audio, error = self._results.get(timeout=1.0)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            if time.monotonic() - self._last_check >= 1.0:
+                self._check_workers()  # com o pool sempre ocupado a fila nunca fica vazia
+            if task_id is None:
+                # Worker reposto terminou de carregar (se falhou, morre e `_check_workers` decide)
+                if error is not None:
+                    print(f"❌ Worker {index} do XTTS falhou ao recarregar: {error}")
+                    continue
+                with self._lock:
+                    if index not in self._idle and index not in self._running:
+                        self._idle.append(index)
+                    self._wakeup.notify()
+                print(f"✅ Worker {index} do XTTS reposto (pid {audio})")
+                continue
+            with self._lock:
+                task = self._running.get(index)
+                if task is None or task.task_id != task_id:
+                    continue  # resposta de um worker que já foi dado como morto
+                del self._running[index]
+                self._idle.append(index)
+                if error is None:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self._wakeup.notify()
+            if error is not None:
+                task.error = RuntimeError(f"Worker {index} do XTTS: {error}")
+            else:
+                task.audio = audio
+            task.done.set()
+
+    def _check_workers(self):
+        """Repõe os workers que morreram (ex.: OOM) e falha a frase que estava com cada um.
+
+        Cada worker é reposto até `max_restarts` vezes. Sem nenhum worker restante, as frases da
+        fila falham e `healthy` fica falso: quem chama volta ao XTTS do processo principal.
+        """
+        self._last_check = time.monotonic()
+        failed = []
+        with self._lock:
+            if self._closed:
+                return
+            dead = [i for i, p in enumerate(self._processes) if i not in self._lost and not p.is_alive()]
+            for index in dead:
+                task = self._running.pop(index, None)
+                if task is not None:
+                    failed.append((task, f"Worker {index} do XTTS morreu"))
+                    self.failed += 1
+                if index in self._idle:
+                    self._idle.remove(index)
+                if self._restarted[index] >= self.max_restarts:
+                    self._lost.add(index)
+            if dead and len(self._lost) >= self.workers:
+                while self._pending:
+                    _, _, task = heapq.heappop(self._pending)
+                    failed.append((task, "Nenhum worker do XTTS vivo"))
+        for index in dead:
+            print(f"❌ Worker {index} do XTTS morreu (exit {self._processes[index].exitcode})")
+            if index in self._lost:
+                print(f"⚠️ Worker {index} do XTTS não será reposto ({self.max_restarts} reposições)")
+                continue
+            try:
+                process, tasks = self._spawn(index)
+            except Exception as e:
+                print(f"❌ Não foi possível repor o worker {index} do XTTS: {e}")
+                continue  # nova tentativa na próxima verificação
+            with self._lock:
+                self._restarted[index] += 1
+                self.restarts += 1
+                self._processes[index] = process
+                self._task_queues[index] = tasks
+        if dead and len(self._lost) >= self.workers:
+            print("❌ Nenhum worker do XTTS vivo: síntese volta ao processo principal")
+        for task, message in failed:
+            task.error = RuntimeError(message)
+            task.done.set()
@@ -0,0 +1,108 @@
+"""
+Detecção de atividade de voz (VAD) e endpointing por frame.
+
+- `EnergyVAD`: baseline sem dependências (energia RMS com piso de ruído
+  adaptativo + taxa de cruzamentos por zero para descartar chiado).
+- `WebRtcVAD`: detector baseado em modelo (pacote opcional `webrtcvad`).
+- `Endpointer`: máquina de estados que decide início/fim da fala, encerrando
+  o turno `hangover_ms` depois que a fala para.
+
+Qualquer objeto com `is_speech(frame: np.ndarray) -> bool` serve de detector.
+"""
+
+import numpy as np
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+
+class EnergyVAD:
+    """VAD por energia + zero-crossing com piso de ruído adaptativo."""
+
+    def __init__(self, margin_db: float = 12.0, min_db: float = -50.0, max_zcr: float = 0.35):
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.max_zcr = max_zcr
+        self.noise_db = min_db - margin_db
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        if not len(frame):
+            return False
+        db = 10.0 * np.log10(float(np.dot(frame, frame)) / len(frame) + 1e-12)
+        zcr = float(np.count_nonzero(np.diff(np.signbit(frame)))) / len(frame)
+
+        speech = db > max(self.min_db, self.noise_db + self.margin_db) and zcr < self.max_zcr
+
+        # Piso de ruído: desce rápido, sobe devagar (quase nada durante a fala)
+        if db < self.noise_db:
+            self.noise_db += 0.5 * (db - self.noise_db)
+        else:
+            self.noise_db += (0.001 if speech else 0.05) * (db - self.noise_db)
+        return speech
+
+
+class WebRtcVAD:
+    """Wrapper do VAD do WebRTC (frames de 10/20/30 ms, PCM16)."""
+
+    def __init__(self, samplerate: int = 16_000, aggressiveness: int = 2):
+        if webrtcvad is None:
+            raise ImportError("webrtcvad não instalado (pip install webrtcvad)")
+        self.samplerate = samplerate
+        self._vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        pcm = (np.clip(frame, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+        return self._vad.is_speech(pcm, self.samplerate)
+
+
+def make_detector(name: str = "energy", samplerate: int = 16_000):
+    """Cria um detector pelo nome ("energy" ou "webrtc"), com fallback para energia."""
+    if name == "webrtc":
+        try:
+            return WebRtcVAD(samplerate)
+        except ImportError as e:
+            print(f"⚠️ {e}; usando VAD por energia")
+    return EnergyVAD()
+
+
+class Endpointer:
+    """Decide o fim do turno a partir de uma sequência de decisões fala/silêncio por frame."""
+
+    SILENCE, SPEECH, END, TIMEOUT = "silence", "speech", "end", "timeout"
+
+    def __init__(self, frame_ms: int = 30, min_speech_ms: int = 150,
+                 hangover_ms: int = 700, no_speech_timeout_ms: int = 5000):
+        self.frame_ms = frame_ms
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.timeout_frames = max(1, no_speech_timeout_ms // frame_ms)
+        self.frames = 0
+        self.voiced_frames = 0
+        self.speech_start_frame = None   # primeiro frame da fala confirmada
+        self.speech_end_frame = None     # último frame com voz
+        self._run = 0
+        self._silence = 0
+
+    @property
+    def in_speech(self) -> bool:
+        return self.speech_start_frame is not None
+
+    def update(self, is_speech: bool) -> str:
+        self.frames += 1
+        if is_speech:
+            self.voiced_frames += 1
+            self._run += 1
+            self._silence = 0
+            if not self.in_speech and self._run >= self.min_speech_frames:
+                self.speech_start_frame = self.frames - self._run
+            if self.in_speech:
+                self.speech_end_frame = self.frames
+        else:
+            self._run = 0
+            self._silence += 1
+
+        if self.in_speech:
+            return self.END if self._silence >= self.hangover_frames else self.SPEECH
+        return self.TIMEOUT if self.frames >= self.timeout_frames else self.SILENCE
@@ -1,29 +1,86 @@
-import sounddevice as sd
 import numpy as np
 import scipy.io.wavfile as wav
-import whisper
 import openai
-import subprocess, os, time, tempfile
+import asyncio
+import subprocess, os, time, threading, queue
 
 # Configurar TTS para aceitar licença automaticamente
 os.environ["COQUI_TOS_AGREED"] = "1"
 
-# Importação para TTS
-from TTS.api import TTS
-from TTS.tts.configs.xtts_config import XttsConfig
-from TTS.tts.models.xtts import Xtts
-from TTS.utils.generic_utils import get_user_data_dir
-from TTS.utils.manage import ModelManager
+from audio_capture import Capture, capture_microphone
+from audio_playback import StreamingPlayer
+from cancellation import Cancelled
+from conversation import Conversation, count_message_tokens
+from cpu_budget import CpuBudgets, parse_cores
+from llm_cache import ResponseCache
+from metrics import (
+    CAPTURE_DURATION, ERRORS, FALLBACKS, LLM_CACHE_LOOKUPS, LLM_DURATION, LLM_PROMPT_TOKENS, LLM_TTFT,
+    PLAYBACK_DURATION,
+    STT_LATENCY, STT_RTF, TTS_CACHE_LOOKUPS, TTS_RTF, TTS_TTFC, TURN_LATENCY,
+)
+from model_registry import ModelRegistry
+from speech_pipeline import SpeechPipeline
+from stt_batcher import WhisperBatcher
+from stt_engines import load_engine
+from text_segments import SentenceSegmenter, split_text
+from tts_cache import SpeechCache
+from tts_pool import XttsProcessPool, crossfade_chunks, load_xtts_model
+from voice_profiles import VoiceProfileStore
 
 ########################
 # Konfiguration
 ########################
-SAMPLERATE     = 16_000        # Hz
-RECORD_SECS    = 4             # Länge einer Aufnahme
+SAMPLERATE     = 16_000        # Hz (taxa nativa do Whisper, sem reamostragem)
+RECORD_SECS    = 4             # Länge einer Aufnahme (Modus "fixed")
+RECORD_MODE    = os.getenv("RECORD_MODE", "fixed")  # "fixed" ou "vad" (fim automático pela voz)
+MAX_RECORD_SECS = 30           # Limite de uma fala no modo "vad"
+VAD_DETECTOR   = "energy"      # "energy" (baseline) ou "webrtc" (pip install webrtcvad)
+VAD_HANGOVER_MS = 700          # Silêncio após a fala que encerra o turno
+BARGE_IN       = os.getenv("BARGE_IN", "0") == "1"  # Falar durante a resposta a interrompe
+BARGE_IN_MIN_SPEECH_MS = 300   # Fala contínua exigida para interromper (evita disparos pelo eco)
+STT_MODE       = os.getenv("STT_MODE", "batch")  # "batch" ou "streaming" (transcreve enquanto fala)
+STT_PARTIAL_INTERVAL = 1.0     # s entre passadas do STT incremental
+STT_BATCH_SIZE = int(os.getenv("STT_BATCH_SIZE", 1))         # >1 junta clipes de várias sessões
+STT_BATCH_WAIT_MS = int(os.getenv("STT_BATCH_WAIT_MS", 50))  # espera máxima para formar um lote
 LLM_MODEL      = "gpt-oss-1"   # Modelo personalizado
-WHISPER_MODEL  = "base"        # tiny / base / small / medium …
+LLM_PARAMS     = {"temperature": 0.7, "max_tokens": 1000}
+LLM_CACHE_TTL  = float(os.getenv("LLM_CACHE_TTL", 300))    # s; 0 = sem cache de respostas
+LLM_CACHE_SIZE = 256
+LLM_CACHE_SIMILARITY = float(os.getenv("LLM_CACHE_SIMILARITY", 0))  # ex.: 0.92; 0 = só perguntas idênticas
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", 3000))   # Orçamento do prompt (sistema + histórico + pergunta)
+CONTEXT_SUMMARIZE = os.getenv("CONTEXT_SUMMARIZE", "0") == "1"   # Resume turnos antigos em vez de só descartar
+WHISPER_MODEL  = os.getenv("WHISPER_MODEL", "base")  # tiny / base / small / medium …
+STT_ENGINE     = os.getenv("STT_ENGINE", "whisper")  # "whisper" (PyTorch) ou "faster-whisper" (CTranslate2)
+STT_COMPUTE_TYPE = os.getenv("STT_COMPUTE_TYPE", "int8")  # Pesos do faster-whisper: int8, int8_float32, float32
+CPU_PROFILE    = os.getenv("CPU_PROFILE", "off")  # "off", "latency" (TTS do turno atual primeiro) ou "throughput"
+CPU_OVERRIDES  = {                                # Núcleos/threads fixos por estágio (ex.: CPU_STT_CORES=0-1)
+    stage: {
+        "cores": parse_cores(os.getenv(f"CPU_{stage.upper()}_CORES", "")) or None,
+        "threads": int(os.getenv(f"CPU_{stage.upper()}_THREADS", 0)) or None,
+    }
+    for stage in ("stt", "tts")
+}
+PREFORK        = os.getenv("VOICE_PREFORK", "0") == "1"  # gunicorn.conf.py: pesos no master, warm-up nos workers
+AUDIO_DEBUG_DIR = os.getenv("AUDIO_DEBUG_DIR")  # Se definido, salva cada gravação como WAV
 XTTS_MODEL     = "tts_models/multilingual/multi-dataset/xtts_v2"
 XTTS_LANGUAGE  = "pt"          # Português
+XTTS_SAMPLERATE = 24_000       # Hz (saída do XTTS V2)
+XTTS_MAX_CHARS = 200           # Limite por chamada do XTTS (pt ≈ 203 caracteres)
+XTTS_STREAMING = os.getenv("XTTS_STREAMING", "1") != "0"  # 0 = sempre síntese completa
+XTTS_STREAM_PARAMS = {"temperature": 0.6, "repetition_penalty": 2.5}               # inference_stream
+XTTS_FULL_PARAMS = {"temperature": 0.6, "repetition_penalty": 2.5, "speed": 0.8}   # inference
+XTTS_WORKERS   = int(os.getenv("XTTS_WORKERS", 0))  # >1 = frases de respostas longas em paralelo (1 XTTS por processo)
+XTTS_WORKER_THREADS = int(os.getenv("XTTS_WORKER_THREADS", 0))  # threads do PyTorch por worker; 0 = núcleos / workers
+XTTS_CROSSFADE_MS = 30         # Sobreposição entre frases sintetizadas em paralelo
+TTS_CACHE      = os.getenv("TTS_CACHE", "1") != "0"  # 0 = sempre sintetizar
+TTS_CACHE_DIR  = ".tts_cache"   # Áudio já sintetizado (nível em disco)
+TTS_CACHE_MEMORY_MB = 64
+TTS_CACHE_DISK_MB = int(os.getenv("TTS_CACHE_DISK_MB", 256))
+REFERENCE_AUDIO = "reference_voice.wav"
+VOICE_PROFILE_DIR = ".voice_profiles"   # Cache em disco dos speaker latents
+VOICE_PROFILES = {                      # Vozes nomeadas -> WAV de referência
+    "default": REFERENCE_AUDIO,
+}
 SYSTEM_PROMPT  = (
     "Você é um assistente útil. "
     "Interprete perguntas exclusivamente em português "
@@ -33,100 +90,375 @@ SYSTEM_PROMPT  = (
 
 # Configurar o servidor personalizado da OpenAI
 # Usando seu servidor que imita a API da OpenAI
-openai.api_base = "https://gpt-proxy.ahvideoscdn.net/v1"
-openai.api_key = "dummy-key"  # Chave dummy já que o servidor é seu
+# (LLM_API_BASE permite apontar para um stub local, ex.: stub_llm_server.py)
+openai.api_base = os.getenv("LLM_API_BASE", "https://gpt-proxy.ahvideoscdn.net/v1")
+openai.api_key = os.getenv("LLM_API_KEY", "dummy-key")  # Chave dummy já que o servidor é seu
 
 ########################
-# TTS initialisieren (einmalig, nicht in der Schleife!)
+# Modelle laden (im Hintergrund, einmalig!)
 ########################
-# Carregar modelo XTTS V2 usando a API simplificada (fallback)
-print("📥 Carregando modelo XTTS V2 (API simplificada)...")
-tts = TTS(
-    model_name=XTTS_MODEL,
-    progress_bar=False,
-    gpu=False,
-)
-print("✅ Modelo XTTS V2 carregado (API simplificada)!")
-
-# Tentar preparar XTTS em modo low-level (como test_xtts_v2)
-XTTS_LOWLEVEL_READY = False
-xtts_model = None
-try:
-    print("📥 Preparando XTTS V2 (low-level)...")
-    ModelManager().download_model(XTTS_MODEL)
-    model_path = os.path.join(get_user_data_dir("tts"), XTTS_MODEL.replace("/", "--"))
-    config = XttsConfig()
-    config.load_json(os.path.join(model_path, "config.json"))
-    xtts_model = Xtts.init_from_config(config)
-    xtts_model.load_checkpoint(
-        config,
-        checkpoint_path=os.path.join(model_path, "model.pth"),
-        vocab_path=os.path.join(model_path, "vocab.json"),
-        eval=True,
-        use_deepspeed=False,
+models = ModelRegistry(prefork=PREFORK)
+
+def _load_xtts():
+    """Carrega UMA instância do XTTS V2, compartilhada pelos caminhos streaming e não-streaming."""
+    return load_xtts_model(XTTS_MODEL, on_fallback=lambda: FALLBACKS.inc(kind="xtts_api_loader"))
+
+def _warmup_xtts(model):
+    """Pré-carrega os perfis de voz e roda uma síntese curta sem reprodução."""
+    voice_profiles.preload(model)
+    for _ in synthesize_stream("Olá.", use_cache=False):
+        pass
+
+def _load_whisper():
+    """Motor de STT escolhido em STT_ENGINE, com o tamanho WHISPER_MODEL."""
+    # O CTranslate2 não usa as threads do PyTorch: recebe o orçamento do STT na criação
+    stt_budget = cpu_budgets.allocation()["stages"].get("stt", {})
+    return load_engine(
+        STT_ENGINE,
+        WHISPER_MODEL,
+        compute_type=STT_COMPUTE_TYPE,
+        cpu_threads=stt_budget.get("threads") or 0,
     )
-    # Não usar CUDA em ambiente local sem GPU
-    XTTS_LOWLEVEL_READY = True
-    print("✅ XTTS V2 low-level pronto!")
-except Exception as e:
-    print(f"⚠️ XTTS low-level indisponível, usando API simplificada. Motivo: {e}")
 
+def _warmup_whisper(engine):
+    """Decodificação de 1 s de silêncio para pagar o custo da primeira inferência."""
+    with stt_guard:
+        engine.transcribe(np.zeros(SAMPLERATE, dtype=np.float32), language="pt")
+
+def _start_xtts_pool():
+    """Sobe os processos worker do XTTS depois que o modelo principal carregou (download já feito)."""
+    models.get("xtts")
+    return XttsProcessPool(
+        XTTS_WORKERS,
+        XTTS_MODEL,
+        language=XTTS_LANGUAGE,
+        profile_dir=VOICE_PROFILE_DIR,
+        threads_per_worker=XTTS_WORKER_THREADS or None,
+    ).start()
+
+models.register("xtts", _load_xtts, warmup=_warmup_xtts)
+models.register("whisper", _load_whisper, warmup=_warmup_whisper)
+if XTTS_WORKERS > 1:
+    # Opcional: sem o pool, tudo continua no XTTS do processo principal.
+    # Threads de despacho + processos filhos: no prefork, um pool por worker do gunicorn
+    models.register("xtts_pool", _start_xtts_pool, required=False, per_process=True)
+whisper_lock = threading.Lock()  # Uma decodificação por vez no mesmo modelo
+# Uma síntese por vez no XTTS compartilhado (estágio TTS, /speak, warm-up): o modelo guarda
+# estado da chamada (embeddings do prefixo do GPT) entre os chunks de um inference_stream
+xtts_lock = threading.Lock()
+
+# Núcleos e threads do PyTorch por estágio (STT x TTS não disputam a CPU)
+cpu_budgets = CpuBudgets(CPU_PROFILE, overrides=CPU_OVERRIDES)
+stt_guard = cpu_budgets.guard("stt", whisper_lock)  # lock do Whisper + orçamento do STT
+
+# Micro-batching do Whisper entre sessões (desligado com STT_BATCH_SIZE=1)
+stt_batcher = None
+if STT_BATCH_SIZE > 1 and STT_ENGINE != "whisper":
+    print(f"⚠️ STT_BATCH_SIZE só vale para o motor 'whisper'; {STT_ENGINE} transcreve um clipe por vez")
+elif STT_BATCH_SIZE > 1:
+    stt_batcher = WhisperBatcher(
+        lambda: models.get("whisper").model,
+        language="pt",
+        max_batch=STT_BATCH_SIZE,
+        max_wait_ms=STT_BATCH_WAIT_MS,
+        lock=stt_guard,
+    )
+
+# Perfis de voz: latents calculados uma vez por referência e reaproveitados
+voice_profiles = VoiceProfileStore(cache_dir=VOICE_PROFILE_DIR, model_id=XTTS_MODEL)
+for _name, _path in VOICE_PROFILES.items():
+    voice_profiles.register(_name, _path)
+
+# Áudio sintetizado por (texto, idioma, voz, parâmetros): frases repetidas não passam pelo XTTS
+tts_cache = SpeechCache(
+    cache_dir=TTS_CACHE_DIR,
+    max_memory_mb=TTS_CACHE_MEMORY_MB,
+    max_disk_mb=TTS_CACHE_DISK_MB,
+    model_id=XTTS_MODEL,
+)
+
+# Respostas do LLM por (contexto, pergunta normalizada), com single-flight
+llm_cache = None
+if LLM_CACHE_TTL > 0:
+    llm_cache = ResponseCache(ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_SIZE, similarity=LLM_CACHE_SIMILARITY)
+
+# Player em streaming (abre o dispositivo no primeiro chunk)
+player = StreamingPlayer(samplerate=XTTS_SAMPLERATE)
 
-def say_text(text: str):
-    """Gera áudio via XTTS. Usa low-level (inference_stream) quando disponível, senão fallback para API simplificada."""
+
+_END = object()
+
+def _budgeted(iterator, stage: str, lock=None):
+    """Avança o iterador (ex.: o modelo) no orçamento de CPU do estágio; entre itens a thread volta ao normal.
+
+    Com `lock`, o modelo fica reservado do primeiro item até o fim (ou o fechamento) do iterador.
+    """
+    iterator = iter(iterator)
+    if lock is not None:
+        lock.acquire()
     try:
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-            tmp_path = tmp.name
-
-        reference_audio = "reference_voice.wav"
-        if not os.path.exists(reference_audio):
-            print("📝 Criando arquivo de referência de voz...")
-            create_reference_audio(reference_audio)
-
-        if XTTS_LOWLEVEL_READY and xtts_model is not None:
-            # Low-level: get_conditioning_latents + inference_stream
-            print("🎵 [XTTS low-level] Processando referência...")
-            gpt_cond_latent, speaker_embedding = xtts_model.get_conditioning_latents(audio_path=reference_audio)
-            print("🎤 [XTTS low-level] Gerando áudio...")
+        while True:
+            with cpu_budgets.guard(stage):
+                item = next(iterator, _END)
+            if item is _END:
+                return
+            yield item
+    finally:
+        if lock is not None:
+            lock.release()
+
+
+def _observe_tts(chunks, start: float):
+    """Repassa os chunks registrando o tempo até o primeiro e o RTF (só o tempo gasto no modelo)."""
+    busy = time.perf_counter() - start
+    samples = 0
+    first = True
+    iterator = iter(chunks)
+    while True:
+        t = time.perf_counter()
+        chunk = next(iterator, None)
+        if chunk is None:
+            break
+        busy += time.perf_counter() - t
+        if first:
+            TTS_TTFC.observe(time.perf_counter() - start)
+            first = False
+        samples += len(chunk)
+        yield chunk
+    if samples:
+        TTS_RTF.observe(busy / (samples / XTTS_SAMPLERATE))
+
+
+def _reference_audio(voice: str) -> str:
+    """WAV de referência da voz (criado com o `say` se ainda não existir)."""
+    reference_audio = voice_profiles.resolve(voice)
+    if not os.path.exists(reference_audio):
+        print("📝 Criando arquivo de referência de voz...")
+        create_reference_audio(reference_audio)
+    return reference_audio
+
+
+def _cached_speech(text: str, voice_key: str, params: dict):
+    """Áudio da frase já sintetizado com os parâmetros `params` (os do caminho que vai servi-la) ou None."""
+    cached = tts_cache.get(tts_cache.key_for(text, XTTS_LANGUAGE, voice_key, params))
+    TTS_CACHE_LOOKUPS.inc(result="miss" if cached is None else "hit")
+    return cached
+
+
+def synthesize_stream(text: str, voice: str = "default", use_cache: bool = TTS_CACHE, cancel=None):
+    """Gera chunks float32 (24 kHz) via XTTS inference_stream; se o streaming falhar, um único chunk via inference.
+
+    Com `use_cache`, frases já sintetizadas com a mesma voz e parâmetros saem do cache num único chunk.
+    `cancel` (CancelToken) encerra o inference_stream entre chunks e levanta `Cancelled`.
+    """
+    if cancel is not None:
+        cancel.check()
+    start = time.perf_counter()
+    reference_audio = _reference_audio(voice)
+    voice_key = voice_profiles.key_for(reference_audio)
+    if use_cache:
+        cached = _cached_speech(text, voice_key, XTTS_STREAM_PARAMS if XTTS_STREAMING else XTTS_FULL_PARAMS)
+        if cached is not None:
+            yield cached
+            return
+
+    xtts_model = models.get("xtts")
+    # Latents do cache de perfis (servem aos dois caminhos); calculá-los também usa o modelo
+    with xtts_lock:
+        gpt_cond_latent, speaker_embedding = voice_profiles.get(xtts_model, voice)
+
+    if XTTS_STREAMING:
+        produced = []
+        chunks = None
+        try:
+            print("🎤 [XTTS stream] Gerando áudio...")
             chunks = xtts_model.inference_stream(
                 text,
                 XTTS_LANGUAGE,
                 gpt_cond_latent,
                 speaker_embedding,
-                repetition_penalty=2.5,
-                temperature=0.6,
+                **XTTS_STREAM_PARAMS,
             )
-            audio_chunks = []
-            for chunk in chunks:
-                chunk_np = chunk.detach().cpu().numpy().squeeze()
-                # Converter para int16 para WAV
-                chunk_i16 = (chunk_np * 32767).astype(np.int16)
-                audio_chunks.append(chunk_i16)
-            if audio_chunks:
-                combined = np.concatenate(audio_chunks)
-                wav.write(tmp_path, 24000, combined)
-            else:
-                raise RuntimeError("Nenhum áudio gerado pelo XTTS low-level")
+            for chunk in _observe_tts(_budgeted((c.detach().cpu().numpy().squeeze() for c in chunks), "tts", xtts_lock), start):
+                if cancel is not None:
+                    cancel.check()
+                produced.append(chunk)
+                yield chunk
+        except Cancelled:
+            raise
+        except Exception as e:
+            if produced:
+                raise
+            print(f"⚠️ XTTS streaming falhou, usando síntese completa. Motivo: {e}")
+            FALLBACKS.inc(kind="xtts_stream")
         else:
-            # Fallback: API simplificada
-            print("🎤 [XTTS API] Gerando áudio...")
-            tts.tts_to_file(
-                text=text,
-                language=XTTS_LANGUAGE,
-                speaker=reference_audio,  # v2 aceita caminho WAV no speaker
-                file_path=tmp_path,
-                speed=0.8,
-                temperature=0.6,
-                repetition_penalty=2.5,
-            )
+            # Só guarda se o consumidor leu a frase inteira
+            if use_cache and produced and not (cancel is not None and cancel.cancelled):
+                tts_cache.put(
+                    tts_cache.key_for(text, XTTS_LANGUAGE, voice_key, XTTS_STREAM_PARAMS),
+                    np.concatenate(produced),
+                )
+            return
+        finally:
+            if chunks is not None and hasattr(chunks, "close"):
+                chunks.close()  # interrompe o GPT do XTTS se o consumidor parou no meio
+
+    # Fallback: síntese completa no mesmo modelo (equivalente ao tts_to_file)
+    if use_cache and XTTS_STREAMING:
+        cached = _cached_speech(text, voice_key, XTTS_FULL_PARAMS)  # o streaming falhou: vale o do inference
+        if cached is not None:
+            yield cached
+            return
+    print("🎤 [XTTS] Gerando áudio...")
+    def full_synthesis():
+        out = xtts_model.inference(
+            text,
+            XTTS_LANGUAGE,
+            gpt_cond_latent,
+            speaker_embedding,
+            **XTTS_FULL_PARAMS,
+        )
+        yield np.asarray(out["wav"], dtype=np.float32).squeeze()
+    for audio in _observe_tts(_budgeted(full_synthesis(), "tts", xtts_lock), start):
+        if cancel is not None:
+            cancel.check()
+        if use_cache:
+            tts_cache.put(tts_cache.key_for(text, XTTS_LANGUAGE, voice_key, XTTS_FULL_PARAMS), audio)
+        yield audio
+
+
+def synthesize_parallel(segments, pool: XttsProcessPool, voice: str = "default", cancel=None,
+                        use_cache: bool = TTS_CACHE):
+    """Sintetiza os segmentos em paralelo no pool de processos e gera o áudio na ordem do texto.
+
+    Cada segmento é enviado ao pool assim que chega (prioridade = posição na resposta, então o
+    primeiro sai antes); frases vizinhas são unidas com XTTS_CROSSFADE_MS de crossfade.
+    Segmentos que falham são pulados, como em `synthesize_segments`.
+    """
+    if cancel is not None:
+        cancel.check()
+    start = time.perf_counter()
+    reference_audio = _reference_audio(voice)
+    voice_key = voice_profiles.key_for(reference_audio)
+    submitted = queue.Queue()   # (segmento, chave do cache, áudio em cache, tarefa) em ordem; None no fim
+    tasks = []
+    stopped = threading.Event()
+    tasks_lock = threading.Lock()  # o envio ao pool e o cancelamento no fim não se cruzam
+
+    def feed():
+        try:
+            for index, segment in enumerate(segments):
+                if stopped.is_set() or (cancel is not None and cancel.cancelled):
+                    break
+                if use_cache:
+                    cached = _cached_speech(segment, voice_key, XTTS_FULL_PARAMS)
+                    if cached is not None:
+                        submitted.put((segment, None, cached, None))
+                        continue
+                key = tts_cache.key_for(segment, XTTS_LANGUAGE, voice_key, XTTS_FULL_PARAMS) if use_cache else None
+                with tasks_lock:
+                    if stopped.is_set():
+                        break
+                    task = pool.submit(segment, reference_audio, XTTS_FULL_PARAMS, priority=index)
+                    tasks.append(task)
+                submitted.put((segment, key, None, task))
+        except Exception as e:
+            print(f"❌ TTS Erro ao enviar segmentos ao pool: {e}")
+            ERRORS.inc(stage="tts")
+        finally:
+            submitted.put(None)
+
+    def in_order():
+        while True:
+            try:
+                item = submitted.get(timeout=0.1)
+            except queue.Empty:
+                if cancel is not None:
+                    cancel.check()
+                continue
+            if item is None:
+                return
+            segment, key, audio, task = item
+            if task is not None:
+                try:
+                    audio = task.result(cancel)
+                except Cancelled:
+                    raise
+                except Exception as e:
+                    ERRORS.inc(stage="tts")
+                    print(f"❌ TTS Erro no segmento '{segment[:40]}': {e}")
+                    continue
+                if key is not None:
+                    tts_cache.put(key, audio)
+            if cancel is not None:
+                cancel.check()
+            yield audio
+
+    threading.Thread(target=feed, name="xtts-pool-feed", daemon=True).start()
+    print("🎤 [XTTS pool] Gerando áudio em paralelo...")
+    crossfade = XTTS_SAMPLERATE * XTTS_CROSSFADE_MS // 1000
+    try:
+        for chunk in _observe_tts(crossfade_chunks(in_order(), crossfade), start):
+            if len(chunk):
+                yield chunk
+    finally:
+        with tasks_lock:
+            stopped.set()
+            pool.cancel(list(tasks))  # o consumidor parou: frases ainda na fila não precisam mais ser geradas
+
+
+def _xtts_pool():
+    """Pool de processos do XTTS, se habilitado, pronto e com algum worker vivo (nunca espera por ele)."""
+    if XTTS_WORKERS <= 1:
+        return None
+    pool = models.try_get("xtts_pool", timeout=0)
+    return pool if pool is not None and pool.healthy else None
+
+
+def synthesize_segments(segments, voice: str = "default", cancel=None):
+    """Sintetiza em ordem os segmentos de um iterável (ex.: fila alimentada pelo LLM)."""
+    pool = _xtts_pool()
+    if pool is not None:
+        yield from synthesize_parallel(segments, pool, voice, cancel=cancel)
+        return
+    for segment in segments:
+        try:
+            yield from synthesize_stream(segment, voice, cancel=cancel)
+        except Cancelled:
+            raise
+        except Exception as e:
+            ERRORS.inc(stage="tts")
+            print(f"❌ TTS Erro no segmento '{segment[:40]}': {e}")
+
+
+def say_text(text: str, voice: str = "default"):
+    """Gera e toca áudio via XTTS (inference_stream quando possível, senão síntese completa).
+
+    Com XTTS_WORKERS > 1, textos de várias frases são divididos e sintetizados no pool de processos.
+    """
+    try:
+        segments = split_text(text, max_chars=XTTS_MAX_CHARS)
+        pool = _xtts_pool()
+        if pool is not None and len(segments) > 1:
+            # Resposta longa: frases sintetizadas em paralelo, tocadas em ordem
+            chunks = synthesize_parallel(segments, pool, voice)
+        else:
+            chunks = synthesize_stream(text, voice)
+        # Toca cada chunk assim que ele sai do modelo
+        stats = player.play_stream(chunks)
+        if stats.duration == 0:
+            raise RuntimeError("Nenhum áudio gerado pelo XTTS")
+        PLAYBACK_DURATION.observe(stats.duration)
 
-        subprocess.run(["afplay", "-q", "1", tmp_path])
-        os.remove(tmp_path)
         print(f"🔊 TTS: {text}")
+        print(f"⏱️ Primeiro áudio em {stats.time_to_first_audio:.2f}s, "
+              f"{stats.duration:.1f}s tocados, underruns: {stats.underruns} ({stats.backend})")
 
     except Exception as e:
         print(f"❌ TTS Erro: {e}")
+        ERRORS.inc(stage="tts")
         # Fallback para macOS say
+        FALLBACKS.inc(kind="say")
         try:
             subprocess.run(["say", "-v", "Samantha", "-r", "160", text])
         except Exception:
@@ -149,66 +481,412 @@ def create_reference_audio(filename: str):
 ########################
 # STT- & LLM-Funktionen
 ########################
-# Carregar modelo Whisper uma vez (global)
-print("📥 Carregando modelo Whisper...")
-import warnings
-with warnings.catch_warnings():
-    warnings.simplefilter("ignore")
-    whisper_model = whisper.load_model(WHISPER_MODEL)
-print("✅ Modelo Whisper carregado!")
-
-def record(seconds: int, sr: int = SAMPLERATE) -> str:
+def new_capture(seconds: int = RECORD_SECS, mode: str = RECORD_MODE, sr: int = SAMPLERATE) -> Capture:
+    """Aloca o buffer de um turno, dimensionado pelo modo de gravação."""
+    max_secs = MAX_RECORD_SECS if mode == "vad" else seconds + 0.5
+    return Capture(max_secs, samplerate=sr)
+
+def record(seconds: int, sr: int = SAMPLERATE, mode: str = RECORD_MODE,
+           capture: Capture = None, stop_event=None, on_speech=None,
+           no_speech_timeout_ms: int = 5000) -> np.ndarray:
+    """Grava do microfone e retorna um buffer float32 mono, já no formato que o Whisper espera.
+
+    mode="fixed" grava `seconds`; mode="vad" termina VAD_HANGOVER_MS depois que a fala para.
+    """
     print("🎙️  Fale agora...")
-    audio = sd.rec(int(seconds * sr), samplerate=sr, channels=1, dtype='int16')
-    sd.wait()
-    fname = f"input_{int(time.time())}.wav"
+    if capture is None:
+        capture = new_capture(seconds, mode, sr)
+    capture_microphone(
+        capture,
+        mode=mode,
+        seconds=seconds,
+        detector=VAD_DETECTOR,
+        hangover_ms=VAD_HANGOVER_MS,
+        no_speech_timeout_ms=no_speech_timeout_ms,
+        stop_event=stop_event,
+        on_speech=on_speech,
+    )
+    audio = capture.speech_audio() if mode == "vad" else capture.audio
+    CAPTURE_DURATION.observe(len(audio) / sr)
+    if AUDIO_DEBUG_DIR:
+        dump_audio(audio, sr)
+    return audio
+
+def endpoint_latency(capture: Capture) -> float:
+    """Segundos entre o último frame com voz e agora (chamar logo antes do STT)."""
+    if capture.speech_end_time is None:
+        return 0.0
+    return time.perf_counter() - capture.speech_end_time
+
+def dump_audio(audio: np.ndarray, sr: int = SAMPLERATE) -> str:
+    """Grava o buffer em AUDIO_DEBUG_DIR para depuração (opt-in)."""
+    os.makedirs(AUDIO_DEBUG_DIR, exist_ok=True)
+    fname = os.path.join(AUDIO_DEBUG_DIR, f"input_{time.time_ns()}.wav")
     wav.write(fname, sr, audio)
+    print(f"💾 Áudio de depuração salvo em {fname}")
     return fname
 
-def speech_to_text(wav_path: str) -> str:
-    # Usar modelo global carregado
-    result = whisper_model.transcribe(wav_path, language="pt")
-    return result["text"].strip()
+def speech_to_text(audio) -> str:
+    """Transcreve um buffer float32 de 16 kHz (ou, por compatibilidade, um caminho de arquivo)."""
+    start = time.perf_counter()
+    if isinstance(audio, np.ndarray):
+        # O motor usa o array direto: sem ffmpeg, sem cópia
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        if stt_batcher is not None:
+            # Junta com clipes de outras sessões que chegaram ao mesmo tempo
+            text = stt_batcher.transcribe(audio)
+            _observe_stt(start, audio)
+            return text
+    # Usar motor global carregado
+    engine = models.get("whisper")
+    with stt_guard:
+        text = engine.transcribe(audio, language="pt")
+    _observe_stt(start, audio)
+    return text
+
+def _observe_stt(start: float, audio):
+    elapsed = time.perf_counter() - start
+    STT_LATENCY.observe(elapsed, mode="batch")
+    if isinstance(audio, np.ndarray) and len(audio):
+        STT_RTF.observe(elapsed / (len(audio) / SAMPLERATE))
+
+def transcribe_words(audio: np.ndarray, initial_prompt: str = None):
+    """Transcreve com timestamps por palavra: [(inicio_s, fim_s, palavra)]. Usado pelo STT incremental."""
+    engine = models.get("whisper")
+    with stt_guard:
+        return engine.transcribe_words(audio, language="pt", initial_prompt=initial_prompt)
+
+_llm_clients = {}                # "sync" -> OpenAI; "async" -> (event loop, AsyncOpenAI)
+_llm_clients_lock = threading.Lock()
+
+def llm_client():
+    """Cliente OpenAI do processo: o pool de conexões (keep-alive, TLS já negociado) é reutilizado entre chamadas."""
+    with _llm_clients_lock:
+        client = _llm_clients.get("sync")
+        if client is None:
+            from openai import OpenAI
+            client = _llm_clients["sync"] = OpenAI(api_key=openai.api_key, base_url=openai.api_base)
+        return client
+
+def async_llm_client():
+    """Cliente AsyncOpenAI do event loop atual (as conexões do pool pertencem ao loop que as abriu)."""
+    loop = asyncio.get_running_loop()
+    with _llm_clients_lock:
+        current = _llm_clients.get("async")
+        if current is None or current[0] is not loop:
+            from openai import AsyncOpenAI
+            current = _llm_clients["async"] = (loop, AsyncOpenAI(api_key=openai.api_key, base_url=openai.api_base))
+        return current[1]
+
+def _delta_text(event):
+    """Texto novo de um evento do stream (None se o evento não traz conteúdo)."""
+    if not event.choices:
+        return None
+    return event.choices[0].delta.content or None
+
+def _stream_llm(messages, on_segment, cancel=None, on_delta=None) -> str:
+    """Uma chamada em streaming ao LLM; cada frase completa vai para `on_segment`. Levanta exceção em caso de erro.
 
-def ask_llm(prompt: str) -> str:
+    `on_delta` recebe cada pedaço de texto do stream assim que chega (antes de virar frase).
+    `cancel` (CancelToken) fecha a conexão HTTP do stream e levanta `Cancelled`.
+    """
+    segmenter = SentenceSegmenter(max_chars=XTTS_MAX_CHARS)
+    parts = []
+    start = time.perf_counter()
+    stream = llm_client().chat.completions.create(
+        model=LLM_MODEL,
+        messages=messages,
+        stream=True,
+        **LLM_PARAMS
+    )
+    # Fechar a resposta destrava a leitura do socket mesmo no meio de uma espera longa
+    unregister = cancel.on_cancel(stream.close) if cancel is not None else None
     try:
-        from openai import OpenAI
-        client = OpenAI(
-            api_key=openai.api_key,
-            base_url=openai.api_base
-        )
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1000
-        )
-        return response.choices[0].message.content.strip()
+        for event in stream:
+            if cancel is not None:
+                cancel.check()
+            delta = _delta_text(event)
+            if delta is None:
+                continue
+            if not parts:
+                LLM_TTFT.observe(time.perf_counter() - start)
+            parts.append(delta)
+            if on_delta is not None:
+                on_delta(delta)
+            for segment in segmenter.feed(delta):
+                on_segment(segment)
+    except Exception:
+        if cancel is not None:
+            cancel.check()
+        raise
+    finally:
+        if unregister is not None:
+            unregister()
+    if cancel is not None:
+        cancel.check()
+    for segment in segmenter.flush():
+        on_segment(segment)
+    LLM_DURATION.observe(time.perf_counter() - start)
+    return "".join(parts).strip()
+
+
+async def _stream_llm_async(messages, on_segment, on_delta=None) -> str:
+    """`_stream_llm` para o event loop: a espera pelo servidor é um `await`, não uma thread bloqueada.
+
+    Cancelar a task fecha o stream HTTP (a conexão não volta ao pool no meio de uma resposta).
+    """
+    segmenter = SentenceSegmenter(max_chars=XTTS_MAX_CHARS)
+    parts = []
+    start = time.perf_counter()
+    stream = await async_llm_client().chat.completions.create(
+        model=LLM_MODEL,
+        messages=messages,
+        stream=True,
+        **LLM_PARAMS
+    )
+    try:
+        async for event in stream:
+            delta = _delta_text(event)
+            if delta is None:
+                continue
+            if not parts:
+                LLM_TTFT.observe(time.perf_counter() - start)
+            parts.append(delta)
+            if on_delta is not None:
+                on_delta(delta)
+            for segment in segmenter.feed(delta):
+                on_segment(segment)
+    finally:
+        await stream.close()
+    for segment in segmenter.flush():
+        on_segment(segment)
+    LLM_DURATION.observe(time.perf_counter() - start)
+    return "".join(parts).strip()
+
+
+def _summarize_history(text: str) -> str:
+    """Resumo curto dos turnos que saíram do histórico (chamada não-streaming)."""
+    response = llm_client().chat.completions.create(
+        model=LLM_MODEL,
+        messages=[
+            {"role": "system", "content": "Resuma a conversa a seguir em até 3 frases, em português, "
+                                          "mantendo nomes, números e decisões."},
+            {"role": "user", "content": text},
+        ],
+        temperature=0.2,
+        max_tokens=200,
+    )
+    return response.choices[0].message.content.strip()
+
+
+def new_conversation() -> Conversation:
+    """Histórico de uma sessão, limitado a CONTEXT_MAX_TOKENS."""
+    return Conversation(
+        SYSTEM_PROMPT,
+        max_tokens=CONTEXT_MAX_TOKENS,
+        summarize=_summarize_history if CONTEXT_SUMMARIZE else None,
+    )
+
+
+def _llm_prompt(prompt: str, conversation: Conversation = None):
+    """Mensagens do prompt (com o histórico da sessão, se houver), o contexto do cache e o total de tokens."""
+    if conversation is not None:
+        messages = conversation.messages(prompt)
+    else:
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}]
+    prompt_tokens = count_message_tokens(messages)
+    LLM_PROMPT_TOKENS.observe(prompt_tokens)
+    print(f"🧮 Prompt: {prompt_tokens} tokens ({len(messages)} mensagens)")
+    return messages, messages[:-1], prompt_tokens
+
+
+class _AnswerRelay:
+    """Repassa a resposta a `on_segment` (frases) e `on_delta` (texto), venha ela do stream ou do cache."""
+
+    def __init__(self, on_segment=None, on_delta=None):
+        self.on_segment = on_segment
+        self.on_delta = on_delta
+        self.emitted = []
+        self.streamed = []  # deltas vindos direto do stream desta chamada
+        self.stream_delta = self._delta if on_delta is not None else None
+
+    def _delta(self, delta):
+        self.streamed.append(delta)
+        self.on_delta(delta)
+
+    def segment(self, segment):
+        if self.on_delta is not None and not self.streamed:
+            # Sem stream próprio (cache ou chamada compartilhada): frase a frase
+            self.on_delta(segment if not self.emitted else " " + segment)
+        self.emitted.append(segment)
+        if self.on_segment is not None:
+            self.on_segment(segment)
+
+    @property
+    def started(self) -> bool:
+        return bool(self.emitted or self.streamed)
+
+    def fail(self, error) -> str:
+        """Resposta de desculpas no lugar de um erro do LLM (entregue se nada foi enviado ainda)."""
+        print(f"❌ Erro na API da OpenAI: {error}")
+        ERRORS.inc(stage="llm")
+        FALLBACKS.inc(kind="llm_error_answer")
+        answer = "Desculpe, houve um erro ao processar sua pergunta."
+        if self.on_segment is not None and not self.emitted:
+            self.on_segment(answer)
+        if self.on_delta is not None and not self.emitted and not self.streamed:
+            self.on_delta(answer)
+        return answer
+
+
+def ask_llm(prompt: str, on_segment=None, conversation: Conversation = None, cancel=None, on_delta=None) -> str:
+    """Consulta o LLM em streaming. Se `on_segment` for passado, recebe cada frase assim que ela fica completa.
+
+    `on_delta` recebe o texto token a token; respostas do cache (ou de uma chamada idêntica
+    em andamento) chegam frase a frase, e o erro, como a mensagem de desculpas.
+
+    Com `conversation`, os turnos anteriores vão no prompt e o novo turno é registrado nela.
+    Respostas passam pelo cache: perguntas repetidas (ou idênticas em andamento) não chamam o servidor de novo.
+    Com `cancel` (CancelToken), `Cancelled` é levantado (nada entra no histórico) e o stream é fechado,
+    a menos que uma requisição idêntica ainda espere pela mesma chamada.
+    """
+    messages, context, prompt_tokens = _llm_prompt(prompt, conversation)
+    relay = _AnswerRelay(on_segment, on_delta)
+
+    try:
+        if llm_cache is None:
+            answer = _stream_llm(messages, relay.segment, cancel, relay.stream_delta)
+        else:
+            try:
+                answer, source = llm_cache.ask(
+                    [LLM_MODEL, LLM_PARAMS, context],
+                    prompt,
+                    lambda callback, flight_cancel: _stream_llm(messages, callback, flight_cancel, relay.stream_delta),
+                    relay.segment,
+                    cancel,
+                )
+                LLM_CACHE_LOOKUPS.inc(result=source)
+            except Cancelled as e:
+                if cancel is not None and cancel.cancelled:
+                    raise
+                # A chamada compartilhada foi interrompida sem que este chamador tenha desistido
+                if relay.started:
+                    return relay.fail(e)
+                answer = _stream_llm(messages, relay.segment, cancel, relay.stream_delta)
+        if conversation is not None and answer:
+            conversation.add_turn(prompt, answer, prompt_tokens)
+        return answer
+    except Cancelled:
+        raise
+    except Exception as e:
+        return relay.fail(e)
+
+
+async def ask_llm_async(prompt: str, on_segment=None, conversation: Conversation = None, on_delta=None) -> str:
+    """`ask_llm` para o servidor asyncio: mesmos callbacks, cache e histórico, sem ocupar uma thread na espera.
+
+    O cancelamento é o da própria task (ex.: cliente desconectou): nada entra no histórico e o
+    stream HTTP é fechado, a menos que uma requisição idêntica ainda espere pela mesma chamada.
+    """
+    if conversation is not None and conversation.summarize is not None:
+        # Compactar o histórico pode resumir turnos antigos: chamada síncrona ao LLM, fora do event loop
+        messages, context, prompt_tokens = await asyncio.get_running_loop().run_in_executor(
+            None, _llm_prompt, prompt, conversation)
+    else:
+        messages, context, prompt_tokens = _llm_prompt(prompt, conversation)
+    relay = _AnswerRelay(on_segment, on_delta)
+
+    try:
+        if llm_cache is None:
+            answer = await _stream_llm_async(messages, relay.segment, relay.stream_delta)
+        else:
+            try:
+                answer, source = await llm_cache.ask_async(
+                    [LLM_MODEL, LLM_PARAMS, context],
+                    prompt,
+                    lambda callback: _stream_llm_async(messages, callback, relay.stream_delta),
+                    relay.segment,
+                )
+                LLM_CACHE_LOOKUPS.inc(result=source)
+            except Cancelled as e:
+                # A chamada compartilhada foi interrompida (o cancelamento desta task é CancelledError)
+                if relay.started:
+                    return relay.fail(e)
+                answer = await _stream_llm_async(messages, relay.segment, relay.stream_delta)
+        if conversation is not None and answer:
+            conversation.add_turn(prompt, answer, prompt_tokens)
+        return answer
+    except Cancelled:
+        raise
     except Exception as e:
-        print(f"❌ Erro na API da OpenAI: {e}")
-        return "Desculpe, houve um erro ao processar sua pergunta."
+        return relay.fail(e)
+
+
+def speak_llm_answer(prompt: str, voice: str = "default", on_segment=None, on_audio_start=None,
+                     conversation: Conversation = None, cancel=None) -> str:
+    """Pergunta ao LLM e fala a resposta frase a frase enquanto ela ainda está sendo gerada."""
+    pipeline = SpeechPipeline(
+        lambda segment: synthesize_stream(segment, voice, cancel=cancel),
+        player,
+        on_audio_start=on_audio_start,
+        cancel=cancel,
+    ).start()
+
+    def handle_segment(segment):
+        pipeline.push(segment)
+        if on_segment is not None:
+            on_segment(segment)
+
+    try:
+        answer = ask_llm(prompt, on_segment=handle_segment, conversation=conversation, cancel=cancel)
+    finally:
+        stats = pipeline.finish()
+    if stats.duration:
+        PLAYBACK_DURATION.observe(stats.duration)
+    if pipeline.errors:
+        ERRORS.inc(len(pipeline.errors), stage="tts")
+    print(f"⏱️ Primeiro áudio em {stats.time_to_first_audio:.2f}s, "
+          f"{len(pipeline.segments)} segmentos, underruns: {stats.underruns} ({stats.backend})")
+    return answer
+
+def after_fork():
+    """Worker do gunicorn recém-criado: warm-ups, modelos por processo e a thread do batcher."""
+    # Conexões do pool herdadas do master não podem ser usadas por dois processos
+    _llm_clients.clear()
+    models.after_fork()
+    if stt_batcher is not None:
+        stt_batcher.after_fork()
 
 ########################
 # Haupt-Loop
 ########################
+# Startet das Laden sofort, blockiert aber den Import nicht
+models.start()
+
 if __name__ == "__main__":
+    print("📥 Carregando modelos...")
+    models.wait_ready()
     print("🤖 Assistente de voz local iniciado – Ctrl-C para sair")
+    conversation = new_conversation()
     try:
         while True:
-            wav_file = record(RECORD_SECS)
-            question = speech_to_text(wav_file)
-            os.remove(wav_file)
+            capture = new_capture()
+            audio = record(RECORD_SECS, capture=capture)
+            if not capture.has_speech:
+                print("🔇 Nenhuma fala detectada")
+                continue
+            print(f"⏱️ Fim da fala → STT: {endpoint_latency(capture):.2f}s")
+            question = speech_to_text(audio)
             if not question:
                 continue
             print(f"📝 Você disse: {question}")
 
-            answer = ask_llm(question)
+            answer = speak_llm_answer(
+                question,
+                on_audio_start=lambda: TURN_LATENCY.observe(endpoint_latency(capture)),
+                conversation=conversation,
+            )
             print(f"🤖 Resposta: {answer}")
-
-            say_text(answer)
     except KeyboardInterrupt:
         print("\n👋 Até logo!")
 
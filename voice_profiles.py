@@ -0,0 +1,168 @@
+"""
+Armazenamento de perfis de voz (speaker latents) para o XTTS V2.
+
+O XTTS precisa de `gpt_cond_latent` e `speaker_embedding` para clonar uma voz.
+Calculá-los significa recarregar o WAV de referência e rodar o speaker encoder,
+o que custa centenas de ms de CPU. Aqui eles são calculados uma única vez por
+arquivo de referência (chave = hash do conteúdo + parâmetros de condicionamento),
+mantidos num LRU em memória e persistidos em disco como arrays `.npz`, de modo
+que um restart do processo não precise rodar o encoder de novo.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+# Parâmetros padrão de `Xtts.get_conditioning_latents`
+DEFAULT_COND_PARAMS = {
+    "max_ref_length": 30,
+    "gpt_cond_len": 6,
+    "gpt_cond_chunk_len": 6,
+    "sound_norm_refs": False,
+    "load_sr": 22050,
+}
+
+
+class VoiceProfileStore:
+    """LRU em memória + cache em disco dos latents de condicionamento do XTTS."""
+
+    def __init__(self, cache_dir=".voice_profiles", max_entries=8, model_id="", cond_params=None):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.model_id = model_id
+        self.cond_params = dict(DEFAULT_COND_PARAMS, **(cond_params or {}))
+        self._voices = {}                 # nome -> caminho do WAV de referência
+        self._lru = OrderedDict()         # chave -> (gpt_cond_latent, speaker_embedding)
+        self._digests = {}                # (caminho, mtime, tamanho) -> sha256
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def register(self, name: str, reference_audio: str):
+        """Registra uma voz nomeada apontando para um WAV de referência."""
+        with self._lock:
+            self._voices[name] = reference_audio
+
+    def voices(self):
+        with self._lock:
+            return dict(self._voices)
+
+    def resolve(self, voice: str) -> str:
+        """Aceita um nome registrado ou um caminho direto para WAV."""
+        with self._lock:
+            return self._voices.get(voice, voice)
+
+    def preload(self, model, names=None):
+        """Carrega (ou calcula) os latents das vozes registradas antecipadamente."""
+        for name in names or list(self.voices()):
+            path = self.resolve(name)
+            if not os.path.exists(path):
+                print(f"⚠️ Voz '{name}' sem arquivo de referência ({path}), pulando preload")
+                continue
+            try:
+                self.get(model, name)
+                print(f"✅ Perfil de voz '{name}' pronto")
+            except Exception as e:
+                print(f"⚠️ Falha ao pré-carregar voz '{name}': {e}")
+
+    def key_for(self, reference_audio: str) -> str:
+        """Chave estável: hash do conteúdo do WAV + modelo + parâmetros de condicionamento."""
+        params = ",".join(f"{k}={self.cond_params[k]}" for k in sorted(self.cond_params))
+        h = hashlib.sha256()
+        h.update(self._file_digest(reference_audio).encode())
+        h.update(self.model_id.encode())
+        h.update(params.encode())
+        return h.hexdigest()[:32]
+
+    def get(self, model, voice: str = "default"):
+        """Retorna `(gpt_cond_latent, speaker_embedding)` para a voz, usando o cache."""
+        reference_audio = self.resolve(voice)
+        key = self.key_for(reference_audio)
+
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return self._lru[key]
+
+        latents = self._load_from_disk(key)
+        if latents is not None:
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            gpt_cond_latent, speaker_embedding = model.get_conditioning_latents(
+                audio_path=reference_audio, **self.cond_params
+            )
+            latents = (gpt_cond_latent, speaker_embedding)
+            self._save_to_disk(key, latents)
+            with self._lock:
+                self.misses += 1
+
+        with self._lock:
+            self._lru[key] = latents
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+        return latents
+
+    def stats(self):
+        with self._lock:
+            return {
+                "voices": sorted(self._voices),
+                "cached": len(self._lru),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    def _file_digest(self, path: str) -> str:
+        st = os.stat(path)
+        sig = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            digest = self._digests.get(sig)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 16), b""):
+                    h.update(block)
+            digest = h.hexdigest()
+            with self._lock:
+                self._digests[sig] = digest
+        return digest
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def _load_from_disk(self, key: str):
+        path = self._path_for(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                gpt_cond_latent = torch.from_numpy(data["gpt_cond_latent"])
+                speaker_embedding = torch.from_numpy(data["speaker_embedding"])
+            return gpt_cond_latent, speaker_embedding
+        except Exception as e:
+            print(f"⚠️ Perfil de voz corrompido em {path}, recalculando: {e}")
+            return None
+
+    def _save_to_disk(self, key: str, latents):
+        gpt_cond_latent, speaker_embedding = latents
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path_for(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    gpt_cond_latent=gpt_cond_latent.detach().cpu().numpy().astype(np.float32),
+                    speaker_embedding=speaker_embedding.detach().cpu().numpy().astype(np.float32),
+                )
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ Não foi possível salvar perfil de voz em disco: {e}")
@@ -0,0 +1,35 @@
+"""
+Entrada WSGI de produção:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Com `preload_app`, este módulo é importado uma vez no master do gunicorn,
+antes do fork. Os pesos do Whisper e do XTTS são carregados aqui, e os
+workers os herdam copy-on-write: N workers dividem as mesmas páginas em vez
+de carregar N cópias. Os warm-ups rodam em cada worker, depois do fork
+(ver `ModelRegistry` e o hook `post_fork` em gunicorn.conf.py).
+"""
+
+import gc
+import os
+import time
+
+from backend_server import app, models
+from model_registry import process_memory
+
+MODEL_LOAD_TIMEOUT = float(os.getenv("MODEL_LOAD_TIMEOUT", 1800))  # s; inclui download na 1ª vez
+
+if models.prefork:
+    started = time.perf_counter()
+    print("⏳ Carregando modelos no master antes do fork...")
+    if not models.wait_loaded(MODEL_LOAD_TIMEOUT):
+        # Sobe mesmo assim: /health/ready mostra o estado de cada modelo
+        print("⚠️ Nem todos os modelos carregaram; os workers vão reportar o estado em /health/ready")
+    memory = process_memory() or {}
+    print(f"✅ Master pronto para o fork em {time.perf_counter() - started:.1f}s "
+          f"(RSS {memory.get('rss', 0) / 2**20:.0f} MB)")
+    # Objetos do master ficam fora do coletor: a coleta nos workers não toca
+    # (nem copia) as páginas deles
+    gc.freeze()
+
+__all__ = ["app"]